@@ -0,0 +1,64 @@
+"""Compare serial and parallel log ingestion.
+
+Usage (from the repository root):
+    python -m benchmarks.benchmark_loader ./log_data/LO2 --workers 1 2 4 8
+
+Workers are capped at the number of cpus.
+"""
+
+import argparse
+import os
+import time
+
+import server.analysis.loader as server_loader
+from server.analysis.loader import Loader, list_log_files
+
+
+def benchmark(directory_path, workers, shard_by, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        loader = Loader(directory_path, "raw", workers=workers, shard_by=shard_by)
+        loader.load()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings), loader.df.height
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory_path")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--shard-by", choices=["size", "run"], default="size")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--always-parallel",
+        action="store_true",
+        help="use the process pool even for inputs below the size threshold",
+    )
+    args = parser.parse_args()
+
+    if args.always_parallel:
+        server_loader._PARALLEL_MIN_BYTES = 0
+
+    file_paths = list_log_files(args.directory_path)
+    size_mb = sum(os.path.getsize(path) for path in file_paths) / 2**20
+    print(
+        f"{args.directory_path}: {len(file_paths)} files, {size_mb:.0f} MB,"
+        f" {os.cpu_count()} cpus, shard by {args.shard_by}"
+    )
+
+    baseline = None
+    for workers in args.workers:
+        seconds, rows = benchmark(
+            args.directory_path, workers, args.shard_by, args.repeats
+        )
+        baseline = baseline or seconds
+        print(
+            f"workers={workers:<3} {seconds:8.2f} s  {rows / seconds:12.0f} lines/s"
+            f"  speedup {baseline / seconds:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compare the masking engine with loglead's EventLogEnhancer.normalize.
+
+Usage (from the repository root):
+    python -m benchmarks.benchmark_masking ./log_data/LO2 --masks myllari drain_orig
+
+Masks the first line of every m_message of the loaded logs with each mask set
+and reports lines/s for both implementations. The outputs are compared too.
+"""
+
+import argparse
+import time
+
+from loglead.enhancers import EventLogEnhancer
+
+from server.analysis.loader import Loader
+from server.analysis.regex_masks.drain_loglead import DRAIN_LOGLEAD
+from server.analysis.regex_masks.drain_orig import DRAIN_ORIG
+from server.analysis.regex_masks.myllari import MYLLARI
+from server.analysis.regex_masks.myllari_extended import MYLLARI_EXTENDED
+from server.analysis.utils.masking import mask_messages
+
+MASKS = {
+    "myllari": MYLLARI,
+    "myllari_extended": MYLLARI_EXTENDED,
+    "drain_loglead": DRAIN_LOGLEAD,
+    "drain_orig": DRAIN_ORIG,
+}
+
+
+def benchmark(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory_path")
+    parser.add_argument("--masks", nargs="+", choices=MASKS, default=list(MASKS))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--unique",
+        action="store_true",
+        help="mask only the distinct messages, as the Enhancer does",
+    )
+    args = parser.parse_args()
+
+    loader = Loader(args.directory_path, "raw")
+    loader.load()
+    df = loader.df.select("m_message")
+    if args.unique:
+        df = df.unique(maintain_order=True)
+    lines = df.height
+    print(f"{args.directory_path}: {lines} messages")
+
+    for mask_type in args.masks:
+        masks = MASKS[mask_type]
+
+        loglead_seconds, expected = benchmark(
+            lambda: EventLogEnhancer(df).normalize(masks)["e_message_normalized"],
+            args.repeats,
+        )
+        engine_seconds, result = benchmark(
+            lambda: mask_messages(df["m_message"], masks), args.repeats
+        )
+
+        print(
+            f"{mask_type:<17} loglead {lines / loglead_seconds:12.0f} lines/s"
+            f"  engine {lines / engine_seconds:12.0f} lines/s"
+            f"  speedup {loglead_seconds / engine_seconds:.2f}x"
+            f"  equal {result.equals(expected)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import io
+from urllib.parse import urlencode
 
+import numpy as np
 import polars as pl
 import requests
+from scipy.stats import rankdata, zscore
 
 from dash_app.utils.data_directories import (
     get_all_filenames,
@@ -10,6 +13,7 @@ from dash_app.utils.data_directories import (
 )
 from dash_app.utils.metadata import format_metadata_rows
 from dash_app.utils.plots import (
+    create_distance_heatmap,
     create_files_count_plot,
     create_umap_plot,
     create_unique_term_count_plot,
@@ -56,6 +60,9 @@ def run_log_distance(
     vectorizer_type,
     mask_type=None,
     analysis_name=None,
+    matrix=False,
+    top_k=None,
+    nearest="similar",
     level="directory",
 ):
 
@@ -68,6 +75,9 @@ def run_log_distance(
         "vectorizer": vectorizer_type,
         "file_level": (level == "file"),
         "name": analysis_name,
+        "matrix": bool(matrix),
+        "top_k": top_k,
+        "nearest": nearest or "similar",
     }
     response, error = make_api_call(payload, f"log-distance/{project_id}")
     if error or response is None:
@@ -165,6 +175,28 @@ def create_high_level_plot(switch_on, analysis_id):
     return fig, style, metadata_rows, project_id
 
 
+def create_distance_matrix_plot(switch_on, analysis_id, metric):
+    metadata = _fetch_analysis_metadata(analysis_id)
+    project_id = metadata.get("project_id")
+
+    df = pl.read_parquet(io.BytesIO(_fetch_analysis_results(analysis_id)))
+
+    theme = "plotly_white" if switch_on else "plotly_dark"
+    fig = create_distance_heatmap(df, metric, theme)
+
+    target_options = [{"label": run, "value": run} for run in df["run"]]
+    metadata_rows = format_metadata_rows(metadata)
+
+    return fig, target_options, metadata_rows, project_id
+
+
+def populate_distance_matrix_row(analysis_id, target):
+    df = pl.read_parquet(io.BytesIO(_fetch_analysis_results(analysis_id)))
+    df_row = _distance_matrix_row(df, target)
+    columns = [{"name": col, "id": col} for col in df_row.columns]
+    return df_row.to_dicts(), columns
+
+
 def make_api_call(json_payload, endpoint, requests_type="POST"):
     base_url = "http://localhost:5000/api"
     http_methods = {
@@ -259,6 +291,34 @@ def _fetch_analysis_results(analysis_id: int) -> bytes:
     return response.content
 
 
+def fetch_result_summary(analysis_id: int) -> dict:
+    response, error = make_api_call({}, f"analyses/{analysis_id}/summary", "GET")
+    if error or response is None:
+        raise ValueError(
+            f"Was not able to retrieve summary for analysis id {analysis_id}: {error}"
+        )
+    return response.json()
+
+
+def fetch_result_slice(
+    analysis_id: int, seq_id: str, raw=False, columns=None
+) -> pl.DataFrame:
+    query = {"seq_id": seq_id}
+    if raw:
+        query["raw"] = "true"
+    if columns:
+        query["columns"] = ",".join(columns)
+
+    response, error = make_api_call(
+        {}, f"analyses/{analysis_id}/slice?{urlencode(query)}", "GET"
+    )
+    if error or response is None:
+        raise ValueError(
+            f"Was not able to retrieve {seq_id} for analysis id {analysis_id}: {error}"
+        )
+    return pl.read_parquet(io.BytesIO(response.content))
+
+
 def _fetch_analysis_metadata(analysis_id: int) -> dict:
     response_metadata, error = make_api_call(
         {}, f"analyses/{analysis_id}/metadata", "GET"
@@ -313,6 +373,37 @@ def _build_test_train_payload(
     return payload
 
 
+def _distance_matrix_row(df, target):
+    # Same columns as a log distance analysis of the target
+    distance_columns = ["cosine", "jaccard", "compression", "containment"]
+    target_index = df["run"].index_of(target)
+    if target_index is None:
+        raise ValueError(f"Target {target} not found in the distance matrix")
+
+    df_row = pl.DataFrame(
+        {
+            "target_run": target,
+            "comparison_run": df["run"],
+            "target_lines": df["lines"][target_index],
+            "comparison_lines": df["lines"],
+            **{col: df[col][target_index].to_numpy() for col in distance_columns},
+        }
+    ).filter(pl.col("comparison_run") != target)
+
+    distance_matrix = df_row.select(distance_columns).to_numpy()
+    zscores = np.apply_along_axis(
+        lambda col: zscore(col, nan_policy="omit"), axis=0, arr=distance_matrix
+    )
+    ranks = np.apply_along_axis(
+        lambda col: rankdata(col, nan_policy="omit"), axis=0, arr=distance_matrix
+    )
+
+    return df_row.with_columns(
+        pl.Series("zscore_sum", zscores.sum(axis=1)),
+        pl.Series("rank_sum", ranks.sum(axis=1)),
+    ).with_columns(pl.col(pl.Float32, pl.Float64).fill_nan(None))
+
+
 def _parse_response_as_table(content):
     df = pl.read_parquet(io.BytesIO(content))
     columns = [{"name": col, "id": col} for col in df.columns]
@@ -387,6 +387,67 @@ def redirect_to_results_input(id):
     )
 
 
+def distance_matrix_input(id):
+    return dbc.Col(
+        [
+            dbc.Switch(
+                id=id,
+                label=html.Span(
+                    "All pairs",
+                    id=f"{id}-label",
+                    style={"textDecoration": "underline", "cursor": "pointer"},
+                ),
+                value=False,
+            ),
+            dbc.Tooltip(
+                "If on, measures the distances between every pair of runs or files instead of the target only. Any row of the result can then be picked as the target.",
+                target=f"{id}-label",
+                placement="bottom",
+            ),
+        ]
+    )
+
+
+def top_k_input(id):
+    return dbc.Col(
+        [
+            dbc.Label(
+                html.Span(
+                    "Nearest runs",
+                    id=f"{id}-label",
+                    style={"textDecoration": "underline", "cursor": "pointer"},
+                ),
+                html_for=id,
+                width="auto",
+            ),
+            dbc.Input(id=id, type="number", min=1, step=1, placeholder="All"),
+            dbc.Tooltip(
+                "If set, picks this many runs or files by their estimated Jaccard similarity to the target and measures the distances to those only.",
+                target=f"{id}-label",
+                placement="bottom",
+            ),
+        ],
+    )
+
+
+def nearest_input(id):
+    return dbc.Col(
+        [
+            dbc.Label("Nearest by", html_for=id, width="auto"),
+            dcc.Dropdown(
+                id=id,
+                options=[
+                    {"label": "Most similar", "value": "similar"},
+                    {"label": "Most dissimilar", "value": "dissimilar"},
+                ],
+                value="similar",
+                clearable=False,
+                className="dbc border border-light-subtle rounded",
+            ),
+        ],
+    )
+
+
 def files_to_include_input(id):
     return dbc.Col(
         [
@@ -4,6 +4,7 @@ from dash import dcc
 from dash_app.components.form_inputs import (
     detectors_unsupervised_input,
     directory_dropdown_input,
+    distance_matrix_input,
     enhancement_input,
     files_filter_input,
     mask_input,
@@ -15,6 +16,8 @@ from dash_app.components.form_inputs import (
     terms_umap_input,
     vectorizer_input,
     match_file_names_input,
+    nearest_input,
+    top_k_input,
     color_by_directory_input,
     redirect_to_results_input,
     line_display_mode_input,
@@ -264,6 +267,9 @@ def distance_run_level_form(
     vectorizer_id,
     results_redirect_id,
     analysis_name_id,
+    matrix_id,
+    top_k_id,
+    nearest_id,
 ):
     submit_btn = submit_button(submit_id, "Analyze")
 
@@ -293,6 +299,14 @@ def distance_run_level_form(
             ),
             dbc.Row(
                 [
+                    top_k_input(top_k_id),
+                    nearest_input(nearest_id),
+                ],
+                class_name="mb-3",
+            ),
+            dbc.Row(
+                [
+                    distance_matrix_input(matrix_id),
                     redirect_to_results_input(results_redirect_id),
                     dbc.Col(submit_btn, class_name="text-end"),
                 ]
@@ -314,6 +328,9 @@ def distance_file_level_form(
     vectorizer_id,
     results_redirect_id,
     analysis_name_id,
+    matrix_id,
+    top_k_id,
+    nearest_id,
     manual_filenames=False,
 ):
     submit_btn = submit_button(submit_id, "Analyze")
@@ -353,6 +370,14 @@ def distance_file_level_form(
             ),
             dbc.Row(
                 [
+                    top_k_input(top_k_id),
+                    nearest_input(nearest_id),
+                ],
+                class_name="mb-3",
+            ),
+            dbc.Row(
+                [
+                    distance_matrix_input(matrix_id),
                     redirect_to_results_input(results_redirect_id),
                     dbc.Col(submit_btn, class_name="text-end"),
                 ]
@@ -538,3 +538,112 @@ def create_new_analysis_base_layout(
             dcc.Store(id=manual_filenames_id, data=manual_filenames),
         ]
     )
+
+
+def create_distance_matrix_result_layout(
+    metric_selector_id,
+    plot_content_id,
+    target_selector_id,
+    datatable_id,
+    metadata_table_id,
+    error_toast_id,
+    success_toast_id,
+):
+    error_toast_row = dbc.Row(error_toast(error_toast_id))
+    success_toast_row = dbc.Row(success_toast(success_toast_id))
+
+    table_row = dbc.Row(dbc.Table(id=metadata_table_id, hover=True, responsive=True))
+
+    metric_selector_row = dbc.Row(
+        dcc.Dropdown(
+            id=metric_selector_id,
+            options=[
+                {"label": metric.capitalize(), "value": metric}
+                for metric in ["cosine", "jaccard", "compression", "containment"]
+            ],
+            value="cosine",
+            clearable=False,
+            className="dbc mt-3 border border-primary-subtle",
+        ),
+    )
+
+    plot_row = dbc.Row(
+        dcc.Loading(
+            type="default",
+            children=[
+                html.Div(
+                    dcc.Graph(
+                        id=plot_content_id,
+                        config={"responsive": True},
+                        style={
+                            "resize": "both",
+                            "overflow": "auto",
+                            "minHeight": "600px",
+                            "minWidth": "600px",
+                            "width": "90%",
+                        },
+                        className="dbc mt-3 ps-4 pe-4",
+                    ),
+                    style={
+                        "display": "flex",
+                        "justifyContent": "center",
+                        "overflow": "visible",
+                    },
+                ),
+            ],
+        ),
+    )
+
+    target_selector_row = dbc.Row(
+        dcc.Dropdown(
+            id=target_selector_id,
+            placeholder="Select target or click a row of the heatmap",
+            searchable=True,
+            className="dbc mt-3 border border-primary-subtle",
+        ),
+    )
+
+    data_table_row = dbc.Row(
+        dcc.Loading(
+            type="default",
+            children=html.Div(
+                dash_table.DataTable(
+                    id=datatable_id,
+                    sort_action="native",
+                    fixed_rows={"headers": True},
+                    style_table={
+                        "overflowY": "auto",
+                        "overflowX": "auto",
+                        "height": 600,
+                    },
+                    style_cell={
+                        "textAlign": "left",
+                        "minWidth": "100px",
+                    },
+                    style_header={
+                        "overflow": "hidden",
+                        "textOverflow": "ellipsis",
+                        "whiteSpace": "nowrap",
+                        "textAlign": "left",
+                        "minWidth": "100px",
+                        "fontWeight": "bold",
+                    },
+                    page_action="native",
+                    page_current=0,
+                    page_size=250,
+                ),
+            ),
+        ),
+        className="dbc mt-3 ms-4 me-4",
+    )
+
+    layout = [
+        dbc.Container(
+            [table_row, error_toast_row, success_toast_row, metric_selector_row]
+        ),
+        dbc.Container(plot_row, fluid=True),
+        dbc.Container(target_selector_row),
+        dbc.Container(data_table_row, fluid=True, style={"paddingBottom": "200px"}),
+    ]
+
+    return layout
@@ -0,0 +1,98 @@
+import dash
+from dash import Input, Output, State, callback, html
+
+from dash_app.callbacks.callback_functions import (
+    create_distance_matrix_plot,
+    populate_distance_matrix_row,
+)
+from dash_app.components.layouts import (
+    create_distance_matrix_result_layout,
+    create_result_base_layout,
+)
+
+
+def create_layout(config, analysis_id=None):
+    config_ids = config["ids"]
+    base = create_result_base_layout(
+        config["title"],
+        analysis_id,
+        config_ids["project_link"],
+        config_ids["analysis_id"],
+    )
+    content = create_distance_matrix_result_layout(
+        config_ids["metric_selector"],
+        config_ids["plot_content"],
+        config_ids["target_selector"],
+        config_ids["datatable"],
+        config_ids["metadata"],
+        config_ids["error_toast"],
+        config_ids["success_toast"],
+    )
+    return base + content
+
+
+def register_callback(config):
+    config_ids = config["ids"]
+
+    @callback(
+        Output(config_ids["plot_content"], "figure"),
+        Output(config_ids["target_selector"], "options"),
+        Output(config_ids["metadata"], "children"),
+        Output(config_ids["project_link"], "href"),
+        Output(config_ids["error_toast"], "children"),
+        Output(config_ids["error_toast"], "is_open"),
+        Input("switch", "value"),
+        Input(config_ids["metric_selector"], "value"),
+        State(config_ids["analysis_id"], "data"),
+    )
+    def create_plot(switch_on, metric, analysis_id):
+        try:
+            fig, target_options, metadata_rows, project_id = (
+                create_distance_matrix_plot(switch_on, analysis_id, metric)
+            )
+            return (
+                fig,
+                target_options,
+                [html.Tbody(metadata_rows)],
+                f"/dash/project/{project_id}",
+                dash.no_update,
+                False,
+            )
+        except ValueError as e:
+            return (
+                dash.no_update,
+                dash.no_update,
+                dash.no_update,
+                dash.no_update,
+                str(e),
+                True,
+            )
+
+    @callback(
+        Output(config_ids["target_selector"], "value"),
+        Input(config_ids["plot_content"], "clickData"),
+        prevent_initial_call=True,
+    )
+    def select_clicked_target(click_data):
+        if not click_data:
+            return dash.no_update
+        return click_data["points"][0]["y"]
+
+    @callback(
+        Output(config_ids["datatable"], "data"),
+        Output(config_ids["datatable"], "columns"),
+        Output(config_ids["error_toast"], "children", allow_duplicate=True),
+        Output(config_ids["error_toast"], "is_open", allow_duplicate=True),
+        Input(config_ids["target_selector"], "value"),
+        State(config_ids["analysis_id"], "data"),
+        prevent_initial_call=True,
+    )
+    def populate_table(target, analysis_id):
+        if target is None:
+            return [], [], dash.no_update, False
+
+        try:
+            df_dict, columns = populate_distance_matrix_row(analysis_id, target)
+            return df_dict, columns, dash.no_update, False
+        except ValueError as e:
+            return dash.no_update, dash.no_update, str(e), True
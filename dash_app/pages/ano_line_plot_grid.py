@@ -3,11 +3,13 @@ import io
 
 import dash
 import dash_bootstrap_components as dbc
-import polars as pl
 from dash import Input, Output, State, callback, dcc, html
 from PIL import Image
 
-from dash_app.callbacks.callback_functions import make_api_call
+from dash_app.callbacks.callback_functions import (
+    fetch_result_slice,
+    fetch_result_summary,
+)
 from dash_app.components.forms import plot_grid_image_form
 from dash_app.components.toasts import error_toast, success_toast
 from dash_app.utils.plots import create_line_level_plot_minimal, get_options
@@ -17,6 +19,8 @@ dash.register_page(
     path_template="/analysis/ano-line-level/<analysis_id>/grid",
 )
 
+_GRID_COLUMNS = ["seq_id", "run", "file_name", "line_number"]
+
 
 def layout(analysis_id=None, **kwargs):
 
@@ -73,20 +77,14 @@ def layout(analysis_id=None, **kwargs):
     Input("analysis-id-grid", "data"),
 )
 def get_data(analysis_id):
-    response, error = make_api_call({}, f"analyses/{analysis_id}?raw=true", "GET")
-
-    if error or response is None:
-        return dash.no_update, str(error), True
+    # Only the analysis id is kept in the browser, the selected seq_ids are
+    # fetched from the server side result store when the image is created.
+    try:
+        fetch_result_summary(analysis_id)
+    except ValueError as e:
+        return dash.no_update, str(e), True
 
-    df = pl.read_parquet(io.BytesIO(response.content))
-
-    buffer = io.BytesIO()
-    df.write_parquet(buffer)
-    buffer.seek(0)
-
-    encoded_df = base64.b64encode(buffer.read()).decode("utf-8")
-
-    return (encoded_df, dash.no_update, False)
+    return (analysis_id, dash.no_update, False)
 
 
 @callback(
@@ -97,15 +95,17 @@ def get_data(analysis_id):
     Input("stored-data-grid", "data"),
     prevent_initial_call=True,
 )
-def get_dropdown_options(encoded_df):
-    if not encoded_df:
+def get_dropdown_options(stored_analysis_id):
+    if not stored_analysis_id:
         return dash.no_update, dash.no_update, dash.no_update, dash.no_update
 
-    decoded_df = base64.b64decode(encoded_df)
-    df = pl.read_parquet(io.BytesIO(decoded_df))
-    file_options = get_options(df)
+    try:
+        summary = fetch_result_summary(stored_analysis_id)
+    except ValueError as e:
+        return dash.no_update, dash.no_update, str(e), True
 
-    pred_columns = sorted([col for col in df.columns if "pred_ano_proba" in col])
+    file_options = get_options(summary["seq_ids"])
+    pred_columns = sorted(summary["prediction_columns"])
     col_options = [{"label": col, "value": col} for col in pred_columns]
 
     return file_options, col_options, dash.no_update, False
@@ -125,8 +125,8 @@ def get_dropdown_options(encoded_df):
     State("cols-to-include", "value"),
     prevent_initial_call=True,
 )
-def generate_image(_, encoded_df, files_to_include, cols_to_include):
-    if not encoded_df or not files_to_include or not cols_to_include:
+def generate_image(_, stored_analysis_id, files_to_include, cols_to_include):
+    if not stored_analysis_id or not files_to_include or not cols_to_include:
         return (
             dash.no_update,
             dash.no_update,
@@ -148,13 +148,32 @@ def generate_image(_, encoded_df, files_to_include, cols_to_include):
             False,
         )
 
-    decoded_df = base64.b64decode(encoded_df)
-    df = pl.read_parquet(io.BytesIO(decoded_df))
-
-    figs = [
-        create_line_level_plot_minimal(df, seq_id, cols_to_include)
-        for seq_id in files_to_include
-    ]
+    # The grid only plots the selected prediction columns, so the log
+    # messages and enhanced columns are not fetched at all.
+    try:
+        columns = [
+            col
+            for col in fetch_result_summary(stored_analysis_id)["columns"]
+            if col in _GRID_COLUMNS or col in cols_to_include
+        ]
+        figs = [
+            create_line_level_plot_minimal(
+                fetch_result_slice(stored_analysis_id, seq_id, True, columns),
+                seq_id,
+                cols_to_include,
+            )
+            for seq_id in files_to_include
+        ]
+    except ValueError as e:
+        return (
+            dash.no_update,
+            dash.no_update,
+            dash.no_update,
+            str(e),
+            True,
+            dash.no_update,
+            False,
+        )
     base64_img = _create_image(figs)
 
     img_element = html.Img(
@@ -31,6 +31,9 @@ config = {
         "vectorizer_id": "vectorizer-dis-dir-new",
         "results_redirect_id": "results-redirect-dis-dir-new",
         "analysis_name_id": "analysis-name-dis-dir-new",
+        "matrix_id": "matrix-dis-dir-new",
+        "top_k_id": "top-k-dis-dir-new",
+        "nearest_id": "nearest-dis-dir-new",
     },
     "input_fields": [
         "directory_id",
@@ -41,6 +44,9 @@ config = {
         "mask_id",
         "results_redirect_id",
         "analysis_name_id",
+        "matrix_id",
+        "top_k_id",
+        "nearest_id",
     ],
 }
 
@@ -34,6 +34,9 @@ config = {
         "vectorizer_id": "vectorizer-dis-file-new",
         "results_redirect_id": "results-redirect-dis-file-new",
         "analysis_name_id": "analysis-name-dis-file-new",
+        "matrix_id": "matrix-dis-file-new",
+        "top_k_id": "top-k-dis-file-new",
+        "nearest_id": "nearest-dis-file-new",
     },
     "input_fields": [
         "directory_id",
@@ -44,6 +47,9 @@ config = {
         "mask_id",
         "results_redirect_id",
         "analysis_name_id",
+        "matrix_id",
+        "top_k_id",
+        "nearest_id",
     ],
 }
 
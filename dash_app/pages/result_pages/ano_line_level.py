@@ -1,11 +1,11 @@
-import base64
-import io
-
 import dash
-import polars as pl
 from dash import Input, Output, State, callback, html
 
-from dash_app.callbacks.callback_functions import make_api_call
+from dash_app.callbacks.callback_functions import (
+    fetch_result_slice,
+    fetch_result_summary,
+    make_api_call,
+)
 from dash_app.components.layouts import (
     create_ano_line_level_result_layout,
     create_result_base_layout,
@@ -48,24 +48,14 @@ def layout(analysis_id=None, **kwargs):
     Input("analysis-id-ano-line-res", "data"),
 )
 def get_data(analysis_id):
-    response, error = make_api_call({}, f"analyses/{analysis_id}", "GET")
-
-    if error or response is None:
-        return dash.no_update, str(error), True
-
-    df = pl.read_parquet(io.BytesIO(response.content))
-
-    # This is kind of a hacky way to get the dataframe semi efficiently
-    #  to the browsers memory. Converting to json is not really viable.
-    # Potential improvements would be to store it server side, since
-    #  this might not work so well with really large datasets.
-    buffer = io.BytesIO()
-    df.write_parquet(buffer)
-    buffer.seek(0)
-
-    encoded_df = base64.b64encode(buffer.read()).decode("utf-8")
+    # Only the analysis id is kept in the browser. The results stay in the
+    # server side result store and the callbacks fetch one seq_id at a time.
+    try:
+        fetch_result_summary(analysis_id)
+    except ValueError as e:
+        return dash.no_update, str(e), True
 
-    return (encoded_df, dash.no_update, False)
+    return (analysis_id, dash.no_update, False)
 
 
 @callback(
@@ -80,8 +70,8 @@ def get_data(analysis_id):
     State("analysis-id-ano-line-res", "data"),
     prevent_initial_call=True,
 )
-def generate_dropdown_and_metadata(encoded_df, analysis_id):
-    if not encoded_df:
+def generate_dropdown_and_metadata(stored_analysis_id, analysis_id):
+    if not stored_analysis_id:
         return (
             dash.no_update,
             dash.no_update,
@@ -91,9 +81,18 @@ def generate_dropdown_and_metadata(encoded_df, analysis_id):
             dash.no_update,
         )
 
-    decoded_df = base64.b64decode(encoded_df)
-    df = pl.read_parquet(io.BytesIO(decoded_df))
-    options = get_options(df)
+    try:
+        options = get_options(fetch_result_summary(stored_analysis_id)["seq_ids"])
+    except ValueError as e:
+        return (
+            dash.no_update,
+            dash.no_update,
+            dash.no_update,
+            str(e),
+            True,
+            dash.no_update,
+            dash.no_update,
+        )
 
     response, error = make_api_call({}, f"analyses/{analysis_id}/metadata", "GET")
     if error or response is None:
@@ -139,18 +138,22 @@ def generate_dropdown_and_metadata(encoded_df, analysis_id):
 @callback(
     Output("plot-content-ano-line-res", "figure"),
     Output("plot-content-ano-line-res", "style"),
+    Output("error-toast-ano-line-res", "children", allow_duplicate=True),
+    Output("error-toast-ano-line-res", "is_open", allow_duplicate=True),
     Input("plot-selector-ano-line-res", "value"),
     Input("switch", "value"),
     State("stored-data-ano-line-res", "data"),
     State("normalize-scores-store-ano-line-res", "data"),
     prevent_initial_call=True,
 )
-def render_plot(selected_plot, switch_on, encoded_df, normalize_scores):
-    if not encoded_df or not selected_plot:
-        return dash.no_update, dash.no_update
+def render_plot(selected_plot, switch_on, stored_analysis_id, normalize_scores):
+    if not stored_analysis_id or not selected_plot:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
 
-    decoded_df = base64.b64decode(encoded_df)
-    df = pl.read_parquet(io.BytesIO(decoded_df))
+    try:
+        df = fetch_result_slice(stored_analysis_id, selected_plot)
+    except ValueError as e:
+        return dash.no_update, dash.no_update, str(e), True
 
     theme = "plotly_white" if switch_on else "plotly_dark"
     style = {
@@ -164,23 +167,26 @@ def render_plot(selected_plot, switch_on, encoded_df, normalize_scores):
         df, selected_plot, theme, normalize_scores=normalize_scores
     )
 
-    return fig, style
+    return fig, style, dash.no_update, dash.no_update
 
 
 @callback(
     Output("datatable-ano-line-res", "data"),
     Output("datatable-ano-line-res", "columns"),
+    Output("error-toast-ano-line-res", "children", allow_duplicate=True),
+    Output("error-toast-ano-line-res", "is_open", allow_duplicate=True),
     Input("stored-data-ano-line-res", "data"),
     Input("plot-selector-ano-line-res", "value"),
     prevent_initial_call=True,
 )
-def populate_table(encoded_df, selected_plot):
-    if not encoded_df or not selected_plot:
-        return [], []
+def populate_table(stored_analysis_id, selected_plot):
+    if not stored_analysis_id or not selected_plot:
+        return [], [], dash.no_update, dash.no_update
 
-    df = pl.read_parquet(io.BytesIO(base64.b64decode(encoded_df))).filter(
-        pl.col("seq_id") == selected_plot
-    )
+    try:
+        df = fetch_result_slice(stored_analysis_id, selected_plot)
+    except ValueError as e:
+        return [], [], str(e), True
 
     # TODO: A better solution for filtering unwanted columns
     # this does not catch everything since column name is
@@ -201,7 +207,7 @@ def populate_table(encoded_df, selected_plot):
     )
 
     columns = [{"name": col, "id": col} for col in df.columns]
-    return df.to_dicts(), columns
+    return df.to_dicts(), columns, dash.no_update, dash.no_update
 
 
 @callback(
@@ -209,17 +215,22 @@ def populate_table(encoded_df, selected_plot):
     Output("datatable-ano-line-res", "selected_cells"),
     Output("datatable-ano-line-res", "active_cell"),
     Output("datatable-ano-line-res", "page_current"),
+    Output("error-toast-ano-line-res", "children", allow_duplicate=True),
+    Output("error-toast-ano-line-res", "is_open", allow_duplicate=True),
     Input("plot-content-ano-line-res", "clickData"),
     State("stored-data-ano-line-res", "data"),
+    State("plot-selector-ano-line-res", "value"),
     State("datatable-ano-line-res", "page_size"),
     prevent_initial_call=True,
 )
-def highlight_row_on_click(clickData, encoded_df, page_size):
-    if not clickData or not encoded_df:
-        return [], [], None, dash.no_update
+def highlight_row_on_click(clickData, stored_analysis_id, selected_plot, page_size):
+    if not clickData or not stored_analysis_id or not selected_plot:
+        return [], [], None, dash.no_update, dash.no_update, dash.no_update
 
-    decoded_df = base64.b64decode(encoded_df)
-    df = pl.read_parquet(io.BytesIO(decoded_df))
+    try:
+        df = fetch_result_slice(stored_analysis_id, selected_plot)
+    except ValueError as e:
+        return [], [], None, dash.no_update, str(e), True
 
     clicked_x = clickData["points"][0]["x"]
 
@@ -229,7 +240,7 @@ def highlight_row_on_click(clickData, encoded_df, page_size):
         selected_idx = None
 
     if selected_idx is None:
-        return [], [], None, dash.no_update
+        return [], [], None, dash.no_update, dash.no_update, dash.no_update
 
     page = selected_idx // page_size
 
@@ -242,4 +253,11 @@ def highlight_row_on_click(clickData, encoded_df, page_size):
         }
         selected_cells.append(cell)
 
-    return [selected_idx], selected_cells, selected_cells[0], page
+    return (
+        [selected_idx],
+        selected_cells,
+        selected_cells[0],
+        page,
+        dash.no_update,
+        dash.no_update,
+    )
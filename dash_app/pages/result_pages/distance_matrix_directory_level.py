@@ -0,0 +1,30 @@
+import dash
+from dash_app.page_templates.distance_matrix_result_page_base import (
+    create_layout,
+    register_callback,
+)
+
+config = {
+    "title": "Distance Matrix Directory Level",
+    "path_template": "/analysis/distance-matrix-directory-level/<analysis_id>",
+    "ids": {
+        "project_link": "project-link-dis-mat-dir-res",
+        "analysis_id": "analysis-id-dis-mat-dir-res",
+        "metric_selector": "metric-selector-dis-mat-dir-res",
+        "plot_content": "plot-content-dis-mat-dir-res",
+        "target_selector": "target-selector-dis-mat-dir-res",
+        "datatable": "datatable-dis-mat-dir-res",
+        "metadata": "metadata-dis-mat-dir-res",
+        "error_toast": "error-toast-dis-mat-dir-res",
+        "success_toast": "success-toast-dis-mat-dir-res",
+    },
+}
+
+dash.register_page(__name__, path_template=config["path_template"])
+
+
+def layout(analysis_id=None, **kwargs):
+    return create_layout(config, analysis_id)
+
+
+register_callback(config)
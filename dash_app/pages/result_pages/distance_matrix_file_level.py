@@ -0,0 +1,30 @@
+import dash
+from dash_app.page_templates.distance_matrix_result_page_base import (
+    create_layout,
+    register_callback,
+)
+
+config = {
+    "title": "Distance Matrix File Level",
+    "path_template": "/analysis/distance-matrix-file-level/<analysis_id>",
+    "ids": {
+        "project_link": "project-link-dis-mat-file-res",
+        "analysis_id": "analysis-id-dis-mat-file-res",
+        "metric_selector": "metric-selector-dis-mat-file-res",
+        "plot_content": "plot-content-dis-mat-file-res",
+        "target_selector": "target-selector-dis-mat-file-res",
+        "datatable": "datatable-dis-mat-file-res",
+        "metadata": "metadata-dis-mat-file-res",
+        "error_toast": "error-toast-dis-mat-file-res",
+        "success_toast": "success-toast-dis-mat-file-res",
+    },
+}
+
+dash.register_page(__name__, path_template=config["path_template"])
+
+
+def layout(analysis_id=None, **kwargs):
+    return create_layout(config, analysis_id)
+
+
+register_callback(config)
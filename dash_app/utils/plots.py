@@ -2,9 +2,8 @@ import polars as pl
 import plotly.graph_objects as go
 
 
-def get_options(df) -> list[dict]:
-    seq_ids = sorted(df["seq_id"].unique().to_list())
-    return [{"label": seq_id, "value": seq_id} for seq_id in seq_ids]
+def get_options(seq_ids) -> list[dict]:
+    return [{"label": seq_id, "value": seq_id} for seq_id in sorted(seq_ids)]
 
 
 def create_line_level_plot(
@@ -284,6 +283,33 @@ def create_umap_plot(df, group_col, color_by_directory=False, theme="plotly_whit
     return fig
 
 
+def create_distance_heatmap(df, metric, theme="plotly_white"):
+    fig = go.Figure()
+
+    fig.add_trace(
+        go.Heatmap(
+            z=df[metric].to_numpy(),
+            x=df["run"],
+            y=df["run"],
+            colorscale="Viridis",
+            colorbar=dict(title=metric.capitalize()),
+            hovertemplate="Target: %{y}<br>Comparison: %{x}<br>Distance: %{z}<extra></extra>",
+        )
+    )
+
+    fig.update_layout(
+        title=f"{metric.capitalize()} distance",
+        xaxis_title="Comparison",
+        yaxis_title="Target",
+        template=theme,
+    )
+
+    fig.update_xaxes(showticklabels=df.height <= 50)
+    fig.update_yaxes(showticklabels=df.height <= 50, autorange="reversed")
+
+    return fig
+
+
 def _wrap_log(text, width=80):
     return "<br>".join([text[i : i + width] for i in range(0, len(text), width)])
 
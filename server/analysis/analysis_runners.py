@@ -12,7 +12,11 @@ from server.analysis.utils.file_level_analysis import (
 from server.analysis.utils.line_level_analysis import (
     calculate_moving_average_by_columns,
 )
-from server.analysis.utils.log_distance import measure_distances
+from server.analysis.utils.log_distance import (
+    measure_distance_matrix,
+    measure_distances,
+)
+from server.analysis.utils.result_files import LINE_LEVEL_LAYOUT
 from server.analysis.utils.run_level_analysis import (
     aggregate_run_level,
     calculate_zscore_sum_anos,
@@ -23,7 +27,17 @@ from server.analysis.utils.umap_analysis import create_umap_df, create_umap_embe
 from server.models.settings import Settings
 from server.analysis.utils.analysis_helpers import (
     create_vectorizer,
+    fingerprint_data,
+    get_analyzer_options,
+    get_compression_distance_options,
+    get_enhancer_options,
+    get_loader_options,
+    get_log_distance_options,
+    get_minhash_options,
+    get_template_model_path,
+    get_umap_options,
     load_data,
+    scan_data,
     store_and_format_result,
 )
 
@@ -35,7 +49,7 @@ def run_file_count_analysis(
     log=lambda msg: None,
 ) -> dict:
     log(f"Loading data from directory: {directory_path}")
-    df = load_data(directory_path)
+    df = load_data(directory_path, columns=["run", "file_name"])
 
     log("Counting files and lines")
     result = files_and_lines_count(df)
@@ -65,8 +79,9 @@ def run_unique_terms_analysis(
     mask_type: str | None,
     log=lambda msg: None,
 ) -> dict:
-    log(f"Loading data from directory: {directory_path}")
-    df = load_data(directory_path)
+    # The data is only scanned here, it is collected one chunk at a time
+    log(f"Scanning data from directory: {directory_path}")
+    df = scan_data(directory_path, columns=["run", "seq_id", "m_message"])
     if not file_level:
         log("Counting unique terms by directory")
         unique_terms_count = unique_terms_count_by_run(df, item_list_col, mask_type)
@@ -105,10 +120,18 @@ def run_umap_analysis(
     file_level: bool,
     vectorizer: str,
     mask_type: str | None,
+    svd_components: int | None = None,
+    sample_size: int | None = None,
     log=lambda msg: None,
 ) -> dict:
+    umap_options = get_umap_options()
+    if svd_components is None:
+        svd_components = umap_options["svd_components"]
+    if sample_size is None:
+        sample_size = umap_options["sample_size"]
+
     log(f"Loading data from directory: {directory_path}")
-    df = load_data(directory_path)
+    df = load_data(directory_path, columns=["run", "seq_id", "m_message"])
 
     log(f"Creating {vectorizer} vectorizer")
     vectorizer_object = create_vectorizer(vectorizer)
@@ -118,14 +141,18 @@ def run_umap_analysis(
 
     log(f"Aggregating data with function: {aggregate_func}")
     df_agg = (
-        aggregate_func(df, item_list_col, mask_type)
+        aggregate_func(
+            df, item_list_col, mask_type, enhancer_options=get_enhancer_options()
+        )
         .select(item_list_col)
         .to_series()
         .to_list()
     )
 
     log("Creating umap embeddings")
-    embeddings = create_umap_embeddings(df_agg, vectorizer_object)
+    embeddings = create_umap_embeddings(
+        df_agg, vectorizer_object, svd_components, sample_size
+    )
 
     log("Creating umap dataframe")
     umap_df = create_umap_df(df, embeddings, group_col=group_col)
@@ -158,12 +185,15 @@ def run_log_distance_analysis(
     project_id: int,
     analysis_name: str | None,
     directory_path: str,
-    target_run: str,
+    target_run: str | None,
     comparison_runs: list[str] | None,
     item_list_col: str,
     file_level: bool,
     mask_type: str | None,
     vectorizer: str,
+    matrix: bool = False,
+    top_k: int | None = None,
+    nearest: str = "similar",
     log=lambda msg: None,
 ) -> dict:
     log("Getting match filenames setting")
@@ -174,12 +204,22 @@ def run_log_distance_analysis(
     vectorizer_object = create_vectorizer(vectorizer)
 
     log("Loading data")
-    enhancer = Enhancer(load_data(directory_path))
+    enhancer = Enhancer(
+        load_data(
+            directory_path, columns=["run", "file_name", "orig_file_name", "m_message"]
+        ),
+        **get_enhancer_options(),
+    )
 
     log(f"Enhancing data with enhancement: {item_list_col} and mask: {mask_type}")
     df = enhancer.enhance_event(item_list_col, mask_type)
 
-    match_flag = file_level and comparison_runs in (None, []) and match_filenames
+    match_flag = (
+        not matrix
+        and file_level
+        and comparison_runs in (None, [])
+        and match_filenames
+    )
     if match_flag:
         # FIX: not an optimal way to get filename
         log("Matching filenames")
@@ -188,28 +228,62 @@ def run_log_distance_analysis(
 
     run_column = "run" if not file_level else "orig_file_name"
 
-    log("Measuring distances")
-    df_distances = measure_distances(
-        df,
-        item_list_col,
-        target_run,
-        run_column=run_column,
-        comparison_runs=comparison_runs,
-        vectorizer=vectorizer_object,
-    )
+    minhash_options = None
+    if top_k is not None:
+        # The sketches are keyed on the source files and enhancement, so the
+        # data is not hashed again on every query.
+        minhash_options = {
+            **get_minhash_options(),
+            "key": fingerprint_data(
+                directory_path,
+                *enhancer.options_key(item_list_col, mask_type),
+                target_file_name if match_flag else None,
+            ),
+        }
+
+    log_distance_options = get_log_distance_options()
+    compression_options = get_compression_distance_options()
+    if matrix:
+        log("Measuring distances between all pairs")
+        df_distances = measure_distance_matrix(
+            df,
+            item_list_col,
+            vectorizer_object,
+            run_column=run_column,
+            runs=comparison_runs,
+            compression_options=compression_options,
+            **log_distance_options,
+        )
+    else:
+        log("Measuring distances")
+        df_distances = measure_distances(
+            df,
+            item_list_col,
+            target_run,
+            run_column=run_column,
+            comparison_runs=comparison_runs,
+            vectorizer=vectorizer_object,
+            workers=log_distance_options["workers"],
+            compression_options=compression_options,
+            top_k=top_k,
+            dissimilar=nearest == "dissimilar",
+            minhash_options=minhash_options,
+        )
 
     log("Storing and formatting results")
     metadata = {
         "analysis_level": "directory" if not file_level else "file",
-        "analysis_sub_type": "log-distance",
+        "analysis_sub_type": "log-distance-matrix" if matrix else "log-distance",
         "mask_type": mask_type,
         "vectorizer": vectorizer,
         "directory_path": directory_path,
-        "target": target_run,
+        "target": None if matrix else target_run,
         "match_filenames": match_filenames if match_flag else None,
         "name": analysis_name,
     }
     analysis_type = "distance-file-level" if file_level else "distance-directory-level"
+    if matrix:
+        analysis_type = analysis_type.replace("distance-", "distance-matrix-")
 
     result = store_and_format_result(df_distances, project_id, analysis_type, metadata)
 
@@ -263,6 +337,12 @@ def run_anomaly_detection_analysis(
         files_to_include=files_to_include,
         files_to_include_train=files_to_include_train,
         mask_type=mask_type,
+        loader_options=get_loader_options(),
+        enhancer_options=get_enhancer_options(),
+        template_model_path=get_template_model_path(
+            project_id, mask_type, item_list_col
+        ),
+        analyzer_options=get_analyzer_options(),
     )
 
     log("Loading data")
@@ -330,7 +410,13 @@ def run_anomaly_detection_analysis(
     }
 
     log("Storing and formatting results")
-    result = store_and_format_result(results, project_id, analysis_type, metadata)
+    result = store_and_format_result(
+        results,
+        project_id,
+        analysis_type,
+        metadata,
+        layout=LINE_LEVEL_LAYOUT if level == "line" else None,
+    )
 
     log("Analysis complete")
     del pipeline
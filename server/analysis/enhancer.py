@@ -1,44 +1,166 @@
+from importlib.metadata import version
+
 from loglead.enhancers import EventLogEnhancer
 import polars as pl
+from server.analysis.utils.data_cache import fingerprint_series
+from server.analysis.utils.masking import mask_messages
+from server.analysis.utils.parsing import parse_events
 from server.analysis.regex_masks.myllari import MYLLARI
 from server.analysis.regex_masks.myllari_extended import MYLLARI_EXTENDED
 from server.analysis.regex_masks.drain_loglead import DRAIN_LOGLEAD
 from server.analysis.regex_masks.drain_orig import DRAIN_ORIG
 
+PARSER_COLUMNS = [
+    "e_event_drain_id",
+    "e_event_tip_id",
+    "e_event_brain_id",
+    "e_event_pliplom_id",
+    "e_event_iplom_id",
+]
+
 
 class Enhancer:
-    def __init__(self, df):
+    def __init__(
+        self,
+        df,
+        cache=None,
+        template_model=None,
+        deduplicate_parsing=False,
+        parse_mode="serial",
+        parse_workers=1,
+        parse_sample_size=100_000,
+    ):
         self._df = df
+        self._cache = cache
+        self._template_model = template_model
+        self._options = {
+            "deduplicate_parsing": deduplicate_parsing,
+            "parse_mode": parse_mode,
+            "parse_workers": parse_workers,
+            "parse_sample_size": parse_sample_size,
+        }
 
     def enhance_event(self, item_list_col="e_words", mask_type=None) -> pl.DataFrame:
-        enhancer = EventLogEnhancer(self._df)
+        # The event ids of a template model depend on what it has learned
+        # before, so they can not be cached.
+        if self._cache is None or (
+            self._template_model is not None and item_list_col in PARSER_COLUMNS
+        ):
+            return self._enhance_event(item_list_col, mask_type)
+
+        # Only the columns added by the enhancement are cached. They depend on
+        # nothing but the messages, their order and the enhancement settings.
+        cache_key = fingerprint_series(
+            self._df["m_message"], *self.options_key(item_list_col, mask_type)
+        )
+        enhanced = self._cache.get(cache_key)
+        if enhanced is not None:
+            self._df = self._df.with_columns(enhanced.get_columns())
+            return self._df
+
+        original_columns = set(self._df.columns)
+        self._enhance_event(item_list_col, mask_type)
+        self._cache.put(
+            cache_key,
+            self._df.select(
+                [col for col in self._df.columns if col not in original_columns]
+            ),
+        )
+
+        return self._df
+
+    def options_key(self, item_list_col="e_words", mask_type=None) -> tuple:
+        """Everything besides the messages that the enhanced columns depend on."""
+        return (
+            "enhanced",
+            version("loglead"),
+            item_list_col,
+            mask_type,
+            self._get_regex_mask(mask_type),
+            self._parse_key() if item_list_col in PARSER_COLUMNS else None,
+        )
 
+    def _parse_key(self):
+        # Options that do not change the parse are left out, so that equal
+        # results share one cache entry.
+        options = dict(self._options)
+        if options["parse_mode"] == "serial":
+            del options["parse_workers"]
+        if options["parse_mode"] != "sample":
+            del options["parse_sample_size"]
+        return sorted(options.items())
+
+    def _enhance_event(self, item_list_col, mask_type) -> pl.DataFrame:
         regex_mask = self._get_regex_mask(mask_type)
         if regex_mask:
-            self._df = enhancer.normalize(regex_mask)
+            self._df = self._enhance_unique(
+                "m_message",
+                lambda enhancer: enhancer.df.with_columns(
+                    mask_messages(enhancer.df["m_message"], regex_mask)
+                ),
+            )
 
         field = "e_message_normalized" if regex_mask else "m_message"
 
         if item_list_col == "e_words":
-            self._df = enhancer.words(field)
+            # Splitting is cheaper than joining the lists back
+            self._df = EventLogEnhancer(self._df).words(field)
         elif item_list_col == "e_trigrams":
-            self._df = enhancer.trigrams(field)
-        elif item_list_col == "e_event_drain_id":
-            self._df = enhancer.parse_drain(field)
-        elif item_list_col == "e_event_tip_id":
-            self._df = enhancer.parse_tip(field)
-        elif item_list_col == "e_event_brain_id":
-            self._df = enhancer.parse_brain(field)
-        elif item_list_col == "e_event_pliplom_id":
-            self._df = enhancer.words(field)
-            self._df = enhancer.parse_pliplom(field)
-        elif item_list_col == "e_event_iplom_id":
-            self._df = enhancer.parse_iplom(field)
+            self._df = self._enhance_unique(
+                field, lambda enhancer: enhancer.trigrams(field)
+            )
+        elif item_list_col in PARSER_COLUMNS and self._template_model is not None:
+            self._df = self._enhance_unique(
+                field,
+                lambda enhancer: enhancer.df.with_columns(
+                    self._template_model.parse(
+                        enhancer.df[field], self._options["parse_workers"]
+                    ).alias(item_list_col)
+                ),
+            )
+        elif item_list_col in PARSER_COLUMNS:
+
+            def parse(enhancer):
+                return parse_events(
+                    enhancer,
+                    item_list_col,
+                    field,
+                    mode=self._options["parse_mode"],
+                    workers=self._options["parse_workers"],
+                    sample_size=self._options["parse_sample_size"],
+                )
+
+            if self._options["deduplicate_parsing"]:
+                self._df = self._enhance_unique(field, parse)
+            else:
+                self._df = parse(EventLogEnhancer(self._df))
         else:
             raise ValueError(f"Unsupported enhance: {item_list_col}")
 
         return self._df
 
+    def _enhance_unique(self, column, enhance) -> pl.DataFrame:
+        """Run enhance on the distinct values of column and join the result back.
+
+        Only valid for enhancements that depend on nothing but the value of
+        column on each row.
+        """
+        unique = self._df.select(pl.col(column).unique(maintain_order=True))
+        if unique.height == self._df.height:
+            return enhance(EventLogEnhancer(self._df))
+
+        enhanced = enhance(EventLogEnhancer(unique))
+        # row_nr is added by some of the parsers and refers to the distinct rows
+        enhanced = enhanced.drop("row_nr", strict=False)
+
+        return self._df.join(
+            enhanced,
+            on=column,
+            how="left",
+            maintain_order="left",
+            nulls_equal=True,
+        )
+
     def _get_regex_mask(self, mask_type):
         masks_map = {
             "myllari": MYLLARI,
@@ -1,22 +1,83 @@
+import glob
+import hashlib
+import io
 import os
 import polars as pl
 from loglead.loaders import LO2Loader, RawLoader
+from server.analysis.utils.data_cache import fingerprint_files
+from server.analysis.utils.data_filtering import filter_files, filter_runs
+from server.analysis.utils.parallel import map_in_processes
+
+# Below this many bytes the cost of starting worker processes outweighs the
+# time saved by parsing in parallel.
+_PARALLEL_MIN_BYTES = 256 * 1024 * 1024
+
+# Bytes before the last parsed offset that are hashed to detect rewritten files.
+_TAIL_HASH_BYTES = 4096
+
+_MANIFEST_SCHEMA = {
+    "path": pl.String,
+    "size": pl.Int64,
+    "mtime_ns": pl.Int64,
+    "offset": pl.Int64,
+    "tail_hash": pl.String,
+    "chunk_key": pl.String,
+}
 
 
 class Loader:
-    def __init__(self, directory_path, log_format="raw"):
+    def __init__(
+        self,
+        directory_path,
+        log_format="raw",
+        cache=None,
+        incremental=False,
+        workers=1,
+        shard_by="size",
+    ):
         self._directory_path = directory_path
         self._log_format = log_format
+        self._cache = cache
+        self._incremental = incremental
+        self._workers = workers
+        self._shard_by = shard_by
         self._df = None
 
     def load(self):
+        self._df = self.scan().collect()
+
+    def scan(self, runs=None, files=None, columns=None) -> pl.LazyFrame:
+        """Return the log data as a LazyFrame.
+
+        Run and file filters are applied to the file list before anything is
+        read, so excluded files are never parsed. If columns are given, only
+        those columns are collected.
+        """
         if self._log_format == "lo2":
-            self._load_lo2()
+            lf = self._load_lo2().lazy()
+            if runs is not None:
+                lf = filter_runs(lf, runs)
+            elif files is not None:
+                lf = filter_files(lf, files)
         elif self._log_format == "raw":
-            self._load_raw()
+            lf = self._scan_raw(runs, files)
         else:
             raise ValueError(f"Unsupported log format: {self._log_format}")
 
+        if columns is not None:
+            lf = lf.select(columns)
+
+        return lf
+
+    def fingerprint(self, *extra) -> str:
+        """Cache key of the files the loader reads, without reading them."""
+        return fingerprint_files(
+            list_log_files(self._directory_path),
+            self._directory_path,
+            self._log_format,
+            *extra,
+        )
+
     def _load_lo2(self):
         loader = LO2Loader(self._directory_path)
 
@@ -28,7 +89,7 @@ class Loader:
                 f"Error: No data loaded. Check your directory path ({self._directory_path}) and data format."
             )
 
-        self._df = loader.df
+        return loader.df
 
     # Asumes format:
     # log_data_root/
@@ -39,21 +100,233 @@ class Loader:
     #   run-n/
     #       example-z.log
 
-    def _load_raw(self):
-        pattern = "*.log" if os.path.isdir(self._directory_path) else None
-        loader = RawLoader(
-            self._directory_path,
-            filename_pattern=pattern,
-            strip_full_data_path=self._directory_path,
+    def _scan_raw(self, runs=None, files=None):
+        file_paths = self._select_files(
+            list_log_files(self._directory_path), runs, files
         )
-        df = loader.execute()
+        if not file_paths:
+            raise ValueError(
+                f"Error: No data loaded. Check your directory path ({self._directory_path}) and filters."
+            )
 
-        if loader.df is None:
+        if self._cache is None:
+            return self._scan_raw_files(file_paths)
+
+        if self._incremental and os.path.isdir(self._directory_path):
+            return self._load_raw_incremental(file_paths).lazy()
+
+        cache_key = fingerprint_files(
+            file_paths, self._directory_path, self._log_format
+        )
+        lf = self._cache.scan(cache_key)
+        if lf is None:
+            df = self._scan_raw_files(file_paths).collect()
+            self._cache.put(cache_key, df)
+            lf = df.lazy()
+
+        return lf
+
+    def _scan_raw_files(self, file_paths):
+        if self._use_parallel(file_paths):
+            return self._parse_raw_files_parallel(file_paths).lazy()
+
+        is_file = os.path.isfile(self._directory_path)
+        queries = [self._scan_raw_file(path, is_file) for path in file_paths]
+
+        return self._prepare_raw_data(pl.concat(queries))
+
+    def _use_parallel(self, file_paths):
+        if self._parallel_workers() <= 1 or len(file_paths) <= 1:
+            return False
+
+        total_size = sum(os.path.getsize(path) for path in file_paths)
+        return total_size >= _PARALLEL_MIN_BYTES
+
+    def _parallel_workers(self):
+        return min(self._workers, os.cpu_count() or 1)
+
+    # Every file has its own seq_id, so the files can be prepared separately
+    # and concatenated back in the original order with the same line numbers.
+    def _parse_raw_files_parallel(self, file_paths):
+        shards = self._shard_files(file_paths)
+        results = map_in_processes(
+            _parse_raw_shard,
+            [(self._directory_path, shard) for shard in shards],
+            workers=self._parallel_workers(),
+        )
+
+        frames = sorted(
+            (item for shard_result in results for item in shard_result),
+            key=lambda item: item[0],
+        )
+        return pl.concat([df for _, df in frames], rechunk=False)
+
+    def _shard_files(self, file_paths):
+        indexed_paths = list(enumerate(file_paths))
+
+        if self._shard_by == "run":
+            shards = {}
+            for index, path in indexed_paths:
+                shards.setdefault(self._run_of(path), []).append((index, path))
+            return list(shards.values())
+
+        if self._shard_by == "size":
+            # Largest files first onto the currently smallest shard.
+            shard_count = min(self._parallel_workers() * 4, len(file_paths))
+            shards = [[] for _ in range(shard_count)]
+            shard_sizes = [0] * shard_count
+            for index, path in sorted(
+                indexed_paths, key=lambda item: os.path.getsize(item[1]), reverse=True
+            ):
+                smallest = shard_sizes.index(min(shard_sizes))
+                shards[smallest].append((index, path))
+                shard_sizes[smallest] += os.path.getsize(path)
+            return [shard for shard in shards if shard]
+
+        raise ValueError(f"Unsupported shard strategy: {self._shard_by}")
+
+    # Same reader settings RawLoader uses for each log file.
+    def _scan_raw_file(self, path, is_file=False):
+        lf = pl.scan_csv(
+            path,
+            has_header=False,
+            schema={"column_1": pl.String},
+            infer_schema=False,
+            quote_char=None,
+            separator=RawLoader._csv_separator,
+            encoding="utf8-lossy",
+            include_file_paths=None if is_file else "file_name",
+            truncate_ragged_lines=True,
+        )
+        if not is_file:
+            lf = lf.with_columns(
+                pl.col("file_name").alias("orig_file_name"),
+                pl.col("file_name")
+                .str.strip_prefix(self._directory_path)
+                .alias("file_name"),
+            )
+
+        return lf.rename({"column_1": "m_message"})
+
+    def _select_files(self, file_paths, runs=None, files=None):
+        if runs is not None:
+            runs = set(runs)
+            return [path for path in file_paths if self._run_of(path) in runs]
+        if files is not None:
+            files = set(files)
+            return [path for path in file_paths if path in files]
+        return file_paths
+
+    # Mirrors the run column derived in _prepare_raw_data.
+    def _run_of(self, path):
+        if os.path.isfile(self._directory_path):
+            return path
+
+        relative_path = path.removeprefix(self._directory_path).strip("/")
+        return relative_path.split("/", 1)[0]
+
+    # Keeps a manifest of every parsed file (size, mtime, byte offset of the last
+    # parsed line) and a cached chunk of prepared rows per file. Unchanged files
+    # are read from their chunk, appended files are parsed from the stored
+    # offset and deleted files are dropped.
+    def _load_raw_incremental(self, file_paths):
+        manifest_key = fingerprint_files(
+            [], "manifest", self._directory_path, self._log_format
+        )
+        manifest = self._cache.get(manifest_key)
+        previous_entries = (
+            {row["path"]: row for row in manifest.iter_rows(named=True)}
+            if manifest is not None
+            else {}
+        )
+
+        frames = []
+        entries = []
+        for path in file_paths:
+            entry, df_file = self._load_file_incremental(
+                path, previous_entries.get(path)
+            )
+            entries.append(entry)
+            if not df_file.is_empty():
+                frames.append(df_file)
+
+        if not frames:
             raise ValueError(
                 f"Error: No data loaded. Check your directory path ({self._directory_path}) and data format."
             )
 
-        self._df = self._prepare_raw_data(df)
+        # Keep the entries of files that were filtered out of this load.
+        selected = set(file_paths)
+        entries += [
+            entry
+            for path, entry in previous_entries.items()
+            if path not in selected and os.path.exists(path)
+        ]
+        self._cache.put(manifest_key, pl.DataFrame(entries, schema=_MANIFEST_SCHEMA))
+
+        return pl.concat(frames)
+
+    def _load_file_incremental(self, path, previous):
+        stat = os.stat(path)
+        offset = _last_line_end(path, stat.st_size)
+
+        chunk = None
+        start = 0
+        if previous is not None and stat.st_size >= previous["offset"]:
+            unchanged = (
+                stat.st_size == previous["size"]
+                and stat.st_mtime_ns == previous["mtime_ns"]
+            )
+            if unchanged or _tail_hash(path, previous["offset"]) == previous["tail_hash"]:
+                chunk = self._cache.get(previous["chunk_key"])
+                start = previous["offset"] if chunk is not None else 0
+
+        if chunk is None or start < offset:
+            parsed = self._read_raw_range(
+                path, start, offset, chunk.height if chunk is not None else 0
+            )
+            chunk = pl.concat([chunk, parsed]) if chunk is not None else parsed
+
+        tail_hash = _tail_hash(path, offset)
+        chunk_key = fingerprint_files(
+            [], "chunk", self._directory_path, path, offset, tail_hash
+        )
+        if previous is None or previous["chunk_key"] != chunk_key:
+            self._cache.put(chunk_key, chunk)
+
+        # A trailing line without a newline may still be written to, so it is
+        # parsed on every load but never stored in the chunk.
+        df_file = chunk
+        if offset < stat.st_size:
+            partial = self._read_raw_range(path, offset, stat.st_size, chunk.height)
+            df_file = pl.concat([chunk, partial])
+
+        entry = {
+            "path": path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "offset": offset,
+            "tail_hash": tail_hash,
+            "chunk_key": chunk_key,
+        }
+        return entry, df_file
+
+    def _read_raw_range(self, path, start, end, line_offset=0):
+        with open(path, "rb") as file:
+            file.seek(start)
+            data = file.read(end - start)
+
+        df = _read_raw_bytes(data)
+        df = df.with_columns(pl.lit(path).alias("file_name"))
+        df = df.with_columns(
+            pl.col("file_name").alias("orig_file_name"),
+            pl.col("file_name")
+            .str.strip_prefix(self._directory_path)
+            .alias("file_name"),
+        )
+        df = self._prepare_raw_data(df)
+
+        return df.with_columns(pl.col("line_number") + line_offset)
 
     def _prepare_raw_data(self, df):
         is_file = os.path.isfile(self._directory_path)
@@ -108,3 +381,75 @@ class Loader:
     @df.setter
     def df(self, new_df):
         self._df = new_df
+
+
+def list_log_files(directory_path, pattern="*.log") -> list[str]:
+    """List the files RawLoader would read, in the order it reads them."""
+    if os.path.isfile(directory_path):
+        return [directory_path]
+
+    if not os.path.isdir(directory_path):
+        raise FileNotFoundError(f"No such file or directory: {directory_path}")
+
+    files = []
+    for subdir, _, _ in os.walk(directory_path):
+        for file in glob.glob(os.path.join(subdir, pattern)):
+            if os.path.getsize(file) > 0:
+                files.append(file)
+
+    return files
+
+
+def _parse_raw_shard(args) -> list[tuple[int, pl.DataFrame]]:
+    directory_path, shard = args
+    loader = Loader(directory_path)
+    is_file = os.path.isfile(directory_path)
+
+    return [
+        (
+            index,
+            loader._prepare_raw_data(loader._scan_raw_file(path, is_file)).collect(),
+        )
+        for index, path in shard
+    ]
+
+
+def _read_raw_bytes(data: bytes) -> pl.DataFrame:
+    # Same reader settings RawLoader uses for a single log file.
+    if not data:
+        return pl.DataFrame(schema={"m_message": pl.String})
+
+    df = pl.read_csv(
+        io.BytesIO(data),
+        has_header=False,
+        schema={"column_1": pl.String},
+        infer_schema=False,
+        quote_char=None,
+        separator=RawLoader._csv_separator,
+        encoding="utf8-lossy",
+        truncate_ragged_lines=True,
+    )
+    return df.rename({"column_1": "m_message"})
+
+
+def _last_line_end(path, size, block_size=65536) -> int:
+    """Return the byte offset just past the last newline in the file."""
+    with open(path, "rb") as file:
+        position = size
+        while position > 0:
+            read_from = max(0, position - block_size)
+            file.seek(read_from)
+            block = file.read(position - read_from)
+            index = block.rfind(b"\n")
+            if index != -1:
+                return read_from + index + 1
+            position = read_from
+
+    return 0
+
+
+def _tail_hash(path, offset) -> str:
+    with open(path, "rb") as file:
+        start = max(0, offset - _TAIL_HASH_BYTES)
+        file.seek(start)
+        return hashlib.sha1(file.read(offset - start)).hexdigest()
@@ -1,8 +1,13 @@
+import os
+
 import polars as pl
 from server.analysis.loader import Loader
-from server.analysis.enhancer import Enhancer
+from server.analysis.enhancer import PARSER_COLUMNS, Enhancer
 from server.analysis.log_analyzer import LogAnalyzer
-from .utils.data_filtering import filter_runs, filter_files
+from server.analysis.utils.analysis_helpers import get_data_cache
+from server.analysis.utils.parallel import map_in_processes
+from server.analysis.utils.parsing import TemplateModel
+from server.analysis.utils.tokens import TokenDictionary
 from .utils.run_level_analysis import aggregate_run_level
 from .utils.file_level_analysis import (
     aggregate_file_level,
@@ -24,6 +29,10 @@ class ManualTrainTestPipeline:
         files_to_include=None,
         files_to_include_train=None,
         mask_type=None,
+        loader_options=None,
+        enhancer_options=None,
+        template_model_path=None,
+        analyzer_options=None,
     ):
 
         self._model_names = model_names
@@ -42,43 +51,66 @@ class ManualTrainTestPipeline:
         self._mask_type = mask_type
         self._vectorizer = vectorizer
 
+        self._loader_options = loader_options or {}
+        self._enhancer_options = enhancer_options or {}
+        self._template_model_path = template_model_path
+        self._analyzer_options = analyzer_options or {}
+        self._token_dictionary = None
+
         self._df_test = None
         self._df_train = None
 
         self._results = None
 
     def load(self):
-        self._df_train = self._load_test_train(self._train_data_path)
-        self._df_test = self._load_test_train(self._test_data_path)
-
-        if self._runs_to_include is not None:
-            self._df_test = filter_runs(self._df_test, self._runs_to_include)
-        elif self._files_to_include is not None:
-            self._df_test = filter_files(self._df_test, self._files_to_include)
-
-        if self._runs_to_include_train is not None:
-            self._df_train = filter_runs(self._df_train, self._runs_to_include_train)
-        elif self._files_to_include_train is not None:
-            self._df_train = filter_files(self._df_train, self._files_to_include_train)
+        self._df_train = self._load_test_train(
+            self._train_data_path,
+            self._runs_to_include_train,
+            self._files_to_include_train,
+        )
+        self._df_test = self._load_test_train(
+            self._test_data_path, self._runs_to_include, self._files_to_include
+        )
 
-    def _load_test_train(self, directory_path):
-        loader = Loader(directory_path, self._log_format)
-        loader.load()
+    def _load_test_train(self, directory_path, runs=None, files=None):
+        loader = Loader(directory_path, self._log_format, **self._loader_options)
 
-        return loader.df
+        # Runs take precedence over files, filtering is done before parsing
+        return loader.scan(
+            runs=runs, files=files if runs is None else None
+        ).collect()
 
     def enhance(self):
-        self._df_test = self._enhance_test_train(self._df_test)
-        self._df_train = self._enhance_test_train(self._df_train)
-
-    def _enhance_test_train(self, df):
-        enhancer = Enhancer(df)
+        # Train is parsed first so that the test data is matched against the
+        # templates learned from it.
+        if self._template_model_path is None or (
+            self._item_list_col not in PARSER_COLUMNS
+        ):
+            self._df_train = self._enhance_test_train(self._df_train)
+            self._df_test = self._enhance_test_train(self._df_test)
+            return
+
+        with TemplateModel.locked(
+            self._template_model_path, self._item_list_col
+        ) as template_model:
+            self._df_train = self._enhance_test_train(self._df_train, template_model)
+        self._df_test = self._enhance_test_train(self._df_test, template_model)
+
+    def _enhance_test_train(self, df, template_model=None):
+        enhancer = Enhancer(
+            df, template_model=template_model, **self._enhancer_options
+        )
         enhancer.enhance_event(self._item_list_col, self._mask_type)
 
         return enhancer.df
 
     def analyze(self):
-        analyzer = LogAnalyzer(item_list_col=self._item_list_col)
+        analyzer = LogAnalyzer(
+            item_list_col=self._item_list_col,
+            token_dictionary=self._token_dictionary,
+            cache=get_data_cache("matrices"),
+            model_workers=self._analyzer_options.get("model_workers", 1),
+        )
         analyzer.manual_train_split(self._df_train, self._df_test, self._vectorizer)
 
         self._results = analyzer.run_models(self._model_names)
@@ -89,24 +121,42 @@ class ManualTrainTestPipeline:
         if not common_file_names or len(common_file_names) == 0:
             raise ValueError("No common file names found. Try changing settings.")
 
-        analyzer = LogAnalyzer(item_list_col=self._item_list_col)
-
-        results = []
-        for file_name in common_file_names:
-            train_subset = df_train.filter(pl.col("file_name") == file_name)
-            test_subset = df_test.filter(pl.col("file_name") == file_name)
+        # Every file is analyzed on its own. The files are split in one pass and
+        # file_workers files are analyzed at a time.
+        train_files = df_train.partition_by("file_name", as_dict=True)
+        test_files = df_test.partition_by("file_name", as_dict=True)
+        cache = get_data_cache("matrices")
+        workers = min(
+            self._analyzer_options.get("file_workers", 1), os.cpu_count() or 1
+        )
 
-            analyzer.manual_train_split(train_subset, test_subset, self._vectorizer)
-            results.append(analyzer.run_models(self._model_names))
+        results = map_in_processes(
+            _analyze_file,
+            [
+                (
+                    self._item_list_col,
+                    self._token_dictionary,
+                    cache,
+                    self._vectorizer,
+                    self._model_names,
+                    self._analyzer_options.get("model_workers", 1),
+                    train_files[(file_name,)],
+                    test_files[(file_name,)],
+                )
+                for file_name in common_file_names
+            ],
+            workers,
+        )
 
         return pl.concat(results, how="vertical")
 
     def analyze_file_group_by_filenames(self):
+        self._token_dictionary = TokenDictionary()
         self._df_train = aggregate_file_level_with_file_names(
-            self._df_train, self._item_list_col
+            self._df_train, self._item_list_col, self._token_dictionary
         )
         self._df_test = aggregate_file_level_with_file_names(
-            self._df_test, self._item_list_col
+            self._df_test, self._item_list_col, self._token_dictionary
         )
 
         self._results = self._analyze_grouped_by_file(
@@ -122,13 +172,33 @@ class ManualTrainTestPipeline:
             common_file_names=self._get_common_file_names(),
         )
 
+    # The aggregated frames hold token ids instead of the tokens, with one
+    # dictionary for train and test.
     def aggregate_to_run_level(self):
-        self._df_train = aggregate_run_level(self._df_train, self._item_list_col)
-        self._df_test = aggregate_run_level(self._df_test, self._item_list_col)
+        self._token_dictionary = TokenDictionary()
+        self._df_train = aggregate_run_level(
+            self._df_train,
+            self._item_list_col,
+            token_dictionary=self._token_dictionary,
+        )
+        self._df_test = aggregate_run_level(
+            self._df_test,
+            self._item_list_col,
+            token_dictionary=self._token_dictionary,
+        )
 
     def aggregate_to_file_level(self):
-        self._df_train = aggregate_file_level(self._df_train, self._item_list_col)
-        self._df_test = aggregate_file_level(self._df_test, self._item_list_col)
+        self._token_dictionary = TokenDictionary()
+        self._df_train = aggregate_file_level(
+            self._df_train,
+            self._item_list_col,
+            token_dictionary=self._token_dictionary,
+        )
+        self._df_test = aggregate_file_level(
+            self._df_test,
+            self._item_list_col,
+            token_dictionary=self._token_dictionary,
+        )
 
     def _get_common_file_names(self) -> list[str]:
         if self._df_train is None or self._df_test is None:
@@ -147,3 +217,24 @@ class ManualTrainTestPipeline:
     @property
     def results(self):
         return self._results
+
+
+def _analyze_file(args) -> pl.DataFrame:
+    (
+        item_list_col,
+        token_dictionary,
+        cache,
+        vectorizer,
+        model_names,
+        model_workers,
+        df_train,
+        df_test,
+    ) = args
+    analyzer = LogAnalyzer(
+        item_list_col=item_list_col,
+        token_dictionary=token_dictionary,
+        cache=cache,
+        model_workers=model_workers,
+    )
+    analyzer.manual_train_split(df_train, df_test, vectorizer)
+    return analyzer.run_models(model_names)
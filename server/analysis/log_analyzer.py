@@ -1,10 +1,32 @@
+import copy
+from concurrent.futures import ThreadPoolExecutor
+
+import polars as pl
+import sklearn
 from loglead import AnomalyDetector
 
+from server.analysis.utils.data_cache import fingerprint_series
+from server.analysis.utils.matrix_cache import get_matrices, put_matrices
+from server.analysis.utils.tokens import vectorize_token_ids
+
+# Column of the token counts the OOV detector compares to the vectorized ones
+_TOKEN_COUNT_COL = "token_count"
+
 
 class LogAnalyzer:
-    def __init__(self, df=None, item_list_col=None):
+    def __init__(
+        self,
+        df=None,
+        item_list_col=None,
+        token_dictionary=None,
+        cache=None,
+        model_workers=1,
+    ):
         self._df = df
         self._item_list_col = item_list_col
+        self._token_dictionary = token_dictionary
+        self._cache = cache
+        self._model_workers = model_workers
 
         self._model_to_func = {
             "kmeans": self._train_pred_kmeans,
@@ -13,21 +35,34 @@ class LogAnalyzer:
             "if": self._train_pred_if,
         }
 
-    def _train_pred_kmeans(self):
-        self._sad.train_KMeans()
-        return self._sad.predict()
+    def _train_pred_kmeans(self, sad):
+        sad.train_KMeans()
+        return sad.predict()
 
-    def _train_pred_rm(self):
-        self._sad.train_RarityModel()
-        return self._sad.predict()
+    def _train_pred_rm(self, sad):
+        sad.train_RarityModel()
+        return sad.predict()
 
-    def _train_pred_oovd(self):
-        self._sad.train_OOVDetector()
-        return self._sad.predict()
+    def _train_pred_oovd(self, sad):
+        if not self._uses_token_ids():
+            sad.train_OOVDetector()
+            return sad.predict()
+
+        # Without a length column loglead counts the tokens of the test rows
+        # with a vectorizer of its own, which does not take token ids.
+        test_df = sad.test_df
+        sad.test_df = test_df.with_columns(
+            pl.col(self._item_list_col).list.len().alias(_TOKEN_COUNT_COL)
+        )
+        try:
+            sad.train_OOVDetector(len_col=_TOKEN_COUNT_COL)
+            return sad.predict().drop(_TOKEN_COUNT_COL)
+        finally:
+            sad.test_df = test_df
 
-    def _train_pred_if(self):
-        self._sad.train_IsolationForest()
-        return self._sad.predict()
+    def _train_pred_if(self, sad):
+        sad.train_IsolationForest()
+        return sad.predict()
 
     def train_split(self, test_frac=0.9):
         self._sad = AnomalyDetector(
@@ -52,7 +87,68 @@ class LogAnalyzer:
         self._sad.train_df = train_df
         self._sad.test_df = test_df
 
-        self._sad.prepare_train_test_data(vectorizer)
+        # The matrices only depend on the item lists and the vectorizer, so
+        # they are shared by every model selection on the same data.
+        cache_key = self._matrix_cache_key(vectorizer)
+        matrices = (
+            get_matrices(self._cache, cache_key, train_df.height, test_df.height)
+            if cache_key is not None
+            else None
+        )
+        if matrices is not None:
+            self._set_matrices(*matrices)
+            return
+
+        if self._uses_token_ids():
+            self._set_matrices(
+                *vectorize_token_ids(
+                    train_df[self._item_list_col],
+                    test_df[self._item_list_col],
+                    self._token_dictionary,
+                    vectorizer,
+                )
+            )
+        else:
+            self._sad.prepare_train_test_data(vectorizer)
+
+        if cache_key is not None:
+            put_matrices(self._cache, cache_key, self._sad.X_train, self._sad.X_test)
+
+    def _uses_token_ids(self):
+        dtype = self._sad.train_df.schema[self._item_list_col]
+        return self._token_dictionary is not None and dtype == pl.List(pl.UInt32)
+
+    def _matrix_cache_key(self, vectorizer):
+        sad = self._sad
+        # Labeled data has separate matrices without the anomalies
+        if self._cache is None or sad.label_col in sad.train_df.columns:
+            return None
+
+        train = sad.train_df[self._item_list_col]
+        return fingerprint_series(
+            train,
+            "matrices",
+            sklearn.__version__,
+            self._item_list_col,
+            train.dtype,
+            vectorizer.__name__,
+            fingerprint_series(sad.test_df[self._item_list_col]),
+            (
+                fingerprint_series(self._token_dictionary.tokens)
+                if self._uses_token_ids()
+                else None
+            ),
+        )
+
+    def _set_matrices(self, X_train, X_test):
+        # The loaded logs have no labels, so there is no difference between the
+        # anos and no_anos data.
+        sad = self._sad
+        sad.X_train, sad.X_test = X_train, X_test
+        sad.labels_train, sad.labels_test = [], []
+        sad.vectorizer = None
+        sad.X_train_no_anos, sad.vectorizer_no_anos = sad.X_train, sad.vectorizer
+        sad.X_test_no_anos, sad.labels_test_no_anos = sad.X_test, sad.labels_test
 
     def run_models(self, models):
         if len(models) < 1:
@@ -60,22 +156,45 @@ class LogAnalyzer:
                 "Error: No detectors selected. Select atleast one model to run analysis."
             )
 
+        if self._model_workers > 1 and len(models) > 1:
+            return self._run_models_in_threads(models)
+
         df_result = None
         for model_name in models:
             df_result = self._run_model(model_name, df_result)
 
         return df_result
 
-    def _run_model(self, model_name, df_result):
+    def _run_models_in_threads(self, models):
+        # loglead keeps the trained model on the detector, so every model gets a
+        # shallow copy of its own. The copies share the train and test matrices.
+        with ThreadPoolExecutor(min(self._model_workers, len(models))) as executor:
+            predictions = list(
+                executor.map(
+                    lambda model: self._predict(model, copy.copy(self._sad)), models
+                )
+            )
+
+        df_result = None
+        for model_name, model_predictions in zip(models, predictions):
+            df_result = self._run_model(model_name, df_result, model_predictions)
+
+        return df_result
+
+    def _predict(self, model_name, sad):
         train_func = self._model_to_func.get(model_name)
 
         if not train_func:
             raise ValueError(f"error: Unsupported model {model_name}")
 
-        if self._sad is None:
+        if sad is None:
             raise ValueError("Anomaly detector has not been initialized.")
 
-        predictions = train_func()
+        return train_func(sad)
+
+    def _run_model(self, model_name, df_result, predictions=None):
+        if predictions is None:
+            predictions = self._predict(model_name, self._sad)
 
         if df_result is None:
             df_result = predictions.rename(
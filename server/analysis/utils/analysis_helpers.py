@@ -1,18 +1,132 @@
 import logging
 import os
 
-from flask import current_app
+import polars as pl
+from flask import current_app, has_app_context
 from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
 
 from server.analysis.loader import Loader
+from server.analysis.utils.data_cache import DataCache
+from server.analysis.utils.result_files import (
+    RESULT_ROW_GROUP_SIZE,
+    write_result_file,
+    write_result_summary,
+)
 from server.extensions import db
 from server.models.analysis import Analysis
 
 
-def load_data(directory_path):
-    loader = Loader(directory_path, "raw")
-    loader.load()
-    return loader.df
+def load_data(directory_path, columns=None):
+    return scan_data(directory_path, columns).collect()
+
+
+def scan_data(directory_path, columns=None) -> pl.LazyFrame:
+    loader = Loader(directory_path, "raw", **get_loader_options())
+    return loader.scan(columns=columns)
+
+
+def fingerprint_data(directory_path, *extra) -> str:
+    return Loader(directory_path, "raw", **get_loader_options()).fingerprint(*extra)
+
+
+def get_data_cache(namespace="parsed") -> DataCache | None:
+    cache_root = _get_config("DATA_CACHE_PATH")
+    if not cache_root:
+        return None
+
+    # Every namespace is evicted from one budget over the whole cache root
+    return DataCache(
+        os.path.join(cache_root, namespace),
+        max_size_bytes=_get_config("DATA_CACHE_MAX_SIZE_MB", 20480) * 1024 * 1024,
+        max_age_seconds=_get_config("DATA_CACHE_MAX_AGE_HOURS", 168) * 3600,
+        budget_dir=cache_root,
+    )
+
+
+def get_loader_options() -> dict:
+    return {
+        "cache": get_data_cache(),
+        "incremental": _get_config("DATA_CACHE_INCREMENTAL", False),
+        "workers": _get_config("LOADER_WORKERS", 1),
+    }
+
+
+def get_enhancer_options() -> dict:
+    return {
+        "cache": get_data_cache("enhanced"),
+        "deduplicate_parsing": _get_config("ENHANCER_DEDUPLICATE_PARSING", False),
+        "parse_mode": _get_config("ENHANCER_PARSE_MODE", "serial"),
+        "parse_workers": _get_config("ENHANCER_PARSE_WORKERS", 1),
+        "parse_sample_size": _get_config("ENHANCER_PARSE_SAMPLE_SIZE", 100_000),
+    }
+
+
+def get_analyzer_options() -> dict:
+    return {
+        "file_workers": _get_config("ANALYSIS_FILE_WORKERS", 1),
+        "model_workers": _get_config("ANALYSIS_MODEL_WORKERS", 1),
+    }
+
+
+def get_log_distance_options() -> dict:
+    return {
+        "workers": _get_config("LOG_DISTANCE_WORKERS", 1),
+        "block_rows": _get_config("LOG_DISTANCE_BLOCK_ROWS", 256),
+    }
+
+
+def get_compression_distance_options() -> dict:
+    return {
+        "codec": _get_config("LOG_DISTANCE_COMPRESSION", "bz2"),
+        "level": _get_config("LOG_DISTANCE_COMPRESSION_LEVEL"),
+        "sample_size": _get_config("LOG_DISTANCE_COMPRESSION_SAMPLE_SIZE", 0),
+    }
+
+
+def get_minhash_options() -> dict:
+    return {
+        "num_perm": _get_config("LOG_DISTANCE_MINHASH_PERMUTATIONS", 128),
+        "bands": _get_config("LOG_DISTANCE_MINHASH_BANDS", 32),
+        "cache": get_data_cache("minhash"),
+    }
+
+
+def get_umap_options() -> dict:
+    return {
+        "svd_components": _get_config("UMAP_SVD_COMPONENTS", 0),
+        "sample_size": _get_config("UMAP_SAMPLE_SIZE", 0),
+    }
+
+
+def get_unique_terms_options() -> dict:
+    return {
+        "chunk_rows": _get_config("UNIQUE_TERMS_CHUNK_ROWS", 500_000),
+        "approximate": _get_config("UNIQUE_TERMS_APPROXIMATE", False),
+        "error_rate": _get_config("UNIQUE_TERMS_ERROR_RATE", 0.01),
+        "enhancer_options": get_enhancer_options(),
+    }
+
+
+def get_template_model_dir(project_id: int) -> str | None:
+    results_path = _get_config("RESULTS_PATH")
+    if not results_path:
+        return None
+    return os.path.join(results_path, "template_models", str(project_id))
+
+
+def get_template_model_path(
+    project_id: int, mask_type: str | None, item_list_col: str
+) -> str | None:
+    model_dir = get_template_model_dir(project_id)
+    if not model_dir or not _get_config("PARSER_TEMPLATE_MODELS", False):
+        return None
+    return os.path.join(model_dir, f"{item_list_col}_{mask_type or 'none'}.parquet")
+
+
+def _get_config(key, default=None):
+    if not has_app_context():
+        return default
+    return current_app.config.get(key, default)
 
 
 def create_vectorizer(vectorizer_type: str) -> object:
@@ -24,8 +138,10 @@ def create_vectorizer(vectorizer_type: str) -> object:
         raise ValueError(f"Unsupported vectorizer type: {vectorizer_type}")
 
 
-def store_and_format_result(result, project_id, analysis_type, metadata):
-    result_id = _add_result(result, project_id, analysis_type, **metadata)
+def store_and_format_result(result, project_id, analysis_type, metadata, layout=None):
+    result_id = _add_result(
+        result, project_id, analysis_type, layout=layout, **metadata
+    )
     return {"id": result_id, "type": analysis_type}
 
 
@@ -37,7 +153,15 @@ def handle_errors(project_id, context, error):
     return {"error": str(error)}
 
 
-def _add_result(df, project_id: int, analysis_type: str, **kwargs):
+def get_result_write_options() -> dict:
+    return {
+        "compression": _get_config("RESULT_COMPRESSION", "zstd"),
+        "compression_level": _get_config("RESULT_COMPRESSION_LEVEL"),
+        "row_group_size": _get_config("RESULT_ROW_GROUP_SIZE", RESULT_ROW_GROUP_SIZE),
+    }
+
+
+def _add_result(df, project_id: int, analysis_type: str, layout=None, **kwargs):
     analysis = Analysis(
         results_path="",
         analysis_type=analysis_type,
@@ -54,7 +178,8 @@ def _add_result(df, project_id: int, analysis_type: str, **kwargs):
     analysis.results_path = result_path
     db.session.commit()
 
-    df.write_parquet(result_path)
+    write_result_file(df, result_path, **(layout or {}), **get_result_write_options())
+    write_result_summary(df, result_path)
 
     del df
 
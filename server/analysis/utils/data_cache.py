@@ -0,0 +1,194 @@
+import hashlib
+import logging
+import os
+import time
+import uuid
+
+import polars as pl
+
+# Bump when the layout of cached frames changes so stale entries are ignored.
+CACHE_VERSION = 1
+
+
+def fingerprint_files(file_paths: list[str], *extra) -> str:
+    """Hash file paths, sizes and modification times into a cache key.
+
+    Any additional positional values (e.g. the load options) are mixed into
+    the hash so that different views of the same files get separate keys.
+    """
+    digest = hashlib.sha256()
+    digest.update(str(CACHE_VERSION).encode())
+
+    for value in extra:
+        digest.update(b"\0")
+        digest.update(str(value).encode())
+
+    for path in file_paths:
+        stat = os.stat(path)
+        digest.update(b"\0")
+        digest.update(f"{path}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+
+    return digest.hexdigest()
+
+
+def fingerprint_series(series: pl.Series, *extra) -> str:
+    """Hash the values of a series, in order, into a cache key.
+
+    Uses the polars hash of every value, which is only stable within one
+    polars version, so the version is part of the key. polars only hashes
+    lists of numbers, so list columns are hashed as their lengths followed by
+    all of their values.
+    """
+    digest = hashlib.sha256()
+    digest.update(str(CACHE_VERSION).encode())
+
+    for value in (pl.__version__, len(series), *extra):
+        digest.update(b"\0")
+        digest.update(str(value).encode())
+
+    parts = (
+        [series.list.len(), series.explode()]
+        if isinstance(series.dtype, pl.List)
+        else [series]
+    )
+    for part in parts:
+        digest.update(b"\0")
+        digest.update(part.hash(seed=0).to_numpy().tobytes())
+
+    return digest.hexdigest()
+
+
+class DataCache:
+    """On-disk cache of polars frames stored as Arrow IPC files.
+
+    Entries are written atomically so that several workers can share the same
+    directory. The modification time of an entry is refreshed on every hit,
+    which makes size based eviction remove the least recently used entries
+    first. Caches that share a budget_dir, such as the namespaces under one
+    cache root, are evicted together so that their total size stays within
+    max_size_bytes.
+    """
+
+    _suffix = ".arrow"
+
+    def __init__(
+        self, cache_dir, max_size_bytes=None, max_age_seconds=None, budget_dir=None
+    ):
+        self._cache_dir = cache_dir
+        self._max_size_bytes = max_size_bytes
+        self._max_age_seconds = max_age_seconds
+        self._budget_dir = budget_dir or cache_dir
+
+        os.makedirs(self._cache_dir, exist_ok=True)
+
+    def get(self, key: str) -> pl.DataFrame | None:
+        path = self._entry_path(key)
+        try:
+            df = pl.read_ipc(path, memory_map=False)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        return df
+
+    def scan(self, key: str) -> pl.LazyFrame | None:
+        path = self._entry_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        return pl.scan_ipc(path)
+
+    def put(self, key: str, df: pl.DataFrame):
+        # An entry larger than the whole cache would be evicted right after
+        # it is written.
+        if (
+            self._max_size_bytes is not None
+            and df.estimated_size() > self._max_size_bytes
+        ):
+            logging.info(f"Not caching {key}, it is larger than the cache limit")
+            return
+
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+
+        try:
+            df.write_ipc(tmp_path, compression="lz4")
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.evict()
+
+    def discard(self, key: str):
+        self._remove(self._entry_path(key))
+
+    def discard_prefix(self, prefix: str):
+        for name in os.listdir(self._cache_dir):
+            if name.startswith(prefix) and name.endswith(self._suffix):
+                self._remove(os.path.join(self._cache_dir, name))
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self._entry_path(key))
+
+    def evict(self):
+        entries = []
+        now = time.time()
+
+        for path in self._entry_paths():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+
+            if (
+                self._max_age_seconds is not None
+                and now - stat.st_mtime > self._max_age_seconds
+            ):
+                self._remove(path)
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        if self._max_size_bytes is None:
+            return
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self._max_size_bytes:
+                break
+
+            self._remove(path)
+            total_size -= size
+
+    def clear(self):
+        for name in os.listdir(self._cache_dir):
+            if name.endswith(self._suffix):
+                self._remove(os.path.join(self._cache_dir, name))
+
+    def _entry_paths(self):
+        if self._budget_dir == self._cache_dir:
+            dirs = [(self._cache_dir, os.listdir(self._cache_dir))]
+        else:
+            dirs = [(root, names) for root, _, names in os.walk(self._budget_dir)]
+
+        for root, names in dirs:
+            for name in names:
+                if name.endswith(self._suffix):
+                    yield os.path.join(root, name)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self._cache_dir, f"{key}{self._suffix}")
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @property
+    def cache_dir(self):
+        return self._cache_dir
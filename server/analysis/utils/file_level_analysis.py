@@ -1,34 +1,26 @@
 import polars as pl
 from server.analysis.enhancer import Enhancer
+from server.analysis.utils.analysis_helpers import get_unique_terms_options
+from server.analysis.utils.unique_terms import count_unique_terms
 
 
-def unique_terms_count_by_file(df, item_list_col, mask_type=None):
-    enhancer = Enhancer(df)
-    df = enhancer.enhance_event(item_list_col, mask_type=mask_type)
-
-    file_unique_terms = (
-        df.select("seq_id", "run", item_list_col)
-        .group_by("seq_id")
-        .agg(
-            [
-                pl.len().alias("line_count"),
-                pl.col(item_list_col)
-                .list.explode()
-                .n_unique()
-                .alias("unique_term_count"),
-                pl.col("run").first(),
-            ]
-        )
-    )
-
-    return file_unique_terms.sort("seq_id")
+def unique_terms_count_by_file(df, item_list_col, mask_type=None, **options):
+    options = options or get_unique_terms_options()
+    return count_unique_terms(
+        df, item_list_col, ["seq_id", "run"], mask_type, **options
+    ).select("seq_id", "line_count", "unique_term_count", "run")
 
 
-def aggregate_file_level(df, item_list_col, mask_type=None):
+def aggregate_file_level(
+    df, item_list_col, mask_type=None, token_dictionary=None, enhancer_options=None
+):
     if df.get_column(item_list_col, default=None) is None:
-        enhancer = Enhancer(df)
+        enhancer = Enhancer(df, **(enhancer_options or {}))
         df = enhancer.enhance_event(item_list_col, mask_type)
 
+    if token_dictionary is not None:
+        df = df.with_columns(token_dictionary.encode(df[item_list_col]))
+
     col_dtype = df.select(pl.col(item_list_col)).dtypes[0]
 
     if isinstance(col_dtype, pl.List):
@@ -41,11 +33,16 @@ def aggregate_file_level(df, item_list_col, mask_type=None):
     return df
 
 
-def aggregate_file_level_with_file_names(df, item_list_col):
+def aggregate_file_level_with_file_names(
+    df, item_list_col, token_dictionary=None, enhancer_options=None
+):
     if df.get_column(item_list_col, default=None) is None:
-        enhancer = Enhancer(df)
+        enhancer = Enhancer(df, **(enhancer_options or {}))
         df = enhancer.enhance_event(item_list_col)
 
+    if token_dictionary is not None:
+        df = df.with_columns(token_dictionary.encode(df[item_list_col]))
+
     col_dtype = df.select(pl.col(item_list_col)).dtypes[0]
 
     if isinstance(col_dtype, pl.List):
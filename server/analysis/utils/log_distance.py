@@ -1,7 +1,20 @@
+import bz2
+import math
+import os
+import zlib
+
+import numpy as np
 import polars as pl
-from loglead.anomaly_detection import LogDistance
+import pyzstd
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+from .minhash import build_minhash_index
+from .parallel import map_in_processes
 from .run_level_analysis import calculate_zscore_sum_anos
 
+COMPRESSION_CODECS = ["bz2", "zlib", "zstd"]
+
 
 def measure_distances(
     df,
@@ -10,6 +23,11 @@ def measure_distances(
     vectorizer,
     run_column="run",
     comparison_runs=None,
+    workers=1,
+    compression_options=None,
+    top_k=None,
+    dissimilar=False,
+    minhash_options=None,
 ):
     comparison_run_names = (
         df.filter(
@@ -29,49 +47,345 @@ def measure_distances(
     if len(comparison_run_names) == 0:
         raise ValueError("No comparison runs found. Check your settings.")
 
-    df_target = df.filter(pl.col(run_column) == target_run)
-
-    distances = []
-    for comparison_run in sorted(comparison_run_names):
-        df_comparison = df.filter(pl.col(run_column) == comparison_run)
-        distances.append(
-            _measure_distance(
-                df_target,
-                df_comparison,
-                target_run,
-                comparison_run,
-                item_list_col,
-                vectorizer,
-            )
+    nearest = None
+    if top_k is not None:
+        # Exact distances are only measured for the top_k runs of the index
+        index = build_minhash_index(
+            df, item_list_col, run_column, **(minhash_options or {})
         )
+        nearest = index.nearest(target_run, top_k, dissimilar, comparison_run_names)
+        comparison_run_names = nearest["run"].to_list()
 
-    distance_columns = ["cosine", "jaccard", "compression", "containment"]
-    distances = calculate_zscore_sum_anos(distances, distance_columns)
+    runs = [target_run, *sorted(comparison_run_names)]
+    run_distances = RunDistances(df, item_list_col, vectorizer, run_column, runs)
 
-    return pl.DataFrame(distances)
+    comparisons = np.arange(1, len(runs))
+    distances = run_distances.distances([0], comparisons)
+    compression = run_distances.compression(
+        [(0, comparison) for comparison in comparisons],
+        workers,
+        **(compression_options or {}),
+    )
 
+    rows = [
+        {
+            "target_run": target_run,
+            "comparison_run": runs[comparison],
+            "target_lines": run_distances.lines[0],
+            "comparison_lines": run_distances.lines[comparison],
+            "cosine": _to_optional(distances["cosine"][0, i]),
+            "jaccard": _to_optional(distances["jaccard"][0, i]),
+            "compression": compression[i],
+            "containment": _to_optional(distances["containment"][0, i]),
+        }
+        for i, comparison in enumerate(comparisons)
+    ]
 
-def _measure_distance(
-    df_target, df_comparison, target_name, comparison_name, item_list_col, vectorizer
-):
-    distance = LogDistance(
-        df_target, df_comparison, item_list_col, vectorizer=vectorizer
+    distance_columns = ["cosine", "jaccard", "compression", "containment"]
+    rows = calculate_zscore_sum_anos(rows, distance_columns)
+
+    if nearest is None:
+        return pl.DataFrame(rows)
+
+    return pl.DataFrame(rows).join(
+        nearest.rename({"run": "comparison_run"}),
+        on="comparison_run",
+        how="left",
+        maintain_order="left",
     )
 
-    cosine = distance.cosine()
-    jaccard = distance.jaccard()
-    compression = distance.compression()
-    containment = distance.containment()
-
-    result_row = {
-        "target_run": target_name,
-        "comparison_run": comparison_name,
-        "target_lines": distance.size1,
-        "comparison_lines": distance.size2,
-        "cosine": cosine,
-        "jaccard": jaccard,
-        "compression": compression,
-        "containment": containment,
+
+def measure_distance_matrix(
+    df,
+    item_list_col,
+    vectorizer,
+    run_column="run",
+    runs=None,
+    workers=1,
+    block_rows=256,
+    compression_options=None,
+) -> pl.DataFrame:
+    """Distances between every pair of runs.
+
+    Every row holds the lines of one run and its distances to all runs as
+    arrays in the order of the rows. The distances are computed block_rows
+    runs at a time, so besides the result only block_rows x runs values are
+    in memory. Compression distance is computed once per pair and used for
+    both directions.
+    """
+    if block_rows < 1:
+        raise ValueError("block_rows must be at least 1")
+
+    if runs in (None, []):
+        runs = df.get_column(run_column).unique().sort().to_list()
+    else:
+        runs = sorted(set(runs) & set(df.get_column(run_column).unique()))
+
+    if len(runs) < 2:
+        raise ValueError("At least two runs are needed for a distance matrix.")
+
+    run_distances = RunDistances(df, item_list_col, vectorizer, run_column, runs)
+    matrices = {
+        column: np.empty((len(runs), len(runs)), dtype=np.float32)
+        for column in ["cosine", "jaccard", "compression", "containment"]
     }
 
-    return result_row
+    columns = np.arange(len(runs))
+    for start in range(0, len(runs), block_rows):
+        rows = columns[start : start + block_rows]
+        for column, distances in run_distances.distances(rows, columns).items():
+            matrices[column][rows] = distances
+
+    pairs = [(row, column) for row in columns for column in columns[row + 1 :]]
+    compression = run_distances.compression(
+        pairs, workers, **(compression_options or {})
+    )
+    for (row, column), distance in zip(pairs, compression):
+        distance = np.nan if distance is None else distance
+        matrices["compression"][row, column] = distance
+        matrices["compression"][column, row] = distance
+
+    for matrix in matrices.values():
+        np.fill_diagonal(matrix, 0)
+
+    return pl.DataFrame(
+        {
+            "run": runs,
+            "lines": pl.Series(run_distances.lines, dtype=pl.UInt32),
+            **{column: pl.Series(matrix) for column, matrix in matrices.items()},
+        }
+    )
+
+
+class RunDistances:
+    """Distances between the runs of a frame.
+
+    Every run is vectorized once into a document-term matrix shared by all
+    pairs, and the cosine, Jaccard and containment distances of blocks of runs
+    are computed with sparse matrix products. The distances are the same as
+    those of loglead's LogDistance, which fits the vectorizer on one pair of
+    runs at a time.
+    """
+
+    def __init__(self, df, item_list_col, vectorizer, run_column="run", runs=None):
+        if not issubclass(vectorizer, CountVectorizer):
+            raise ValueError(f"Unsupported vectorizer {vectorizer.__name__}")
+
+        if runs is None:
+            runs = df.get_column(run_column).unique().sort().to_list()
+        documents = _documents(df, item_list_col, run_column, runs)
+
+        self.runs = runs
+        self.lines = documents["lines"].to_list()
+        self._texts = documents["text"].to_list()
+
+        vectorizer = vectorizer()
+        try:
+            counts = CountVectorizer(
+                analyzer=vectorizer.build_analyzer()
+            ).fit_transform(self._texts)
+        except ValueError as e:
+            if "empty vocabulary" not in str(e):
+                raise
+            counts = csr_matrix((len(runs), 0))
+
+        self._weights, self._one_run_idf = _pair_weights(counts, vectorizer)
+        self._binary = (self._weights > 0).astype(np.float64)
+        self._squares = self._weights.multiply(self._weights).tocsr()
+        self._term_counts = np.asarray(self._binary.sum(axis=1)).ravel()
+        self._compressed_sizes = {}
+        self._samples = {}
+
+    def distances(self, rows, columns) -> dict[str, np.ndarray]:
+        """Cosine, Jaccard and containment distances of rows x columns runs.
+
+        Pairs of runs without any terms have no distances and are NaN.
+        """
+        binary_rows = self._binary[rows]
+        binary_columns = self._binary[columns]
+        intersection = (binary_rows @ binary_columns.T).toarray()
+        dot = (self._weights[rows] @ self._weights[columns].T).toarray()
+
+        squares_rows = np.asarray(self._squares[rows].sum(axis=1))
+        squares_columns = np.asarray(self._squares[columns].sum(axis=1)).T
+        if self._one_run_idf != 1:
+            # The idf of a pair is 1 for the shared terms, the norms are
+            # weighted by the idf of the terms of only one run.
+            idf_squared = self._one_run_idf**2
+            shared_rows = (self._squares[rows] @ binary_columns.T).toarray()
+            shared_columns = (binary_rows @ self._squares[columns].T).toarray()
+            squares_rows = idf_squared * squares_rows - (idf_squared - 1) * shared_rows
+            squares_columns = (
+                idf_squared * squares_columns - (idf_squared - 1) * shared_columns
+            )
+
+        terms_rows = self._term_counts[rows][:, None]
+        terms_columns = self._term_counts[columns][None, :]
+        union = terms_rows + terms_columns - intersection
+        smaller = np.minimum(terms_rows, terms_columns)
+        norms = np.sqrt(squares_rows * squares_columns)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cosine = 1 - np.where(norms > 0, dot / norms, 0)
+            jaccard = 1 - intersection / union
+            containment = 1 - np.where(smaller > 0, intersection / smaller, 0)
+
+        empty = union == 0
+        return {
+            "cosine": np.where(empty, np.nan, cosine),
+            "jaccard": np.where(empty, np.nan, jaccard),
+            "containment": np.where(empty, np.nan, containment),
+        }
+
+    def compression(
+        self, pairs, workers=1, codec="bz2", level=None, sample_size=None
+    ) -> list[float | None]:
+        """Compression distances of (row, column) pairs.
+
+        The compressed size of every run is computed once and kept for later
+        calls, so only the concatenation of a pair is compressed per pair.
+        The compression runs in worker processes. With sample_size, runs
+        longer than sample_size characters are compressed from evenly spaced
+        parts of them.
+        """
+        if codec not in COMPRESSION_CODECS:
+            raise ValueError(f"Unsupported compression codec: {codec}")
+
+        pairs = list(pairs)
+        workers = min(workers, os.cpu_count() or 1)
+        texts = self._sampled_texts(sample_size)
+
+        # Pairs of runs without any terms have no distance
+        columns_by_row = {}
+        for row, column in pairs:
+            if self._term_counts[row] + self._term_counts[column] > 0:
+                columns_by_row.setdefault(row, []).append(column)
+
+        sizes = self._compressed_sizes.setdefault((codec, level, sample_size), {})
+        runs = {run for row, cols in columns_by_row.items() for run in [row, *cols]}
+        missing = sorted(runs - sizes.keys())
+        sizes.update(
+            zip(
+                missing,
+                _compress_groups(
+                    [("", [texts[run] for run in missing])], codec, level, workers
+                ),
+            )
+        )
+
+        combined_sizes = iter(
+            _compress_groups(
+                [
+                    (texts[row], [texts[column] for column in columns])
+                    for row, columns in columns_by_row.items()
+                ],
+                codec,
+                level,
+                workers,
+            )
+        )
+        distances = {}
+        for row, columns in columns_by_row.items():
+            for column in columns:
+                smaller, larger = sorted([sizes[row], sizes[column]])
+                distances[row, column] = (next(combined_sizes) - smaller) / larger
+
+        return [distances.get(pair) for pair in pairs]
+
+    def _sampled_texts(self, sample_size):
+        if not sample_size:
+            return self._texts
+        if sample_size not in self._samples:
+            self._samples[sample_size] = [
+                _sample_text(text, sample_size) for text in self._texts
+            ]
+        return self._samples[sample_size]
+
+
+def _documents(df, item_list_col, run_column, runs) -> pl.DataFrame:
+    dtype = df.schema[item_list_col]
+    if dtype == pl.List(pl.String):
+        text = pl.col(item_list_col).list.join(" ")
+    elif dtype == pl.String:
+        text = pl.col(item_list_col)
+    else:
+        raise ValueError(
+            f"Unsupported datatype {dtype} in column {item_list_col}. "
+            "Supported types are: String, List[String]"
+        )
+
+    documents = df.group_by(run_column).agg(
+        pl.len().alias("lines"), text.str.join(" ").alias("text")
+    )
+    return (
+        pl.DataFrame({run_column: runs}, schema={run_column: df.schema[run_column]})
+        .join(documents, on=run_column, how="left", maintain_order="left")
+        .with_columns(pl.col("lines").fill_null(0), pl.col("text").fill_null(""))
+    )
+
+
+def _pair_weights(counts, vectorizer):
+    weights = counts.astype(np.float64).tocsr()
+    if not isinstance(vectorizer, TfidfVectorizer):
+        return weights, 1
+
+    if vectorizer.sublinear_tf:
+        weights.data = 1 + np.log(weights.data)
+    if not vectorizer.use_idf:
+        return weights, 1
+
+    # idf of a term that occurs in one of the two runs of a pair
+    if vectorizer.smooth_idf:
+        return weights, math.log(3 / 2) + 1
+    return weights, math.log(2) + 1
+
+
+def _compress_groups(groups, codec, level, workers) -> list[int]:
+    """Compressed sizes of prefix + text for every (prefix, texts) group.
+
+    The texts are split into about four chunks per worker, a chunk of a
+    group is sent to the workers with its prefix only once.
+    """
+    total = sum(len(texts) for _, texts in groups)
+    chunk_size = max(1, math.ceil(total / (max(workers, 1) * 4)))
+    chunks = [
+        (prefix, texts[start : start + chunk_size], codec, level)
+        for prefix, texts in groups
+        for start in range(0, len(texts), chunk_size)
+    ]
+    sizes = map_in_processes(_compressed_sizes, chunks, workers)
+    return [size for chunk_sizes in sizes for size in chunk_sizes]
+
+
+def _compressed_sizes(chunk) -> list[int]:
+    prefix, texts, codec, level = chunk
+    return [_compressed_size((prefix + text).encode(), codec, level) for text in texts]
+
+
+def _compressed_size(data: bytes, codec, level=None) -> int:
+    if codec == "zstd":
+        return len(pyzstd.compress(data, level))
+    if codec == "zlib":
+        return len(zlib.compress(data, -1 if level is None else level))
+    return len(bz2.compress(data, 9 if level is None else level))
+
+
+def _sample_text(text, sample_size, part_size=64 * 1024):
+    """Evenly spaced parts of text, at most sample_size characters in total.
+
+    The parts are contiguous so that the compressor still sees the
+    repetition between neighbouring lines.
+    """
+    if len(text) <= sample_size:
+        return text
+
+    part_size = min(part_size, sample_size)
+    parts = sample_size // part_size
+    step = (len(text) - part_size) / max(parts - 1, 1)
+    return "".join(
+        text[round(i * step) : round(i * step) + part_size] for i in range(parts)
+    )
+
+
+def _to_optional(value):
+    return None if np.isnan(value) else float(value)
@@ -0,0 +1,70 @@
+import re
+from functools import lru_cache
+
+import polars as pl
+
+# Named groups are only needed for the ${start}/${end} references of the
+# replacements, the combined pattern only has to find out if anything matches.
+_NAMED_GROUP = re.compile(r"(?<!\\)\(\?P<\w+>")
+
+
+class MaskingEngine:
+    """Regex masking with the same output as EventLogEnhancer.normalize.
+
+    normalize takes the first line of every message and applies each
+    (replacement, pattern) pair with replace_all twice, in order, to every
+    row. Here the rows that match none of the patterns are found with a single
+    pass of all patterns combined and left as they are. The remaining rows are
+    only replaced by the patterns that match them, and the second replacement
+    is only done where the pattern still matches after the first one. A
+    replacement of a row that does not match is a no-op, so the result is the
+    same.
+    """
+
+    def __init__(self, masks, twice=True):
+        self._masks = list(masks)
+        self._twice = twice
+        self._any_mask = "|".join(
+            f"(?:{_NAMED_GROUP.sub('(?:', pattern)})" for _, pattern in self._masks
+        )
+
+    def mask(self, messages: pl.Series) -> pl.Series:
+        lines = messages.str.split("\n").list.first()
+        if not self._masks:
+            return lines.alias("e_message_normalized")
+
+        matching = lines.str.contains(self._any_mask).arg_true()
+        masked = lines.gather(matching)
+
+        for replacement, pattern in self._masks:
+            masked = self._replace_matching(
+                masked, pattern, replacement, 2 if self._twice else 1
+            )
+
+        return lines.scatter(matching, masked).alias("e_message_normalized")
+
+    def _replace_matching(self, lines, pattern, replacement, times):
+        rows = lines.str.contains(pattern).arg_true()
+        if rows.is_empty():
+            return lines
+
+        replaced = lines.gather(rows).str.replace_all(pattern, replacement)
+        if times > 1:
+            replaced = self._replace_matching(
+                replaced, pattern, replacement, times - 1
+            )
+        return lines.scatter(rows, replaced)
+
+
+@lru_cache(maxsize=16)
+def _get_masking_engine(masks: tuple, twice: bool) -> MaskingEngine:
+    return MaskingEngine(masks, twice)
+
+
+def mask_messages(messages: pl.Series, masks, twice=True) -> pl.Series:
+    """Mask messages with a list of (replacement, pattern) pairs.
+
+    Returns the e_message_normalized column produced by
+    EventLogEnhancer.normalize(masks, twice=twice).
+    """
+    return _get_masking_engine(tuple(masks), twice).mask(messages)
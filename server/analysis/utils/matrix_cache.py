@@ -0,0 +1,53 @@
+import polars as pl
+from scipy.sparse import csr_matrix
+
+
+def put_matrices(cache, key: str, X_train, X_test):
+    """Store the document-term matrices of a train/test split.
+
+    The matrices are stored as the row, column and value of their non-zero
+    entries, one cache entry per matrix.
+    """
+    cache.put(f"{key}_train", _to_frame(X_train))
+    cache.put(f"{key}_test", _to_frame(X_test))
+
+
+def get_matrices(cache, key: str, train_rows, test_rows):
+    """Matrices stored by put_matrices, None if either of them is missing.
+
+    Every term of the vocabulary occurs in the train data, so the number of
+    columns is the highest column of the train matrix.
+    """
+    train = cache.get(f"{key}_train")
+    test = cache.get(f"{key}_test")
+    if train is None or test is None:
+        return None
+
+    columns = 0 if train.is_empty() else train["column"].max() + 1
+    return (
+        _to_matrix(train, (train_rows, columns)),
+        _to_matrix(test, (test_rows, columns)),
+    )
+
+
+def _to_frame(matrix) -> pl.DataFrame:
+    coo = matrix.tocoo()
+    return pl.DataFrame(
+        {
+            "row": pl.Series(coo.row, dtype=pl.UInt32),
+            "column": pl.Series(coo.col, dtype=pl.UInt32),
+            "value": coo.data,
+        }
+    )
+
+
+def _to_matrix(df: pl.DataFrame, shape) -> csr_matrix:
+    matrix = csr_matrix(
+        (
+            df["value"].to_numpy(),
+            (df["row"].to_numpy(), df["column"].to_numpy()),
+        ),
+        shape=shape,
+    )
+    matrix.sum_duplicates()
+    return matrix
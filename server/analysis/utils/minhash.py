@@ -0,0 +1,172 @@
+import hashlib
+
+import numpy as np
+import polars as pl
+
+_SEED = 42
+# Permutations hashed at once, bounds the memory to 16 hashes per token
+_PERMUTATION_BLOCK = 16
+
+
+class MinHashIndex:
+    """MinHash sketches of runs with an LSH index over them.
+
+    The sketch of a run holds the smallest hash of its distinct tokens under
+    each of num_perm hash functions. The share of equal values in two
+    sketches estimates the Jaccard similarity of their token sets. The index
+    splits the sketches into bands; runs that share a band with the target
+    are the candidates for its most similar runs.
+    """
+
+    def __init__(self, runs: list, signatures: np.ndarray, bands=32):
+        num_perm = signatures.shape[1]
+        if bands < 1 or num_perm % bands != 0:
+            raise ValueError("bands must divide the number of permutations")
+
+        self.runs = runs
+        self._signatures = signatures
+        self._rows = {run: row for row, run in enumerate(runs)}
+
+        # Every band is hashed to one key, the keys of a band are kept sorted
+        # so that the runs with the key of the target are found by bisection.
+        band_rows = num_perm // bands
+        multipliers = np.uint64(0x9E3779B97F4A7C15) ** np.arange(
+            band_rows, dtype=np.uint64
+        )
+        self._band_keys = (
+            signatures.reshape(len(runs), bands, band_rows).astype(np.uint64)
+            * multipliers
+        ).sum(axis=2, dtype=np.uint64)
+        self._band_order = np.argsort(self._band_keys, axis=0, kind="stable")
+        self._sorted_band_keys = np.take_along_axis(
+            self._band_keys, self._band_order, axis=0
+        )
+
+    def estimated_jaccard(self, target) -> np.ndarray:
+        """Estimated Jaccard similarity of the target to every run."""
+        target_signature = self._signatures[self._row(target)]
+        return (self._signatures == target_signature).mean(axis=1)
+
+    def candidates(self, target) -> np.ndarray:
+        """Rows of the runs that share at least one band with the target."""
+        target_keys = self._band_keys[self._row(target)]
+        rows = [
+            self._band_order[
+                np.searchsorted(self._sorted_band_keys[:, band], key, "left") : (
+                    np.searchsorted(self._sorted_band_keys[:, band], key, "right")
+                ),
+                band,
+            ]
+            for band, key in enumerate(target_keys)
+        ]
+        return np.unique(np.concatenate(rows))
+
+    def nearest(self, target, k, dissimilar=False, runs=None) -> pl.DataFrame:
+        """The k runs most similar or dissimilar to the target.
+
+        Similar runs are looked up from the LSH candidates, and all runs are
+        ranked only if there are fewer than k candidates. Dissimilar runs
+        always rank all runs, which is one comparison of the sketches.
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+
+        allowed = np.ones(len(self.runs), dtype=bool)
+        if runs not in (None, []):
+            allowed[:] = False
+            allowed[[self._rows[run] for run in runs if run in self._rows]] = True
+        allowed[self._row(target)] = False
+
+        similarity = self.estimated_jaccard(target)
+        rows = np.flatnonzero(allowed)
+        if not dissimilar:
+            candidates = self.candidates(target)
+            candidates = candidates[allowed[candidates]]
+            if len(candidates) >= k:
+                rows = candidates
+
+        order = np.argsort(
+            similarity[rows] if dissimilar else -similarity[rows], kind="stable"
+        )
+        rows = rows[order[:k]]
+        return pl.DataFrame(
+            {
+                "run": [self.runs[row] for row in rows],
+                "estimated_jaccard": similarity[rows],
+            }
+        )
+
+    def _row(self, target) -> int:
+        if target not in self._rows:
+            raise ValueError(f"Target {target} not found. Check your settings.")
+        return self._rows[target]
+
+
+def build_minhash_index(
+    df, item_list_col, run_column="run", num_perm=128, bands=32, cache=None, key=None
+) -> MinHashIndex:
+    """MinHashIndex of the runs of df over the distinct values of item_list_col.
+
+    key identifies the data of df, such as the fingerprint of its source files
+    and enhancement options. With a cache and a key the sketches are stored
+    under it, so later queries on the same data only build the index.
+    """
+    cache_key = None
+    if cache is not None and key is not None:
+        # The token hashes are only stable within one polars version
+        options = [item_list_col, run_column, num_perm, _SEED, pl.__version__]
+        cache_key = hashlib.sha256(
+            "\0".join(str(value) for value in [key, "minhash", *options]).encode()
+        ).hexdigest()
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return MinHashIndex(
+                cached["run"].to_list(), cached["signature"].to_numpy(), bands
+            )
+
+    runs = df.get_column(run_column).unique().sort()
+    tokens = df.select(
+        pl.col(run_column).alias("run"), pl.col(item_list_col).alias("token")
+    )
+    if isinstance(tokens.schema["token"], pl.List):
+        tokens = tokens.explode("token")
+
+    tokens = (
+        tokens.drop_nulls("token")
+        .unique()
+        .join(runs.to_frame("run").with_row_index("row"), on="run")
+        .sort("row")
+    )
+    signatures = _signatures(
+        tokens["row"].to_numpy(),
+        tokens["token"].hash(seed=0).to_numpy(),
+        len(runs),
+        num_perm,
+    )
+
+    if cache_key is not None:
+        cache.put(cache_key, pl.DataFrame({"run": runs, "signature": signatures}))
+
+    return MinHashIndex(runs.to_list(), signatures, bands)
+
+
+def _signatures(rows, hashes, run_count, num_perm) -> np.ndarray:
+    # Multiply-shift hashing, the high 32 bits of a * hash + b modulo 2^64
+    rng = np.random.default_rng(_SEED)
+    a = rng.integers(0, 2**64, num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**64, num_perm, dtype=np.uint64)
+
+    # Runs without tokens keep the maximum, which no token reaches in practice
+    signatures = np.full((run_count, num_perm), np.iinfo(np.uint32).max, np.uint32)
+    if len(rows) == 0:
+        return signatures
+
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    for start in range(0, num_perm, _PERMUTATION_BLOCK):
+        block = slice(start, start + _PERMUTATION_BLOCK)
+        permuted = (hashes[:, None] * a[block] + b[block]) >> np.uint64(32)
+        signatures[rows[starts], block] = np.minimum.reduceat(
+            permuted.astype(np.uint32), starts, axis=0
+        )
+
+    return signatures
@@ -0,0 +1,36 @@
+import os
+
+# billiard is used instead of multiprocessing because the analyses run inside
+# celery prefork workers, which multiprocessing treats as daemonic processes
+# that are not allowed to have children.
+from billiard import get_context
+
+
+def map_in_processes(func, items, workers=1):
+    """Apply func to every item in a pool of worker processes.
+
+    Results are returned in the same order as items. With a single worker or
+    a single item everything runs in the calling process. func and the items
+    must be picklable, so func has to be a module level function.
+    """
+    items = list(items)
+    if workers is None or workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    processes = min(workers, len(items))
+    threads = max(1, (os.cpu_count() or 1) // processes)
+
+    # Spawn instead of fork since the polars thread pool is not fork safe.
+    context = get_context("spawn")
+    with context.Pool(
+        processes, initializer=_limit_threads, initargs=(threads,)
+    ) as pool:
+        return pool.map(func, items, chunksize=1)
+
+
+def _limit_threads(threads):
+    # Runs before polars or numpy are imported in the worker so that the
+    # processes do not oversubscribe the cores.
+    os.environ["POLARS_MAX_THREADS"] = str(threads)
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["OPENBLAS_NUM_THREADS"] = str(threads)
@@ -0,0 +1,414 @@
+import fcntl
+import hashlib
+import os
+import uuid
+from contextlib import contextmanager
+
+import polars as pl
+from drain3 import TemplateMiner
+from loglead.enhancers import EventLogEnhancer
+from loglead.parsers import DrainTemplateMinerNoMasking
+
+from server.analysis.utils.parallel import map_in_processes
+
+PARSE_MODES = ["serial", "chunked", "sample"]
+
+# Starting the worker processes takes a few seconds, smaller inputs are parsed
+# serially in every mode.
+_PARALLEL_MIN_MESSAGES = 50_000
+
+_WILDCARD = "<*>"
+_UNMERGED = "\0"
+
+
+def run_parser(enhancer, item_list_col, field) -> pl.DataFrame:
+    if item_list_col == "e_event_drain_id":
+        return enhancer.parse_drain(field)
+    elif item_list_col == "e_event_tip_id":
+        return enhancer.parse_tip(field)
+    elif item_list_col == "e_event_brain_id":
+        return enhancer.parse_brain(field)
+    elif item_list_col == "e_event_pliplom_id":
+        enhancer.words(field)
+        return enhancer.parse_pliplom(field)
+    elif item_list_col == "e_event_iplom_id":
+        return enhancer.parse_iplom(field)
+    else:
+        raise ValueError(f"Unsupported parser: {item_list_col}")
+
+
+def parse_events(
+    enhancer, item_list_col, field, mode="serial", workers=1, sample_size=100_000
+) -> pl.DataFrame:
+    """Add the item_list_col event ids of field to the enhancer frame.
+
+    serial runs the loglead parser on all rows. chunked splits the rows into
+    one contiguous chunk per worker and parses the chunks in parallel.
+    sample fits the parser on a sample of the distinct messages and matches
+    the rest of the rows to the templates found in parallel. The event ids of
+    the parallel modes are not the ones the serial parser gives, see
+    parse_in_chunks and parse_with_sample.
+    """
+    if mode not in PARSE_MODES:
+        raise ValueError(f"Unsupported parse mode: {mode}")
+
+    workers = min(workers, os.cpu_count() or 1)
+    messages = enhancer.df[field]
+
+    if mode == "chunked" and workers > 1 and len(messages) >= _PARALLEL_MIN_MESSAGES:
+        event_ids = parse_in_chunks(messages, item_list_col, workers)
+    elif mode == "sample" and len(messages) > max(sample_size, _PARALLEL_MIN_MESSAGES):
+        event_ids = parse_with_sample(messages, item_list_col, workers, sample_size)
+    else:
+        return run_parser(enhancer, item_list_col, field)
+
+    return enhancer.df.with_columns(event_ids.alias(item_list_col))
+
+
+def parse_in_chunks(messages: pl.Series, item_list_col, workers) -> pl.Series:
+    """Parse contiguous chunks of messages in parallel and merge the clusters.
+
+    None of the parsers can be merged exactly, they all depend on the other
+    messages in their input. The clusters of each chunk are described by a
+    template with the tokens shared by all of their messages, and clusters
+    with the same template get the same event id. Event ids are numbered by
+    the first row of their template, so the result only depends on the
+    messages and the number of workers.
+    """
+    templates = map_in_processes(
+        _parse_templates,
+        [
+            (item_list_col, chunk.to_list(), f"chunk_{i}")
+            for i, chunk in enumerate(_split(messages, workers))
+        ],
+        workers,
+    )
+    return _number_templates(pl.Series([t for chunk in templates for t in chunk]))
+
+
+def parse_with_sample(
+    messages: pl.Series, item_list_col, workers, sample_size
+) -> pl.Series:
+    """Fit the parser on a sample of messages and assign the rest in parallel.
+
+    The parser runs on sample_size distinct messages, in the order they first
+    appear, and the templates found are used as a TemplateModel for all of the
+    messages.
+    """
+    distinct = messages.drop_nulls().unique(maintain_order=True)
+    sample = distinct.gather(
+        distinct.to_frame()
+        .with_row_index()
+        .sample(min(sample_size, len(distinct)), seed=0)["index"]
+        .sort()
+    )
+
+    model = TemplateModel(item_list_col)
+    model.parse(sample)
+    return model.parse(messages, workers)
+
+
+def _parse_templates(args) -> list[str | None]:
+    item_list_col, messages, name = args
+    df = pl.DataFrame({"message": messages}, schema={"message": pl.String})
+
+    if item_list_col == "e_event_drain_id":
+        # loglead parses with a module level miner, which would carry the
+        # clusters of the previous chunk over to the next one.
+        miner = TemplateMiner(config=DrainTemplateMinerNoMasking.config)
+        event_ids = [
+            None if message is None else miner.add_log_message(message)["cluster_id"]
+            for message in messages
+        ]
+        df = df.with_columns(pl.Series(item_list_col, event_ids, dtype=pl.Int64))
+    else:
+        df = run_parser(EventLogEnhancer(df), item_list_col, "message")
+
+    return _cluster_templates(df["message"], df[item_list_col], name).to_list()
+
+
+def _cluster_templates(
+    messages: pl.Series, event_ids: pl.Series, name: str
+) -> pl.Series:
+    """Template of the cluster of every message.
+
+    Messages of a cluster are grouped by their number of tokens. Tokens that
+    all messages of a group share at a position are kept and the rest replaced
+    with <*>. Groups without any shared token would all look alike, so they
+    get a key of their own instead that is never merged.
+    """
+    df = pl.DataFrame(
+        {"event_id": event_ids.cast(pl.String), "message": messages}
+    ).with_row_index("row")
+    clustered = df.filter(
+        pl.col("event_id").is_not_null() & pl.col("message").is_not_null()
+    )
+
+    tokens = (
+        clustered.with_columns(token=pl.col("message").str.split(" "))
+        .with_columns(length=pl.col("token").list.len())
+        .with_columns(position=pl.int_ranges("length"))
+        .explode("token", "position")
+    )
+    templates = (
+        tokens.group_by("event_id", "length", "position")
+        .agg(
+            pl.when(pl.col("token").n_unique() == 1)
+            .then(pl.col("token").first())
+            .otherwise(pl.lit(_WILDCARD))
+            .alias("token")
+        )
+        .sort("event_id", "length", "position")
+        .group_by("event_id", "length")
+        .agg(
+            template=pl.col("token").str.join(" "),
+            shared=(pl.col("token") != _WILDCARD).any(),
+        )
+        .with_columns(
+            template=pl.when("shared")
+            .then("template")
+            .otherwise(
+                pl.format(f"{_UNMERGED}{name}:{{}}:{{}}", "event_id", "length")
+            )
+        )
+        .drop("shared")
+    )
+
+    return (
+        df.with_columns(length=pl.col("message").str.split(" ").list.len())
+        .join(
+            templates,
+            on=["event_id", "length"],
+            how="left",
+            maintain_order="left",
+        )
+        .select(pl.when(pl.col("message").is_not_null()).then("template"))
+        .to_series()
+    )
+
+
+def _unique_templates(templates: pl.Series) -> list[str]:
+    return templates.drop_nulls().unique(maintain_order=True).to_list()
+
+
+def _assign_templates(args) -> list[str | None]:
+    templates, messages = args
+
+    # Most specific templates first so that the first match is the best one.
+    by_length = {}
+    for template in templates:
+        tokens = template.split(" ")
+        constants = [(i, t) for i, t in enumerate(tokens) if t != _WILDCARD]
+        by_length.setdefault(len(tokens), []).append((constants, template))
+    for candidates in by_length.values():
+        candidates.sort(key=lambda candidate: -len(candidate[0]))
+
+    assigned = []
+    for message in messages:
+        tokens = message.split(" ")
+        for constants, template in by_length.get(len(tokens), []):
+            if all(tokens[i] == token for i, token in constants):
+                assigned.append(template)
+                break
+        else:
+            assigned.append(None)
+    return assigned
+
+
+def _number_templates(templates: pl.Series) -> pl.Series:
+    unique = _unique_templates(templates)
+    return templates.replace_strict(
+        unique, [f"e{i}" for i in range(1, len(unique) + 1)], default=None
+    )
+
+
+def _split(series: pl.Series, parts) -> list[pl.Series]:
+    size = max(1, -(-len(series) // parts))
+    return [series.slice(offset, size) for offset in range(0, len(series), size)]
+
+
+class TemplateModel:
+    """Event templates learned by a parser, reusable between analyses.
+
+    The event id of a template is its position in the model, so the ids stay
+    the same for every analysis that uses the model. Messages are matched to
+    the stored templates like in parse_with_sample, and only the messages that
+    match none of them are parsed. Their templates are added to the model.
+
+    Clusters without a shared token have no template to match. Their messages
+    are stored with them and matched literally, and their key is a hash of
+    the messages so that the same cluster always gets the same key.
+    """
+
+    def __init__(self, item_list_col, templates=None, members=None):
+        self._item_list_col = item_list_col
+        self._templates = list(templates or [])
+        self._members = dict(members or {})
+        self._changed = False
+
+    @classmethod
+    def load(cls, path, item_list_col) -> "TemplateModel":
+        if not os.path.exists(path):
+            return cls(item_list_col)
+        return cls(item_list_col, *_read_model(path))
+
+    @classmethod
+    @contextmanager
+    def locked(cls, path, item_list_col):
+        """Load the model at path and save it on exit.
+
+        Other analyses of the same model wait until the model is saved, so
+        the event ids handed out in between are the ones that are stored.
+        """
+        with _file_lock(path):
+            model = cls.load(path, item_list_col)
+            yield model
+            model._write(path)
+
+    def save(self, path):
+        with _file_lock(path):
+            self._write(path)
+
+    def _write(self, path):
+        if not self._changed:
+            return
+
+        # Templates stored by other analyses since the load keep their ids,
+        # only the templates they do not have are appended.
+        if os.path.exists(path):
+            stored, stored_members = _read_model(path)
+            known = set(stored)
+            self._templates = stored + [
+                template for template in self._templates if template not in known
+            ]
+            self._members = {**stored_members, **self._members}
+
+        messages = {}
+        for message, template in self._members.items():
+            messages.setdefault(template, []).append(message)
+
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            pl.DataFrame(
+                {
+                    "template": self._templates,
+                    "messages": [messages.get(t) for t in self._templates],
+                },
+                schema={"template": pl.String, "messages": pl.List(pl.String)},
+            ).write_parquet(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._changed = False
+
+    def parse(self, messages: pl.Series, workers=1) -> pl.Series:
+        templates = messages.replace_strict(
+            list(self._members),
+            list(self._members.values()),
+            default=None,
+            return_dtype=pl.String,
+        )
+        matchable = [
+            template
+            for template in self._templates
+            if not template.startswith(_UNMERGED)
+        ]
+        rows = (templates.is_null() & messages.is_not_null()).arg_true()
+        if matchable and not rows.is_empty():
+            assigned = map_in_processes(
+                _assign_templates,
+                [
+                    (matchable, chunk.to_list())
+                    for chunk in _split(messages.gather(rows), workers)
+                ],
+                workers,
+            )
+            templates = templates.scatter(
+                rows,
+                pl.Series([t for chunk in assigned for t in chunk], dtype=pl.String),
+            )
+
+        unmatched = (templates.is_null() & messages.is_not_null()).arg_true()
+        if not unmatched.is_empty():
+            leftover = messages.gather(unmatched)
+            distinct = leftover.unique(maintain_order=True)
+            parsed = _hash_unmerged(
+                pl.DataFrame(
+                    {
+                        "message": distinct,
+                        "template": _parse_templates(
+                            (self._item_list_col, distinct.to_list(), "model")
+                        ),
+                    },
+                    schema={"message": pl.String, "template": pl.String},
+                )
+            )
+            self._members.update(
+                parsed.filter(pl.col("template").str.starts_with(_UNMERGED)).rows()
+            )
+            self._add(_unique_templates(parsed["template"]))
+            templates = templates.scatter(
+                unmatched,
+                leftover.to_frame("message")
+                .join(parsed, on="message", how="left", maintain_order="left")[
+                    "template"
+                ],
+            )
+
+        return templates.replace_strict(
+            self._templates,
+            [f"e{i}" for i in range(1, len(self._templates) + 1)],
+            default=None,
+        )
+
+    def _add(self, templates):
+        known = set(self._templates)
+        new = [template for template in templates if template not in known]
+        if new:
+            self._templates.extend(new)
+            self._changed = True
+
+    def __len__(self):
+        return len(self._templates)
+
+
+def _read_model(path) -> tuple[list[str], dict[str, str]]:
+    df = pl.read_parquet(path)
+    members = {}
+    if "messages" in df.columns:
+        members = dict(
+            df.explode("messages")
+            .drop_nulls("messages")
+            .select("messages", "template")
+            .rows()
+        )
+    return df["template"].to_list(), members
+
+
+def _hash_unmerged(parsed: pl.DataFrame) -> pl.DataFrame:
+    # The key of a cluster without a template is the hash of its messages,
+    # the event id the parser gave it depends on the other messages.
+    unmerged = (
+        parsed.filter(pl.col("template").str.starts_with(_UNMERGED))
+        .group_by("template")
+        .agg(pl.col("message").sort())
+        .rows()
+    )
+    keys = {
+        template: _UNMERGED
+        + hashlib.sha256("\n".join(messages).encode()).hexdigest()[:32]
+        for template, messages in unmerged
+    }
+    return parsed.with_columns(pl.col("template").replace(keys))
+
+
+@contextmanager
+def _file_lock(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
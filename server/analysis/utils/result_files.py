@@ -0,0 +1,392 @@
+import json
+import math
+import mmap
+import os
+import tempfile
+import uuid
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+RESULT_CHUNK_SIZE = 1024 * 1024
+RESULT_ROW_GROUP_SIZE = 64 * 1024
+RESULT_COMPRESSIONS = ["uncompressed", "snappy", "gzip", "brotli", "lz4", "zstd"]
+
+# Line level results are read one seq_id at a time, so they are stored sorted
+# with every seq_id in as few row groups as possible.
+LINE_LEVEL_LAYOUT = {"sort_by": ["seq_id", "line_number"], "row_groups_by": "seq_id"}
+
+
+def write_result_file(
+    df: pl.DataFrame,
+    path,
+    sort_by=None,
+    row_groups_by=None,
+    compression="zstd",
+    compression_level=None,
+    row_group_size=RESULT_ROW_GROUP_SIZE,
+):
+    """Write a result Parquet file with min/max statistics.
+
+    The rows are first sorted by the sort_by columns that exist in df. With
+    row_groups_by consecutive values of that column are packed into row
+    groups of at most row_group_size rows, so a value only spans several row
+    groups if it alone has more rows than that.
+    """
+    if compression not in RESULT_COMPRESSIONS:
+        raise ValueError(f"Unsupported compression: {compression}")
+
+    sort_by = [col for col in sort_by or [] if col in df.columns]
+    if sort_by:
+        df = df.sort(sort_by, maintain_order=True)
+
+    if row_groups_by is None or row_groups_by not in df.columns:
+        df.write_parquet(
+            path,
+            compression=compression,
+            compression_level=compression_level,
+            statistics=True,
+            row_group_size=row_group_size,
+        )
+        return
+
+    group_lengths = df[row_groups_by].rle().struct.field("len").to_list()
+    table = df.to_arrow()
+
+    with pq.ParquetWriter(
+        path,
+        table.schema,
+        compression="none" if compression == "uncompressed" else compression,
+        compression_level=compression_level,
+        write_statistics=True,
+    ) as writer:
+        for offset, length in _row_group_slices(group_lengths, row_group_size):
+            writer.write_table(table.slice(offset, length), row_group_size=length)
+
+
+def stream_result_file(path, columns=None, chunk_size=RESULT_CHUNK_SIZE):
+    """Return an iterator over the bytes of a result Parquet file.
+
+    Without columns the file itself is memory-mapped and streamed as is.
+    With columns only those column chunks are copied, one row group at a
+    time and with the codec of the result, into a temporary Parquet file next
+    to the result, which is removed once the iterator is exhausted or closed.
+    """
+    if columns is None:
+        return _FileChunks(path, chunk_size)
+
+    fd, tmp_path = tempfile.mkstemp(suffix=".parquet.tmp", dir=os.path.dirname(path))
+    os.close(fd)
+
+    try:
+        _copy_columns(path, tmp_path, columns)
+        return _FileChunks(tmp_path, chunk_size, remove=True)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _copy_columns(path, tmp_path, columns):
+    source = pq.ParquetFile(path)
+    schema = pa.schema([source.schema_arrow.field(col) for col in columns])
+
+    # The column chunks keep the codec they have in the result, so that the
+    # copy is not compressed with another codec than the file it comes from.
+    codecs = {}
+    if source.num_row_groups > 0:
+        row_group = source.metadata.row_group(0)
+        for i in range(row_group.num_columns):
+            chunk = row_group.column(i)
+            codec = chunk.compression.lower()
+            codecs[chunk.path_in_schema.split(".")[0]] = {
+                "uncompressed": "none",
+                "lz4_raw": "lz4",
+            }.get(codec, codec)
+
+    with pq.ParquetWriter(
+        tmp_path,
+        schema,
+        compression={col: codecs.get(col, "none") for col in columns},
+        write_statistics=False,
+    ) as writer:
+        for i in range(source.num_row_groups):
+            table = source.read_row_group(i, columns=columns).select(columns)
+            writer.write_table(table, row_group_size=table.num_rows)
+
+
+def read_result_columns(path) -> list[str]:
+    return list(pl.read_parquet_schema(path).keys())
+
+
+def get_index_path(path) -> str:
+    return f"{os.path.splitext(path)[0]}.index.parquet"
+
+
+def get_summary_path(path) -> str:
+    return f"{os.path.splitext(path)[0]}.summary.json"
+
+
+def remove_result_file(path):
+    """Remove a result file together with its side files."""
+    os.remove(path)
+
+    for side_path in [get_index_path(path), get_summary_path(path)]:
+        if os.path.exists(side_path):
+            os.remove(side_path)
+
+
+def build_result_summary(df: pl.DataFrame | pl.LazyFrame) -> dict:
+    """Summarise a result for the result pages.
+
+    Contains the row count, columns, distinct seq_ids with their row counts,
+    distinct runs, prediction columns and the min, max and median of every
+    numeric column. Only the columns needed for these are read from a
+    LazyFrame.
+    """
+    lf = df.lazy()
+    schema = lf.collect_schema()
+    numeric_columns = [col for col, dtype in schema.items() if dtype.is_numeric()]
+
+    stats = lf.select(
+        pl.len().alias("row_count"),
+        *[pl.col(col).min().alias(f"min:{col}") for col in numeric_columns],
+        *[pl.col(col).max().alias(f"max:{col}") for col in numeric_columns],
+        *[pl.col(col).median().alias(f"median:{col}") for col in numeric_columns],
+    ).collect()
+
+    summary = {
+        "row_count": stats["row_count"].item(),
+        "columns": schema.names(),
+        "prediction_columns": [col for col in schema if "pred_ano_proba" in col],
+        "column_stats": {
+            col: {
+                stat: _json_number(stats[f"{stat}:{col}"].item())
+                for stat in ["min", "max", "median"]
+            }
+            for col in numeric_columns
+        },
+        "seq_ids": [],
+        "seq_id_row_counts": {},
+        "runs": [],
+    }
+
+    if "seq_id" in schema:
+        counts = lf.group_by("seq_id").len().sort("seq_id").collect()
+        summary["seq_ids"] = counts["seq_id"].to_list()
+        summary["seq_id_row_counts"] = dict(counts.iter_rows())
+
+    if "run" in schema:
+        runs = lf.select(pl.col("run").unique().sort()).collect()
+        summary["runs"] = runs["run"].to_list()
+
+    return summary
+
+
+def write_result_summary(df: pl.DataFrame | pl.LazyFrame, path) -> dict:
+    summary = build_result_summary(df)
+    summary_path = get_summary_path(path)
+
+    tmp_path = f"{summary_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(summary, f)
+        os.replace(tmp_path, summary_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return summary
+
+
+def read_result_summary(path) -> dict:
+    """Return the summary of a result, creating it for older results."""
+    try:
+        with open(get_summary_path(path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return write_result_summary(pl.scan_parquet(path), path)
+
+
+def _json_number(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def read_seq_id_index(path) -> pl.DataFrame:
+    """Return the seq_id index of a line level result, building it if needed.
+
+    The index has one row per seq_id and row group with the range of line
+    numbers the row group holds for that seq_id. It is stored next to the
+    result and only the seq_id and line_number columns are read to build it.
+    """
+    index_path = get_index_path(path)
+    if os.path.exists(index_path):
+        return pl.read_parquet(index_path)
+
+    index = _build_seq_id_index(path)
+
+    tmp_path = f"{index_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        index.write_parquet(tmp_path)
+        os.replace(tmp_path, index_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return index
+
+
+def read_result_slice(
+    path, seq_id, line_start=None, line_end=None, columns=None
+) -> pl.DataFrame:
+    """Read the rows of one seq_id, optionally limited to a line range.
+
+    Only the row groups that the seq_id index lists for the seq_id and line
+    range are read from the result.
+    """
+    schema = pl.read_parquet_schema(path)
+    line_filter = _line_range_filter(line_start, line_end)
+    if line_filter is not None and "line_number" not in schema:
+        raise ValueError("Result has no line_number column")
+
+    index = read_seq_id_index(path).filter(pl.col("seq_id") == seq_id)
+    if line_start is not None:
+        index = index.filter(pl.col("max_line") >= line_start)
+    if line_end is not None:
+        index = index.filter(pl.col("min_line") <= line_end)
+
+    read_columns = list(schema.keys())
+    if columns is not None:
+        filter_columns = ["seq_id"]
+        if line_filter is not None:
+            filter_columns.append("line_number")
+        read_columns = list(dict.fromkeys(columns + filter_columns))
+
+    row_groups = index["row_group"].unique().sort().to_list()
+    if row_groups:
+        table = pq.ParquetFile(path).read_row_groups(row_groups, columns=read_columns)
+        df = pl.from_arrow(table)
+    else:
+        df = pl.DataFrame(schema=schema).select(read_columns)
+
+    df = df.filter(pl.col("seq_id") == seq_id)
+    if line_filter is not None:
+        df = df.filter(line_filter)
+
+    return df if columns is None else df.select(columns)
+
+
+def filter_line_range(df, line_start=None, line_end=None) -> pl.DataFrame:
+    line_filter = _line_range_filter(line_start, line_end)
+    return df if line_filter is None else df.filter(line_filter)
+
+
+def _line_range_filter(line_start, line_end):
+    if line_start is None and line_end is None:
+        return None
+    if line_start is None:
+        return pl.col("line_number") <= line_end
+    if line_end is None:
+        return pl.col("line_number") >= line_start
+    return pl.col("line_number").is_between(line_start, line_end)
+
+
+def _build_seq_id_index(path) -> pl.DataFrame:
+    parquet_file = pq.ParquetFile(path)
+    schema_names = parquet_file.schema_arrow.names
+    if "seq_id" not in schema_names:
+        raise ValueError("Result has no seq_id column")
+
+    has_line_numbers = "line_number" in schema_names
+    columns = ["seq_id", "line_number"] if has_line_numbers else ["seq_id"]
+
+    row_groups = []
+    for row_group in range(parquet_file.num_row_groups):
+        df = pl.from_arrow(parquet_file.read_row_group(row_group, columns=columns))
+        if not has_line_numbers:
+            df = df.with_columns(pl.lit(None, dtype=pl.Int64).alias("line_number"))
+
+        row_groups.append(
+            df.group_by("seq_id").agg(
+                pl.lit(row_group, dtype=pl.UInt32).alias("row_group"),
+                pl.col("line_number").min().cast(pl.Int64).alias("min_line"),
+                pl.col("line_number").max().cast(pl.Int64).alias("max_line"),
+            )
+        )
+
+    if not row_groups:
+        return pl.DataFrame(
+            schema={
+                "seq_id": pl.String,
+                "row_group": pl.UInt32,
+                "min_line": pl.Int64,
+                "max_line": pl.Int64,
+            }
+        )
+
+    return pl.concat(row_groups).sort("seq_id", "row_group")
+
+
+def _row_group_slices(group_lengths, row_group_size):
+    slices = []
+    start = 0
+    size = 0
+
+    for length in group_lengths:
+        if size and size + length > row_group_size:
+            slices.append((start, size))
+            start += size
+            size = 0
+
+        size += length
+        while size > row_group_size:
+            slices.append((start, row_group_size))
+            start += row_group_size
+            size -= row_group_size
+
+    if size:
+        slices.append((start, size))
+
+    return slices
+
+
+class _FileChunks:
+    # An iterator with close() so that the WSGI server releases the file even
+    # if the client disconnects before the body has been sent.
+
+    def __init__(self, path, chunk_size, remove=False):
+        self._path = path
+        self._remove = remove
+        self._chunk_size = chunk_size
+        self._position = 0
+
+        # Opened eagerly so that a missing file fails before the response starts.
+        self._file = open(path, "rb")
+        self._mapped = None
+        if os.fstat(self._file.fileno()).st_size > 0:
+            self._mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        if self._mapped is None or self._position >= len(self._mapped):
+            self.close()
+            raise StopIteration
+
+        start = self._position
+        self._position += self._chunk_size
+        return self._mapped[start : self._position]
+
+    def close(self):
+        if self._file.closed:
+            return
+
+        if self._mapped is not None:
+            self._mapped.close()
+        self._file.close()
+
+        if self._remove:
+            os.remove(self._path)
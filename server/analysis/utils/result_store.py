@@ -0,0 +1,138 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import polars as pl
+from flask import current_app
+
+from server.analysis.utils.analysis_helpers import get_data_cache
+from server.analysis.utils.data_cache import DataCache
+from server.analysis.utils.result_files import filter_line_range, read_result_slice
+
+
+class ResultStore:
+    """In-process LRU cache of the seq_id slices of line level results.
+
+    Frames are keyed by analysis id and seq_id. Results are never modified
+    after they have been written, so entries only have to be dropped when an
+    analysis is deleted. When the total size of the cached frames exceeds
+    max_bytes the least recently used frames are evicted. Evicted slices are
+    written to the spill cache first if one is given so that they can be
+    reloaded without reading the result Parquet again.
+    """
+
+    def __init__(self, max_bytes, spill_cache: DataCache | None = None):
+        self._max_bytes = max_bytes
+        self._spill_cache = spill_cache
+        self._frames = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get_slice(
+        self,
+        analysis_id: int,
+        results_path: str,
+        seq_id: str,
+        line_start=None,
+        line_end=None,
+    ) -> pl.DataFrame:
+        key = (analysis_id, seq_id)
+        df = self._get_cached(key)
+        if df is None and self._spill_cache is not None:
+            df = self._spill_cache.get(self._spill_key(analysis_id, seq_id))
+            if df is not None:
+                self._put(key, df)
+        if df is not None:
+            return filter_line_range(df, line_start, line_end)
+
+        # A line range of a seq_id that has not been cached is read directly
+        # so that only the row groups of that range are loaded.
+        if line_start is not None or line_end is not None:
+            return read_result_slice(results_path, seq_id, line_start, line_end)
+
+        df = read_result_slice(results_path, seq_id)
+        self._put(key, df)
+        return df
+
+    def discard(self, analysis_id: int):
+        with self._lock:
+            for key in [key for key in self._frames if key[0] == analysis_id]:
+                self._size -= self._frames.pop(key).estimated_size()
+
+        if self._spill_cache is not None:
+            self._spill_cache.discard_prefix(self._spill_key(analysis_id))
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._size = 0
+
+    def _get_cached(self, key):
+        with self._lock:
+            df = self._frames.get(key)
+            if df is not None:
+                self._frames.move_to_end(key)
+            return df
+
+    def _put(self, key, df):
+        size = df.estimated_size()
+        evicted = []
+
+        with self._lock:
+            if key in self._frames:
+                return
+
+            self._frames[key] = df
+            self._size += size
+
+            # The newest frame is kept even if it alone is over the limit, the
+            # caller holds a reference to it anyway.
+            while self._size > self._max_bytes and len(self._frames) > 1:
+                evicted_key, evicted_df = self._frames.popitem(last=False)
+                self._size -= evicted_df.estimated_size()
+                evicted.append((evicted_key, evicted_df))
+
+        if self._spill_cache is not None:
+            for (evicted_id, seq_id), evicted_df in evicted:
+                spill_key = self._spill_key(evicted_id, seq_id)
+                if not self._spill_cache.contains(spill_key):
+                    self._spill_cache.put(spill_key, evicted_df)
+
+    @staticmethod
+    def _spill_key(analysis_id, seq_id=None):
+        # seq_ids are file paths, the key of a slice uses their hash instead.
+        # Without a seq_id the key is the prefix of every slice of the result.
+        key = f"analysis_{analysis_id}_"
+        if seq_id is None:
+            return key
+        return key + hashlib.sha256(seq_id.encode()).hexdigest()[:32]
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._frames
+
+    @property
+    def size(self):
+        return self._size
+
+
+def get_result_store() -> ResultStore:
+    store = current_app.extensions.get("result_store")
+    if store is None:
+        store = current_app.extensions.setdefault(
+            "result_store", _create_result_store()
+        )
+    return store
+
+
+def _create_result_store() -> ResultStore:
+    config = current_app.config
+
+    spill_cache = None
+    if config.get("RESULT_STORE_SPILL"):
+        spill_cache = get_data_cache("results")
+
+    return ResultStore(
+        max_bytes=config.get("RESULT_STORE_MAX_MB", 2048) * 1024 * 1024,
+        spill_cache=spill_cache,
+    )
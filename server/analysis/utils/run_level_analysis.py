@@ -1,26 +1,12 @@
 import polars as pl
 from server.analysis.enhancer import Enhancer
+from server.analysis.utils.analysis_helpers import get_unique_terms_options
+from server.analysis.utils.unique_terms import count_unique_terms
 
 
-def unique_terms_count_by_run(df, item_list_col, mask_type=None):
-    enhancer = Enhancer(df)
-    df = enhancer.enhance_event(item_list_col, mask_type=mask_type)
-
-    run_unique_terms = (
-        df.select("run", item_list_col)
-        .group_by("run")
-        .agg(
-            [
-                pl.len().alias("line_count"),
-                pl.col(item_list_col)
-                .list.explode()
-                .n_unique()
-                .alias("unique_term_count"),
-            ]
-        )
-    )
-
-    return run_unique_terms.sort("run")
+def unique_terms_count_by_run(df, item_list_col, mask_type=None, **options):
+    options = options or get_unique_terms_options()
+    return count_unique_terms(df, item_list_col, ["run"], mask_type, **options)
 
 
 def files_and_lines_count(df):
@@ -38,11 +24,16 @@ def files_and_lines_count(df):
     return files_and_lines
 
 
-def aggregate_run_level(df, item_list_col, mask_type=None):
+def aggregate_run_level(
+    df, item_list_col, mask_type=None, token_dictionary=None, enhancer_options=None
+):
     if df.get_column(item_list_col, default=None) is None:
-        enhancer = Enhancer(df)
+        enhancer = Enhancer(df, **(enhancer_options or {}))
         df = enhancer.enhance_event(item_list_col, mask_type)
 
+    if token_dictionary is not None:
+        df = df.with_columns(token_dictionary.encode(df[item_list_col]))
+
     col_dtype = df.select(pl.col(item_list_col)).dtypes[0]
 
     if isinstance(col_dtype, pl.List):
@@ -0,0 +1,103 @@
+import numpy as np
+import polars as pl
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import (
+    CountVectorizer,
+    TfidfTransformer,
+    TfidfVectorizer,
+)
+
+
+class TokenDictionary:
+    """Tokens of item list columns interned as UInt32 ids.
+
+    The id of a token is its position in the dictionary. Tokens are added the
+    first time they are encoded, so frames encoded with the same dictionary
+    share their ids.
+    """
+
+    def __init__(self, tokens=None):
+        self._tokens = pl.Series("token", tokens or [], dtype=pl.String)
+
+    def encode(self, tokens: pl.Series) -> pl.Series:
+        """Replace a String or List[String] column with UInt32 token ids."""
+        is_list = isinstance(tokens.dtype, pl.List)
+        flat = tokens.explode() if is_list else tokens
+
+        new = flat.drop_nulls().unique(maintain_order=True)
+        new = new.filter(~new.is_in(self._tokens.implode()))
+        if not new.is_empty():
+            self._tokens = pl.concat([self._tokens, new.alias("token")])
+
+        dtype = pl.Enum(self._tokens)
+        if is_list:
+            return tokens.cast(pl.List(dtype)).list.eval(pl.element().to_physical())
+        return tokens.cast(dtype).to_physical()
+
+    def decode(self, ids: pl.Series) -> pl.Series:
+        """Tokens of UInt32 ids, explode List[UInt32] columns first."""
+        return self._tokens.gather(ids).alias(ids.name)
+
+    @property
+    def tokens(self) -> pl.Series:
+        return self._tokens
+
+    def __len__(self):
+        return len(self._tokens)
+
+
+def vectorize_token_ids(
+    train_ids: pl.Series, test_ids: pl.Series, dictionary, vectorizer_class
+):
+    """Document-term matrices of List[UInt32] token id columns.
+
+    The matrices are the ones vectorizer_class(analyzer=identity) gives when
+    fit on the train tokens, with the columns in the same order, but they are
+    counted from the ids without turning them into Python lists.
+    """
+    if not isinstance(vectorizer_class, type) or not issubclass(
+        vectorizer_class, CountVectorizer
+    ):
+        raise ValueError(f"Unsupported vectorizer: {vectorizer_class}")
+
+    train_rows, train_tokens = _coordinates(train_ids)
+    test_rows, test_tokens = _coordinates(test_ids)
+
+    # sklearn orders the vocabulary by token
+    vocabulary = np.unique(train_tokens)
+    vocabulary = vocabulary[
+        dictionary.decode(pl.Series(vocabulary, dtype=pl.UInt32)).arg_sort()
+    ]
+    columns = np.full(len(dictionary), -1, dtype=np.int64)
+    columns[vocabulary] = np.arange(len(vocabulary))
+
+    X_train = _count_matrix(
+        train_rows, columns[train_tokens], (len(train_ids), len(vocabulary))
+    )
+    X_test = _count_matrix(
+        test_rows, columns[test_tokens], (len(test_ids), len(vocabulary))
+    )
+
+    if issubclass(vectorizer_class, TfidfVectorizer):
+        transformer = TfidfTransformer().fit(X_train)
+        X_train = transformer.transform(X_train)
+        X_test = transformer.transform(X_test)
+
+    return X_train, X_test
+
+
+def _coordinates(ids: pl.Series) -> tuple[np.ndarray, np.ndarray]:
+    ids = ids.list.drop_nulls()
+    lengths = ids.list.len().fill_null(0).to_numpy()
+    tokens = ids.explode().drop_nulls().to_numpy()
+    return np.repeat(np.arange(len(ids)), lengths), tokens.astype(np.int64)
+
+
+def _count_matrix(rows, columns, shape) -> csr_matrix:
+    known = columns >= 0
+    matrix = csr_matrix(
+        (np.ones(known.sum(), dtype=np.int64), (rows[known], columns[known])),
+        shape=shape,
+    )
+    matrix.sum_duplicates()
+    return matrix
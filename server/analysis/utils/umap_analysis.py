@@ -1,15 +1,39 @@
+import numpy as np
 import polars as pl
 import umap
+from sklearn.decomposition import TruncatedSVD
 
+_SEED = 42
 
-def create_umap_embeddings(documents, vectorizer):
+
+def create_umap_embeddings(documents, vectorizer, svd_components=0, sample_size=0):
+    """Two dimensional UMAP embeddings of the documents.
+
+    The document-term matrix is kept sparse. With svd_components it is first
+    reduced to that many dimensions with TruncatedSVD. With sample_size and
+    more documents than that, UMAP is fitted on a random sample of them and
+    the rest are transformed into the fitted embedding.
+    """
     vectorizer = vectorizer(
         tokenizer=lambda x: x, preprocessor=None, token_pattern=None, lowercase=False
     )
 
-    dtm = vectorizer.fit_transform(documents)
+    dtm = vectorizer.fit_transform(documents).astype(np.float32)
+    if svd_components and svd_components < dtm.shape[1]:
+        svd = TruncatedSVD(n_components=svd_components, random_state=_SEED)
+        dtm = svd.fit_transform(dtm)
+
     reducer = umap.UMAP()
-    embeddings = reducer.fit_transform(dtm.toarray())
+    if not sample_size or dtm.shape[0] <= sample_size:
+        return reducer.fit_transform(dtm)
+
+    rng = np.random.default_rng(_SEED)
+    sample = np.zeros(dtm.shape[0], dtype=bool)
+    sample[rng.choice(dtm.shape[0], sample_size, replace=False)] = True
+
+    embeddings = np.empty((dtm.shape[0], 2), dtype=np.float32)
+    embeddings[sample] = reducer.fit_transform(dtm[sample])
+    embeddings[~sample] = reducer.transform(dtm[~sample])
 
     return embeddings
 
@@ -0,0 +1,168 @@
+import math
+
+import polars as pl
+
+from server.analysis.enhancer import PARSER_COLUMNS, Enhancer
+from server.analysis.utils.parsing import TemplateModel
+from server.analysis.utils.tokens import TokenDictionary
+
+
+def count_unique_terms(
+    df,
+    item_list_col,
+    group_cols: list[str],
+    mask_type=None,
+    chunk_rows=500_000,
+    approximate=False,
+    error_rate=0.01,
+    enhancer_options=None,
+) -> pl.DataFrame:
+    """Line count and number of distinct terms of every group.
+
+    df can be a LazyFrame, such as the scan of a Loader. The rows are
+    collected and enhanced chunk_rows at a time, so only the messages and
+    terms of one chunk are in memory at once. Exact counts keep the distinct
+    token ids of every group. Approximate counts keep a HyperLogLog sketch
+    per group instead, with a standard error of about error_rate.
+
+    Data that fits in one chunk is enhanced like any other analysis. The
+    chunks of larger data are parsed against one shared template model, so
+    their event counts are approximate and differ from a parse of all rows.
+    """
+    if chunk_rows < 1:
+        raise ValueError("chunk_rows must be at least 1")
+
+    lf = df.lazy()
+    height = lf.select(pl.len()).collect().item()
+
+    # Parsers number their events per input, a shared model keeps the event ids
+    # of the chunks the same.
+    template_model = (
+        TemplateModel(item_list_col)
+        if item_list_col in PARSER_COLUMNS and height > chunk_rows
+        else None
+    )
+    counter = (
+        _HyperLogLogCounter(group_cols, error_rate)
+        if approximate
+        else _ExactCounter(group_cols)
+    )
+
+    line_counts = []
+    for offset in range(0, height, chunk_rows):
+        chunk = lf.slice(offset, chunk_rows).collect()
+        enhancer = Enhancer(
+            chunk, template_model=template_model, **(enhancer_options or {})
+        )
+        chunk = enhancer.enhance_event(item_list_col, mask_type=mask_type)
+        line_counts.append(
+            chunk.group_by(group_cols).agg(pl.len().alias("line_count"))
+        )
+
+        terms = chunk.select(*group_cols, pl.col(item_list_col).alias("term"))
+        if isinstance(terms.schema["term"], pl.List):
+            terms = terms.explode("term")
+        counter.add(terms.drop_nulls("term"))
+
+    line_counts = pl.concat(line_counts).group_by(group_cols).agg(pl.sum("line_count"))
+    return (
+        line_counts.join(counter.counts(), on=group_cols, how="left")
+        .with_columns(pl.col("unique_term_count").fill_null(0))
+        .sort(group_cols[0])
+    )
+
+
+class _ExactCounter:
+    def __init__(self, group_cols):
+        self._group_cols = group_cols
+        self._dictionary = TokenDictionary()
+        self._terms = None
+
+    def add(self, terms: pl.DataFrame):
+        terms = terms.with_columns(self._dictionary.encode(terms["term"])).unique()
+        if self._terms is not None:
+            terms = pl.concat([self._terms, terms]).unique()
+        self._terms = terms
+
+    def counts(self) -> pl.DataFrame:
+        if self._terms is None:
+            return _empty_counts(self._group_cols)
+        return self._terms.group_by(self._group_cols).agg(
+            pl.len().cast(pl.UInt32).alias("unique_term_count")
+        )
+
+
+class _HyperLogLogCounter:
+    """HyperLogLog sketches of the terms of every group.
+
+    A term is hashed to 64 bits, the first precision bits select one of the
+    2^precision registers and the register keeps the highest position of the
+    first one bit in the rest of the hash. Sketches of chunks are merged by
+    taking the maximum of each register.
+    """
+
+    def __init__(self, group_cols, error_rate):
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+
+        self._group_cols = group_cols
+        # The standard error of the estimate is 1.04 / sqrt(2^precision)
+        self._precision = min(18, max(4, math.ceil(2 * math.log2(1.04 / error_rate))))
+        self._registers = None
+
+    def add(self, terms: pl.DataFrame):
+        suffix_bits = 64 - self._precision
+        registers = (
+            terms.with_columns(pl.col("term").hash(seed=0).alias("hash"))
+            .with_columns(
+                register=(pl.col("hash") // 2**suffix_bits).cast(pl.UInt32),
+                rank=(
+                    (pl.col("hash") % 2**suffix_bits).bitwise_leading_zeros()
+                    - self._precision
+                    + 1
+                ).cast(pl.UInt8),
+            )
+            .group_by(*self._group_cols, "register")
+            .agg(pl.max("rank"))
+        )
+        if self._registers is not None:
+            registers = (
+                pl.concat([self._registers, registers])
+                .group_by(*self._group_cols, "register")
+                .agg(pl.max("rank"))
+            )
+        self._registers = registers
+
+    def counts(self) -> pl.DataFrame:
+        if self._registers is None:
+            return _empty_counts(self._group_cols)
+
+        m = 2**self._precision
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        # Registers that were never set are 0 and add 2^0 to the sum
+        sketches = self._registers.group_by(self._group_cols).agg(
+            harmonic_sum=(2.0 ** -pl.col("rank").cast(pl.Float64)).sum()
+            + (m - pl.len()),
+            zero_registers=m - pl.len(),
+        )
+        estimate = alpha * m**2 / pl.col("harmonic_sum")
+        # Small cardinalities are estimated from the number of empty registers
+        small_estimate = m * (m / pl.col("zero_registers").cast(pl.Float64)).log()
+        return sketches.select(
+            *self._group_cols,
+            pl.when((estimate <= 2.5 * m) & (pl.col("zero_registers") > 0))
+            .then(small_estimate)
+            .otherwise(estimate)
+            .round()
+            .cast(pl.UInt32)
+            .alias("unique_term_count"),
+        )
+
+
+def _empty_counts(group_cols) -> pl.DataFrame:
+    return pl.DataFrame(
+        schema={
+            **{col: pl.String for col in group_cols},
+            "unique_term_count": pl.UInt32,
+        }
+    )
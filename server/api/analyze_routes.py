@@ -102,6 +102,8 @@ def create_umap(project_id):
     vectorizer = validation_result.vectorizer
     mask_type = validation_result.mask_type
     analysis_name = validation_result.name
+    svd_components = validation_result.svd_components
+    sample_size = validation_result.sample_size
 
     task = async_create_umap.delay(
         project_id,
@@ -111,6 +113,8 @@ def create_umap(project_id):
         file_level,
         vectorizer,
         mask_type,
+        svd_components,
+        sample_size,
     )
 
     return jsonify({"task_id": task.id}), 202
@@ -143,6 +147,9 @@ def log_distance(project_id):
     mask_type = validation_result.mask_type
     vectorizer = validation_result.vectorizer
     analysis_name = validation_result.name
+    matrix = validation_result.matrix
+    top_k = validation_result.top_k
+    nearest = validation_result.nearest
 
     task = async_log_distance.delay(
         project_id,
@@ -154,5 +161,8 @@ def log_distance(project_id):
         file_level,
         mask_type,
         vectorizer,
+        matrix,
+        top_k,
+        nearest,
     )
     return jsonify({"task_id": task.id}), 202
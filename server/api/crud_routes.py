@@ -1,11 +1,19 @@
-import os
 import io
+import os
 import logging
+import shutil
 
-import polars as pl
 from flask import Blueprint, Response, jsonify, request
 from pydantic import ValidationError
 
+from server.analysis.utils.analysis_helpers import get_template_model_dir
+from server.analysis.utils.result_files import (
+    read_result_columns,
+    read_result_summary,
+    remove_result_file,
+    stream_result_file,
+)
+from server.analysis.utils.result_store import get_result_store
 from server.extensions import db
 from server.models.analysis import Analysis
 from server.models.project import Project
@@ -44,7 +52,12 @@ def delete_project(project_id: int):
 
     try:
         for analysis in analyses:
-            os.remove(analysis.results_path)
+            get_result_store().discard(analysis.id)
+            remove_result_file(analysis.results_path)
+
+        template_model_dir = get_template_model_dir(project_id)
+        if template_model_dir:
+            shutil.rmtree(template_model_dir, ignore_errors=True)
 
         db.session.delete(project)
         db.session.commit()
@@ -114,58 +127,184 @@ def get_analysis(analysis_id: int):
     if not analysis:
         return jsonify({"error": f"Analysis not found. Id: {analysis_id}"}), 404
 
-    buffer = None
     try:
-        with open(analysis.results_path, "rb") as file:
-            buffer = io.BytesIO(file.read())
-
-        buffer.seek(0)
-
-        if analysis.analysis_level == "line" and not raw:
-            settings = Settings.query.filter_by(
-                project_id=analysis.project_id
-            ).first_or_404()
-            display_mode = settings.line_level_display_mode
-
-            if display_mode == "data_points_only":
-                df = pl.read_parquet(buffer)
-                columns_to_drop = [col for col in df.columns if "moving_avg" in col]
-            elif display_mode == "moving_avg_only":
-                df = pl.read_parquet(buffer)
-                columns_to_drop = [
-                    col
-                    for col in df.columns
-                    if "pred_ano_proba" in col and not col.startswith("moving_avg")
-                ]
-            else:
-                return Response(buffer.getvalue(), mimetype="application/octet-stream")
-
-            if columns_to_drop:
-                df = df.drop([col for col in columns_to_drop if col in df.columns])
-                buffer = io.BytesIO()
-                df.write_parquet(buffer)
-                buffer.seek(0)
-            else:
-                buffer.seek(0)
-                return Response(buffer.getvalue(), mimetype="application/octet-stream")
+        columns, available_columns = _get_requested_columns(analysis, raw)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error(
+            f"Error reading columns for analysis {analysis_id}: {str(e)}",
+            exc_info=True,
+        )
+        return jsonify({"error": str(e)}), 500
 
-        return Response(buffer.getvalue(), mimetype="application/octet-stream")
+    try:
+        headers = {}
+        if columns == available_columns:
+            columns = None
+            headers["Content-Length"] = os.path.getsize(analysis.results_path)
+
+        return Response(
+            stream_result_file(analysis.results_path, columns),
+            mimetype="application/octet-stream",
+            headers=headers,
+            direct_passthrough=True,
+        )
     except Exception as e:
         logging.error(
             f"Error fetching results for analysis {analysis_id}: {str(e)}",
             exc_info=True,
         )
         return jsonify({"error": str(e)}), 500
-    finally:
-        if buffer:
-            buffer.close()
+
+
+@crud_bp.route("/analyses/<int:analysis_id>/summary", methods=["GET"])
+def get_analysis_summary(analysis_id: int):
+    analysis = db.session.get(Analysis, analysis_id)
+    if not analysis:
+        return jsonify({"error": f"Analysis not found. Id: {analysis_id}"}), 404
+
+    try:
+        return jsonify(read_result_summary(analysis.results_path)), 200
+    except Exception as e:
+        logging.error(
+            f"Error reading summary for analysis {analysis_id}: {str(e)}",
+            exc_info=True,
+        )
+        return jsonify({"error": str(e)}), 500
+
+
+@crud_bp.route("/analyses/<int:analysis_id>/seq_ids", methods=["GET"])
+def get_analysis_seq_ids(analysis_id: int):
+    analysis = db.session.get(Analysis, analysis_id)
+    if not analysis:
+        return jsonify({"error": f"Analysis not found. Id: {analysis_id}"}), 404
+
+    try:
+        summary = read_result_summary(analysis.results_path)
+        return jsonify({"seq_ids": summary["seq_ids"]}), 200
+    except Exception as e:
+        logging.error(
+            f"Error reading seq_ids for analysis {analysis_id}: {str(e)}",
+            exc_info=True,
+        )
+        return jsonify({"error": str(e)}), 500
+
+
+@crud_bp.route("/analyses/<int:analysis_id>/slice", methods=["GET"])
+def get_analysis_slice(analysis_id: int):
+    raw = request.args.get("raw", "false").lower() == "true"
+    seq_id = request.args.get("seq_id")
+    if not seq_id:
+        return jsonify({"error": "seq_id is required"}), 400
+
+    try:
+        line_start = _parse_line_number(request.args.get("line_start"))
+        line_end = _parse_line_number(request.args.get("line_end"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    analysis = db.session.get(Analysis, analysis_id)
+    if not analysis:
+        return jsonify({"error": f"Analysis not found. Id: {analysis_id}"}), 404
+
+    try:
+        columns, _ = _get_requested_columns(analysis, raw)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error(
+            f"Error reading columns for analysis {analysis_id}: {str(e)}",
+            exc_info=True,
+        )
+        return jsonify({"error": str(e)}), 500
+
+    try:
+        df = get_result_store().get_slice(
+            analysis.id, analysis.results_path, seq_id, line_start, line_end
+        )
+        df = df.select(columns)
+
+        buffer = io.BytesIO()
+        df.write_parquet(buffer, compression="lz4", statistics=False)
+        return Response(buffer.getvalue(), mimetype="application/octet-stream")
+    except Exception as e:
+        logging.error(
+            f"Error fetching slice {seq_id} of analysis {analysis_id}: {str(e)}",
+            exc_info=True,
+        )
+        return jsonify({"error": str(e)}), 500
+
+
+@crud_bp.route("/analyses/<int:analysis_id>/columns", methods=["GET"])
+def get_analysis_columns(analysis_id: int):
+    analysis = db.session.get(Analysis, analysis_id)
+    if not analysis:
+        return jsonify({"error": f"Analysis not found. Id: {analysis_id}"}), 404
+
+    try:
+        return jsonify({"columns": read_result_columns(analysis.results_path)}), 200
+    except Exception as e:
+        logging.error(
+            f"Error reading columns for analysis {analysis_id}: {str(e)}",
+            exc_info=True,
+        )
+        return jsonify({"error": str(e)}), 500
+
+
+def _parse_line_number(value):
+    if value is None:
+        return None
+    if not value.isdigit():
+        raise ValueError(f"Invalid line number: {value}")
+    return int(value)
+
+
+def _get_requested_columns(analysis, raw):
+    available_columns = read_result_columns(analysis.results_path)
+    columns = _parse_columns_arg(request.args.get("columns"), available_columns)
+
+    if analysis.analysis_level == "line" and not raw:
+        settings = Settings.query.filter_by(
+            project_id=analysis.project_id
+        ).first_or_404()
+        columns = _get_display_columns(columns, settings.line_level_display_mode)
+
+    return columns, available_columns
+
+
+def _parse_columns_arg(columns_arg, available_columns):
+    if not columns_arg:
+        return available_columns
+
+    columns = [col.strip() for col in columns_arg.split(",") if col.strip()]
+    unknown_columns = [col for col in columns if col not in available_columns]
+    if unknown_columns:
+        raise ValueError(f"Unknown columns: {', '.join(unknown_columns)}")
+
+    return list(dict.fromkeys(columns))
+
+
+def _get_display_columns(columns, display_mode):
+    if display_mode == "data_points_only":
+        return [col for col in columns if "moving_avg" not in col]
+
+    if display_mode == "moving_avg_only":
+        return [
+            col
+            for col in columns
+            if "pred_ano_proba" not in col or col.startswith("moving_avg")
+        ]
+
+    return columns
 
 
 @crud_bp.route("/analyses/<int:analysis_id>", methods=["DELETE"])
 def delete_analysis(analysis_id: int):
     analysis = Analysis.query.filter_by(id=analysis_id).first_or_404()
     try:
-        os.remove(analysis.results_path)
+        get_result_store().discard(analysis.id)
+        remove_result_file(analysis.results_path)
         db.session.delete(analysis)
         db.session.commit()
         return {}, 204
@@ -25,6 +25,8 @@ class UmapParams(BaseModel):
     vectorizer: Literal["count", "tfidf"] = "count"
     mask_type: Optional[str] = None
     name: Optional[str]
+    svd_components: Optional[int] = Field(default=None, ge=0)
+    sample_size: Optional[int] = Field(default=None, ge=0)
 
     @field_validator("directory_path", mode="after")
     @classmethod
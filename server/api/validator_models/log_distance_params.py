@@ -1,19 +1,23 @@
 from typing import List, Literal, Optional
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing_extensions import Self
 
 from server.api.validator_models.validator_utils import validate_directory_path
 
 
 class LogDistanceParams(BaseModel):
     directory_path: str = Field(alias="dir_path")
-    target_run: str
+    target_run: Optional[str] = None
     comparison_runs: Optional[List[str]] = None
     item_list_col: str = "e_words"
     file_level: bool = False
     mask_type: Optional[str] = None
     vectorizer: Literal["count", "tfidf"] = "count"
     name: Optional[str]
+    matrix: bool = False
+    top_k: Optional[int] = Field(default=None, ge=1)
+    nearest: Literal["similar", "dissimilar"] = "similar"
 
     @field_validator("directory_path", mode="after")
     @classmethod
@@ -40,3 +44,9 @@ class LogDistanceParams(BaseModel):
         raise ValueError(
             "Comparison runs must be a comma-separated string or a list of strings"
         )
+
+    @model_validator(mode="after")
+    def check_target_run(self) -> Self:
+        if not self.matrix and not self.target_run:
+            raise ValueError("Target run is required unless a matrix is computed.")
+        return self
@@ -6,6 +6,57 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     RESULTS_PATH = os.getenv("RESULTS_DIRECTORY")
     LOG_DATA_PATH = os.getenv("LOG_DATA_DIRECTORY")
+    DATA_CACHE_PATH = os.getenv("DATA_CACHE_DIRECTORY") or (
+        os.path.join(RESULTS_PATH, "cache") if RESULTS_PATH else None
+    )
+    DATA_CACHE_MAX_SIZE_MB = int(os.getenv("DATA_CACHE_MAX_SIZE_MB", 20480))
+    DATA_CACHE_MAX_AGE_HOURS = int(os.getenv("DATA_CACHE_MAX_AGE_HOURS", 168))
+    DATA_CACHE_INCREMENTAL = (
+        os.getenv("DATA_CACHE_INCREMENTAL", "false").lower() == "true"
+    )
+    ENHANCER_DEDUPLICATE_PARSING = (
+        os.getenv("ENHANCER_DEDUPLICATE_PARSING", "false").lower() == "true"
+    )
+    ENHANCER_PARSE_MODE = os.getenv("ENHANCER_PARSE_MODE", "serial")
+    ENHANCER_PARSE_WORKERS = int(os.getenv("ENHANCER_PARSE_WORKERS", 1))
+    ENHANCER_PARSE_SAMPLE_SIZE = int(os.getenv("ENHANCER_PARSE_SAMPLE_SIZE", 100000))
+    PARSER_TEMPLATE_MODELS = (
+        os.getenv("PARSER_TEMPLATE_MODELS", "false").lower() == "true"
+    )
+    ANALYSIS_FILE_WORKERS = int(os.getenv("ANALYSIS_FILE_WORKERS", 1))
+    ANALYSIS_MODEL_WORKERS = int(os.getenv("ANALYSIS_MODEL_WORKERS", 1))
+    LOG_DISTANCE_WORKERS = int(os.getenv("LOG_DISTANCE_WORKERS", 1))
+    LOG_DISTANCE_BLOCK_ROWS = int(os.getenv("LOG_DISTANCE_BLOCK_ROWS", 256))
+    LOG_DISTANCE_COMPRESSION = os.getenv("LOG_DISTANCE_COMPRESSION", "bz2")
+    LOG_DISTANCE_COMPRESSION_LEVEL = (
+        int(os.getenv("LOG_DISTANCE_COMPRESSION_LEVEL"))
+        if os.getenv("LOG_DISTANCE_COMPRESSION_LEVEL")
+        else None
+    )
+    LOG_DISTANCE_COMPRESSION_SAMPLE_SIZE = int(
+        os.getenv("LOG_DISTANCE_COMPRESSION_SAMPLE_SIZE", 0)
+    )
+    LOG_DISTANCE_MINHASH_PERMUTATIONS = int(
+        os.getenv("LOG_DISTANCE_MINHASH_PERMUTATIONS", 128)
+    )
+    LOG_DISTANCE_MINHASH_BANDS = int(os.getenv("LOG_DISTANCE_MINHASH_BANDS", 32))
+    UMAP_SVD_COMPONENTS = int(os.getenv("UMAP_SVD_COMPONENTS", 0))
+    UMAP_SAMPLE_SIZE = int(os.getenv("UMAP_SAMPLE_SIZE", 0))
+    UNIQUE_TERMS_CHUNK_ROWS = int(os.getenv("UNIQUE_TERMS_CHUNK_ROWS", 500000))
+    UNIQUE_TERMS_APPROXIMATE = (
+        os.getenv("UNIQUE_TERMS_APPROXIMATE", "false").lower() == "true"
+    )
+    UNIQUE_TERMS_ERROR_RATE = float(os.getenv("UNIQUE_TERMS_ERROR_RATE", 0.01))
+    LOADER_WORKERS = int(os.getenv("LOADER_WORKERS", 1))
+    RESULT_COMPRESSION = os.getenv("RESULT_COMPRESSION", "zstd")
+    RESULT_COMPRESSION_LEVEL = (
+        int(os.getenv("RESULT_COMPRESSION_LEVEL"))
+        if os.getenv("RESULT_COMPRESSION_LEVEL")
+        else None
+    )
+    RESULT_ROW_GROUP_SIZE = int(os.getenv("RESULT_ROW_GROUP_SIZE", 65536))
+    RESULT_STORE_MAX_MB = int(os.getenv("RESULT_STORE_MAX_MB", 2048))
+    RESULT_STORE_SPILL = os.getenv("RESULT_STORE_SPILL", "false").lower() == "true"
     # CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
     CELERY = {
         "broker_url": os.getenv("CELERY_BROKER_URL"),
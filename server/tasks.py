@@ -180,6 +180,8 @@ def async_create_umap(
     file_level: bool,
     vectorizer: str,
     mask_type: str,
+    svd_components: int | None = None,
+    sample_size: int | None = None,
 ) -> dict:
     start_time = datetime.now(timezone.utc).isoformat()
     meta = {"analysis_type": "UMAP", "start_time": start_time}
@@ -196,6 +198,8 @@ def async_create_umap(
             file_level,
             vectorizer,
             mask_type,
+            svd_components=svd_components,
+            sample_size=sample_size,
             log=_make_logger(self, meta, logs),
         )
 
@@ -228,12 +232,15 @@ def async_log_distance(
     project_id: int,
     analysis_name: str | None,
     directory_path: str,
-    target_run: str,
+    target_run: str | None,
     comparison_runs: list[str] | None,
     item_list_col: str,
     file_level: bool,
     mask_type: str | None,
     vectorizer: str,
+    matrix: bool = False,
+    top_k: int | None = None,
+    nearest: str = "similar",
 ) -> dict:
     start_time = datetime.now(timezone.utc).isoformat()
     meta = {"analysis_type": "Log distance", "start_time": start_time}
@@ -252,6 +259,9 @@ def async_log_distance(
             file_level,
             mask_type,
             vectorizer,
+            matrix,
+            top_k,
+            nearest,
             log=_make_logger(self, meta, logs),
         )
 
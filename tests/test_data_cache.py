@@ -0,0 +1,105 @@
+import os
+import time
+from unittest.mock import patch
+import numpy as np
+import polars as pl
+from polars.testing import assert_frame_equal
+
+from server.analysis.utils.data_cache import (
+    DataCache,
+    fingerprint_files,
+    fingerprint_series,
+)
+
+class TestDataCache:
+    def test_put_and_get_roundtrip(self, tmp_path):
+        cache = DataCache(str(tmp_path))
+        df = pl.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})
+
+        cache.put("key", df)
+
+        assert cache.contains("key")
+        assert_frame_equal(cache.get("key"), df)
+
+    def test_get_missing_key_returns_none(self, tmp_path):
+        cache = DataCache(str(tmp_path))
+
+        assert cache.get("missing") is None
+
+    def test_evict_by_size_removes_least_recently_used(self, tmp_path):
+        df = pl.DataFrame({"a": list(range(10_000))})
+        cache = DataCache(str(tmp_path))
+        cache.put("old", df)
+        cache.put("new", df)
+
+        entry_size = os.path.getsize(tmp_path / "old.arrow")
+        past = time.time() - 100
+        os.utime(tmp_path / "old.arrow", (past, past))
+
+        cache = DataCache(str(tmp_path), max_size_bytes=entry_size)
+        cache.evict()
+
+        assert not cache.contains("old")
+        assert cache.contains("new")
+
+    def test_namespaces_share_the_size_budget(self, tmp_path):
+        # Random values do not compress, the entries are about as large on
+        # disk as in memory.
+        df = pl.DataFrame({"a": np.random.default_rng(0).random(10_000)})
+        DataCache(str(tmp_path / "parsed")).put("old", df)
+        entry_size = os.path.getsize(tmp_path / "parsed" / "old.arrow")
+        past = time.time() - 100
+        os.utime(tmp_path / "parsed" / "old.arrow", (past, past))
+
+        cache = DataCache(
+            str(tmp_path / "enhanced"),
+            max_size_bytes=int(entry_size * 1.5),
+            budget_dir=str(tmp_path),
+        )
+        cache.put("new", df)
+
+        assert not (tmp_path / "parsed" / "old.arrow").exists()
+        assert cache.contains("new")
+
+    def test_entry_larger_than_the_limit_is_not_written(self, tmp_path):
+        cache = DataCache(str(tmp_path), max_size_bytes=1024)
+        cache.put("small", pl.DataFrame({"a": [1]}))
+
+        with patch.object(pl.DataFrame, "write_ipc") as mock_write:
+            cache.put("large", pl.DataFrame({"a": list(range(10_000))}))
+
+        mock_write.assert_not_called()
+        assert not cache.contains("large")
+        assert cache.contains("small")
+
+    def test_evict_by_age(self, tmp_path):
+        cache = DataCache(str(tmp_path), max_age_seconds=60)
+        cache.put("stale", pl.DataFrame({"a": [1]}))
+
+        past = time.time() - 120
+        os.utime(tmp_path / "stale.arrow", (past, past))
+        cache.evict()
+
+        assert not cache.contains("stale")
+
+    def test_fingerprint_changes_when_file_changes(self, tmp_path):
+        log_file = tmp_path / "run" / "a.log"
+        log_file.parent.mkdir()
+        log_file.write_text("line 1\n")
+        before = fingerprint_files([str(log_file)])
+
+        with open(log_file, "a") as f:
+            f.write("line 2\n")
+
+        assert fingerprint_files([str(log_file)]) != before
+
+    def test_fingerprint_of_list_series(self):
+        lists = pl.Series([["a", "b"], [], ["c"]])
+
+        assert fingerprint_series(lists) == fingerprint_series(lists.clone())
+        assert fingerprint_series(lists) != fingerprint_series(
+            pl.Series([["a"], ["b"], ["c"]])
+        )
+        assert fingerprint_series(lists) != fingerprint_series(
+            pl.Series([["a", "b"], [""], ["c"]])
+        )
@@ -0,0 +1,153 @@
+from unittest.mock import patch
+
+import polars as pl
+import pytest
+from loglead.enhancers import EventLogEnhancer
+from polars.testing import assert_frame_equal
+
+import server.analysis.enhancer as enhancer_module
+from server.analysis.enhancer import Enhancer
+from server.analysis.utils.data_cache import DataCache
+
+
+def _messages():
+    return pl.DataFrame(
+        {
+            "run": ["run_1", "run_1", "run_2"],
+            "m_message": [
+                "2024-01-01 12:00:00 INFO user 123 logged in",
+                "2024-01-01 12:00:01 ERROR connection to 10.0.0.1 failed",
+                "2024-01-01 12:00:02 INFO user 456 logged in",
+            ],
+        }
+    )
+
+
+class TestEnhancementCache:
+    @pytest.mark.parametrize(
+        "item_list_col, mask_type",
+        [("e_words", "myllari"), ("e_trigrams", None), ("e_event_drain_id", "myllari")],
+    )
+    def test_cached_matches_uncached(self, tmp_path, item_list_col, mask_type):
+        cache = DataCache(str(tmp_path))
+        expected = Enhancer(_messages()).enhance_event(item_list_col, mask_type)
+
+        first = Enhancer(_messages(), cache=cache).enhance_event(
+            item_list_col, mask_type
+        )
+        second = Enhancer(_messages(), cache=cache).enhance_event(
+            item_list_col, mask_type
+        )
+
+        assert_frame_equal(first, expected)
+        assert_frame_equal(second, expected)
+
+    def test_hit_skips_enhancement(self, tmp_path):
+        cache = DataCache(str(tmp_path))
+        Enhancer(_messages(), cache=cache).enhance_event("e_words", "myllari")
+
+        with patch.object(
+            enhancer_module, "EventLogEnhancer", autospec=True
+        ) as mock_enhancer:
+            df = Enhancer(_messages(), cache=cache).enhance_event("e_words", "myllari")
+
+        mock_enhancer.assert_not_called()
+        assert "e_words" in df.columns
+
+    def test_key_depends_on_settings_and_messages(self, tmp_path):
+        cache = DataCache(str(tmp_path))
+        Enhancer(_messages(), cache=cache).enhance_event("e_words", "myllari")
+
+        Enhancer(_messages(), cache=cache).enhance_event("e_words", None)
+        Enhancer(_messages(), cache=cache).enhance_event("e_trigrams", "myllari")
+        Enhancer(_messages().reverse(), cache=cache).enhance_event("e_words", "myllari")
+
+        assert len(list(tmp_path.glob("*.arrow"))) == 4
+
+    def test_parse_workers_are_not_in_the_key_of_a_serial_parse(self, tmp_path):
+        cache = DataCache(str(tmp_path))
+
+        for parse_workers in [1, 4]:
+            Enhancer(
+                _messages(), cache=cache, parse_workers=parse_workers
+            ).enhance_event("e_event_drain_id")
+        Enhancer(
+            _messages(), cache=cache, parse_mode="chunked", parse_workers=4
+        ).enhance_event("e_event_drain_id")
+
+        assert len(list(tmp_path.glob("*.arrow"))) == 2
+
+    def test_no_cache_is_used_unless_given(self):
+        with patch.object(enhancer_module, "fingerprint_series") as mock_fingerprint:
+            df = Enhancer(_messages()).enhance_event("e_words", "myllari")
+
+        mock_fingerprint.assert_not_called()
+        assert "e_words" in df.columns
+
+
+def _repeated_messages():
+    messages = _messages()
+    return pl.concat([messages, messages.reverse(), messages]).with_row_index(
+        "line_number"
+    )
+
+
+class TestDeduplication:
+    @pytest.mark.parametrize(
+        "item_list_col, mask_type",
+        [("e_words", "myllari"), ("e_trigrams", None), ("e_trigrams", "drain_orig")],
+    )
+    def test_matches_loglead(self, item_list_col, mask_type):
+        df = _repeated_messages()
+        enhancer = Enhancer(df)
+        expected = EventLogEnhancer(df)
+        if mask_type:
+            expected.normalize(enhancer._get_regex_mask(mask_type))
+        field = "e_message_normalized" if mask_type else "m_message"
+        expected = getattr(expected, item_list_col[2:])(field)
+
+        assert_frame_equal(enhancer.enhance_event(item_list_col, mask_type), expected)
+
+    def test_keeps_null_messages(self):
+        df = pl.DataFrame({"m_message": ["a 1", None, "a 1", None]})
+
+        result = Enhancer(df).enhance_event("e_trigrams", "myllari")
+
+        assert result["m_message"].to_list() == ["a 1", None, "a 1", None]
+        assert result["e_message_normalized"].null_count() == 2
+
+    @pytest.mark.parametrize(
+        "item_list_col", ["e_event_drain_id", "e_event_iplom_id", "e_event_tip_id"]
+    )
+    def test_parsing_distinct_messages(self, item_list_col):
+        df = _repeated_messages()
+
+        result = Enhancer(df, deduplicate_parsing=True).enhance_event(
+            item_list_col, "myllari"
+        )
+
+        assert result.height == df.height
+        assert result["line_number"].to_list() == df["line_number"].to_list()
+        assert result[item_list_col].null_count() == 0
+        ids = result.group_by("m_message").agg(pl.col(item_list_col).n_unique())
+        assert ids[item_list_col].max() == 1
+
+    def test_parsing_runs_once_per_distinct_message(self):
+        df = _repeated_messages()
+
+        with patch.object(
+            EventLogEnhancer, "parse_brain", autospec=True
+        ) as mock_parse:
+            mock_parse.side_effect = lambda enhancer, field: enhancer.df.with_columns(
+                e_event_brain_id=pl.col(field)
+            )
+            result = Enhancer(df, deduplicate_parsing=True).enhance_event(
+                "e_event_brain_id", "myllari"
+            )
+
+        parsed = mock_parse.call_args.args[0].df
+        assert parsed.height == df["m_message"].n_unique()
+        assert_frame_equal(
+            result.select(pl.col("e_event_brain_id").alias("e_message_normalized")),
+            result.select("e_message_normalized"),
+        )
@@ -0,0 +1,247 @@
+import os
+from unittest.mock import patch
+import polars as pl
+import pytest
+from loglead.loaders import RawLoader
+from polars.testing import assert_frame_equal
+
+import server.analysis.loader as server_loader
+from server.analysis.loader import Loader, list_log_files
+from server.analysis.utils.data_cache import DataCache
+from server.analysis.utils.data_filtering import filter_files, filter_runs
+
+LABELED = "./log_data/LO2/Labeled"
+
+
+def _raw_loader_reference(directory_path):
+    raw_loader = RawLoader(
+        directory_path,
+        filename_pattern="*.log",
+        strip_full_data_path=directory_path,
+    )
+    return Loader(directory_path)._prepare_raw_data(raw_loader.execute())
+
+
+class TestCachedLoader:
+    def test_load_matches_raw_loader(self):
+        loader = Loader(LABELED, "raw")
+        loader.load()
+
+        assert_frame_equal(loader.df, _raw_loader_reference(LABELED))
+
+    def test_cached_load_matches_uncached_load(self, tmp_path):
+        loader = Loader(LABELED, "raw")
+        loader.load()
+
+        cache = DataCache(str(tmp_path))
+        cached_loader = Loader(LABELED, "raw", cache=cache)
+        cached_loader.load()
+
+        assert_frame_equal(cached_loader.df, loader.df)
+
+    def test_repeat_load_reads_from_cache(self, tmp_path):
+        cache = DataCache(str(tmp_path))
+        first = Loader(LABELED, "raw", cache=cache)
+        first.load()
+
+        with patch.object(Loader, "_scan_raw_files") as mock_scan:
+            second = Loader(LABELED, "raw", cache=cache)
+            second.load()
+
+        mock_scan.assert_not_called()
+        assert_frame_equal(second.df, first.df)
+
+    def test_fingerprint_changes_when_a_file_changes(self, tmp_path):
+        log_file = tmp_path / "run" / "a.log"
+        log_file.parent.mkdir()
+        log_file.write_text("line 1\n")
+        loader = Loader(str(tmp_path), "raw")
+        before = loader.fingerprint("e_words")
+
+        assert loader.fingerprint("e_words") == before
+        assert loader.fingerprint("e_trigrams") != before
+
+        with open(log_file, "a") as f:
+            f.write("line 2\n")
+
+        assert loader.fingerprint("e_words") != before
+
+    def test_list_log_files_matches_loaded_files(self):
+        loader = Loader(LABELED, "raw")
+        loader.load()
+
+        loaded = set(loader.df["orig_file_name"].unique().to_list())
+
+        assert set(list_log_files(LABELED)) == loaded
+
+
+class TestLazyLoader:
+    def test_scan_with_runs_matches_filtered_load(self):
+        df = _raw_loader_reference(LABELED)
+        runs = ["correct_1", "correct_3"]
+
+        lf = Loader(LABELED, "raw").scan(runs=runs)
+
+        assert isinstance(lf, pl.LazyFrame)
+        assert_frame_equal(lf.collect(), filter_runs(df, runs))
+
+    def test_scan_with_files_matches_filtered_load(self):
+        df = _raw_loader_reference(LABELED)
+        files = df["orig_file_name"].unique().sort().to_list()[:2]
+
+        lf = Loader(LABELED, "raw").scan(files=files)
+
+        assert_frame_equal(lf.collect(), filter_files(df, files))
+
+    def test_filtered_out_files_are_not_read(self):
+        runs = ["correct_1"]
+        expected = [
+            path
+            for path in list_log_files(LABELED)
+            if path.removeprefix(LABELED).strip("/").startswith("correct_1/")
+        ]
+
+        with patch.object(
+            Loader, "_scan_raw_file", autospec=True, side_effect=Loader._scan_raw_file
+        ) as mock_scan_file:
+            Loader(LABELED, "raw").scan(runs=runs).collect()
+
+        assert [call.args[1] for call in mock_scan_file.call_args_list] == expected
+
+    def test_scan_selects_columns(self, tmp_path):
+        cache = DataCache(str(tmp_path))
+        Loader(LABELED, "raw", cache=cache).load()
+
+        df = Loader(LABELED, "raw", cache=cache).scan(columns=["run", "file_name"])
+
+        assert df.collect().columns == ["run", "file_name"]
+
+
+def _write(path, content, mode="w"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, mode) as f:
+        f.write(content)
+
+
+def _full_load(directory_path):
+    loader = Loader(directory_path, "raw")
+    loader.load()
+    return loader.df
+
+
+def _sorted(df):
+    return df.sort("orig_file_name", "line_number")
+
+
+class TestIncrementalLoader:
+    def _make_logs(self, tmp_path):
+        logs = tmp_path / "logs"
+        _write(logs / "run_1" / "a.log", "start a\n\nsecond a\nthird a\n")
+        _write(logs / "run_1" / "b.log", "only b\n")
+        _write(logs / "run_2" / "c.log", "first c\nsecond c\n")
+        return logs
+
+    def test_first_load_matches_full_load(self, tmp_path):
+        logs = str(self._make_logs(tmp_path))
+        cache = DataCache(str(tmp_path / "cache"))
+
+        loader = Loader(logs, "raw", cache=cache, incremental=True)
+        loader.load()
+
+        assert_frame_equal(loader.df, _full_load(logs))
+
+    def test_appended_new_and_deleted_files(self, tmp_path):
+        logs_dir = self._make_logs(tmp_path)
+        logs = str(logs_dir)
+        cache = DataCache(str(tmp_path / "cache"))
+        Loader(logs, "raw", cache=cache, incremental=True).load()
+
+        _write(logs_dir / "run_1" / "a.log", "fourth a\n\nfifth a\nunfinished", "a")
+        _write(logs_dir / "error-1" / "d.log", "first d\n")
+        os.remove(logs_dir / "run_1" / "b.log")
+
+        loader = Loader(logs, "raw", cache=cache, incremental=True)
+        loader.load()
+
+        assert_frame_equal(_sorted(loader.df), _sorted(_full_load(logs)))
+        assert "b.log" not in loader.df["file_name"].to_list()
+
+    def test_appended_file_is_parsed_from_offset(self, tmp_path):
+        logs_dir = self._make_logs(tmp_path)
+        logs = str(logs_dir)
+        cache = DataCache(str(tmp_path / "cache"))
+        Loader(logs, "raw", cache=cache, incremental=True).load()
+
+        _write(logs_dir / "run_2" / "c.log", "third c\n", "a")
+
+        with patch(
+            "server.analysis.loader._read_raw_bytes",
+            wraps=server_loader._read_raw_bytes,
+        ) as mock_read:
+            loader = Loader(logs, "raw", cache=cache, incremental=True)
+            loader.load()
+
+        mock_read.assert_called_once_with(b"third c\n")
+        df_c = loader.df.filter(pl.col("file_name") == "c.log")
+        assert df_c["line_number"].to_list() == [1, 2, 3]
+
+    def test_rewritten_file_is_reparsed(self, tmp_path):
+        logs_dir = self._make_logs(tmp_path)
+        logs = str(logs_dir)
+        cache = DataCache(str(tmp_path / "cache"))
+        Loader(logs, "raw", cache=cache, incremental=True).load()
+
+        _write(logs_dir / "run_1" / "a.log", "rewritten line one\nline two\nmore\n")
+
+        loader = Loader(logs, "raw", cache=cache, incremental=True)
+        loader.load()
+
+        assert_frame_equal(_sorted(loader.df), _sorted(_full_load(logs)))
+
+
+@patch("server.analysis.loader._PARALLEL_MIN_BYTES", 0)
+@patch("os.cpu_count", return_value=2)
+class TestParallelLoader:
+    @pytest.mark.parametrize("shard_by", ["size", "run"])
+    def test_parallel_load_matches_serial_load(self, mock_cpu_count, shard_by):
+        serial = Loader(LABELED, "raw")
+        serial.load()
+
+        with patch(
+            "server.analysis.loader.map_in_processes",
+            wraps=server_loader.map_in_processes,
+        ) as mock_map:
+            parallel = Loader(LABELED, "raw", workers=2, shard_by=shard_by)
+            parallel.load()
+
+        assert mock_map.call_args.kwargs["workers"] == 2
+        assert_frame_equal(parallel.df, serial.df)
+
+    def test_workers_are_capped_by_cpu_count(self, mock_cpu_count):
+        loader = Loader(LABELED, "raw", workers=8)
+
+        assert loader._parallel_workers() == 2
+
+    def test_size_shards_cover_every_file_once(self, mock_cpu_count):
+        file_paths = list_log_files(LABELED)
+        loader = Loader(LABELED, "raw", workers=2)
+
+        shards = loader._shard_files(file_paths)
+
+        assert len(shards) <= 8
+        assert sorted(path for shard in shards for _, path in shard) == sorted(
+            file_paths
+        )
+
+    def test_unsupported_shard_strategy(self, mock_cpu_count):
+        with pytest.raises(ValueError):
+            Loader(LABELED, "raw", workers=2, shard_by="bad").load()
+
+    def test_small_input_is_parsed_serially(self, mock_cpu_count):
+        with (
+            patch("server.analysis.loader._PARALLEL_MIN_BYTES", 2**62),
+            patch.object(Loader, "_parse_raw_files_parallel") as mock_parallel,
+        ):
+            Loader(LABELED, "raw", workers=2).load()
+
+        mock_parallel.assert_not_called()
@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+import polars as pl
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer
+
+import server.analysis.log_analysis_pipeline as log_analysis_pipeline
+from server.analysis.log_analysis_pipeline import ManualTrainTestPipeline
+from server.analysis.log_analyzer import LogAnalyzer
+
+FILE_NAMES = ["a.log", "b.log", "c.log"]
+
+
+def _lines(offset):
+    return pl.DataFrame(
+        {
+            "file_name": [FILE_NAMES[i % 3] for i in range(60)],
+            "e_words": [
+                ["user", f"u{(i + offset) % 7}", "logged", FILE_NAMES[i % 3]]
+                for i in range(60)
+            ],
+        }
+    )
+
+
+def _pipeline(**analyzer_options):
+    pipeline = ManualTrainTestPipeline(
+        model_names=["rm", "oovd"],
+        item_list_col="e_words",
+        vectorizer=CountVectorizer,
+        analyzer_options=analyzer_options,
+    )
+    pipeline._df_train = _lines(0)
+    pipeline._df_test = _lines(3)
+    return pipeline
+
+
+def _expected():
+    results = []
+    for file_name in sorted(FILE_NAMES):
+        analyzer = LogAnalyzer(item_list_col="e_words")
+        analyzer.manual_train_split(
+            _lines(0).filter(pl.col("file_name") == file_name),
+            _lines(3).filter(pl.col("file_name") == file_name),
+            CountVectorizer,
+        )
+        results.append(analyzer.run_models(["rm", "oovd"]))
+    return pl.concat(results)
+
+
+class TestAnalyzeGroupedByFile:
+    def test_same_as_filtering_every_file(self):
+        pipeline = _pipeline()
+
+        results = pipeline._analyze_grouped_by_file(
+            pipeline._df_train, pipeline._df_test, sorted(FILE_NAMES)
+        )
+
+        assert results.equals(_expected())
+
+    @patch("os.cpu_count", return_value=2)
+    def test_files_are_analyzed_in_processes(self, mock_cpu_count):
+        pipeline = _pipeline(file_workers=4)
+
+        with patch.object(
+            log_analysis_pipeline,
+            "map_in_processes",
+            wraps=log_analysis_pipeline.map_in_processes,
+        ) as mock_map:
+            results = pipeline._analyze_grouped_by_file(
+                pipeline._df_train, pipeline._df_test, sorted(FILE_NAMES)
+            )
+
+        assert mock_map.call_args.args[2] == 2
+        assert results.equals(_expected())
+
+    def test_no_common_file_names(self):
+        pipeline = _pipeline()
+
+        with pytest.raises(ValueError):
+            pipeline._analyze_grouped_by_file(pipeline._df_train, pipeline._df_test, [])
@@ -0,0 +1,57 @@
+from unittest.mock import patch
+
+import polars as pl
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer
+
+import server.analysis.log_analyzer as log_analyzer
+from server.analysis.log_analyzer import LogAnalyzer
+
+
+def _lines(offset):
+    return pl.DataFrame(
+        {
+            "e_words": [
+                ["user", f"u{(i + offset) % 7}", "logged", f"host{i % (3 + offset)}"]
+                for i in range(40)
+            ]
+        }
+    )
+
+
+def _results(models, model_workers=1):
+    analyzer = LogAnalyzer(item_list_col="e_words", model_workers=model_workers)
+    analyzer.manual_train_split(_lines(0), _lines(2), CountVectorizer)
+    return analyzer.run_models(models)
+
+
+class TestRunModels:
+    def test_threads_give_the_same_results(self):
+        with patch.object(
+            log_analyzer, "ThreadPoolExecutor", wraps=log_analyzer.ThreadPoolExecutor
+        ) as mock_executor:
+            results = _results(["rm", "oovd"], model_workers=4)
+
+        mock_executor.assert_called_once_with(2)
+        assert results.columns == [
+            "e_words",
+            "rm_pred_ano_proba",
+            "oovd_pred_ano_proba",
+        ]
+        assert results.equals(_results(["rm", "oovd"]))
+
+    @patch.object(log_analyzer, "ThreadPoolExecutor")
+    def test_one_model_runs_without_threads(self, mock_executor):
+        results = _results(["rm"], model_workers=4)
+
+        mock_executor.assert_not_called()
+        assert results.equals(_results(["rm"]))
+
+    @pytest.mark.parametrize("model_workers", [1, 2])
+    def test_unsupported_model(self, model_workers):
+        with pytest.raises(ValueError):
+            _results(["rm", "unknown"], model_workers=model_workers)
+
+    def test_no_models(self):
+        with pytest.raises(ValueError):
+            _results([])
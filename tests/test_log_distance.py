@@ -0,0 +1,234 @@
+from unittest.mock import patch
+
+import numpy as np
+import polars as pl
+import pytest
+from loglead.anomaly_detection import LogDistance
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+import server.analysis.utils.log_distance as log_distance
+from server.analysis.utils.log_distance import (
+    RunDistances,
+    measure_distance_matrix,
+    measure_distances,
+)
+
+DISTANCE_COLUMNS = ["cosine", "jaccard", "compression", "containment"]
+
+
+def _logs():
+    words = []
+    runs = []
+    for run in range(5):
+        for line in range(12 + run):
+            runs.append(f"run_{run}")
+            words.append(
+                ["User", f"u{(line * run) % 5}", "logged", f"host{line % (run + 2)}"]
+                if run != 3
+                else [f"only{line % 3}", "Disk", "full"]
+            )
+    return pl.DataFrame({"run": runs, "e_words": words})
+
+
+def _loglead_distances(df, target_run, vectorizer):
+    df_target = df.filter(pl.col("run") == target_run)
+    rows = []
+    for comparison_run in sorted(set(df["run"]) - {target_run}):
+        distance = LogDistance(
+            df_target,
+            df.filter(pl.col("run") == comparison_run),
+            "e_words",
+            vectorizer=vectorizer,
+        )
+        rows.append(
+            {
+                "comparison_run": comparison_run,
+                "target_lines": distance.size1,
+                "comparison_lines": distance.size2,
+                "cosine": distance.cosine(),
+                "jaccard": distance.jaccard(),
+                "compression": distance.compression(),
+                "containment": distance.containment(),
+            }
+        )
+    return pl.DataFrame(rows)
+
+
+class TestMeasureDistances:
+    @pytest.mark.parametrize("vectorizer", [CountVectorizer, TfidfVectorizer])
+    def test_same_as_loglead(self, vectorizer):
+        df = _logs()
+
+        result = measure_distances(df, "e_words", "run_1", vectorizer)
+
+        expected = _loglead_distances(df, "run_1", vectorizer)
+        assert result.columns == [
+            "target_run",
+            "comparison_run",
+            "target_lines",
+            "comparison_lines",
+            *DISTANCE_COLUMNS,
+            "zscore_sum",
+            "rank_sum",
+        ]
+        assert result["comparison_run"].equals(expected["comparison_run"])
+        assert result["comparison_lines"].to_list() == (
+            expected["comparison_lines"].to_list()
+        )
+        for column in DISTANCE_COLUMNS:
+            assert result[column].to_list() == pytest.approx(
+                expected[column].to_list(), abs=1e-12
+            )
+
+    def test_string_column(self):
+        df = _logs().with_columns(pl.col("e_words").list.join(" "))
+
+        result = measure_distances(df, "e_words", "run_0", CountVectorizer)
+
+        expected = _loglead_distances(df, "run_0", CountVectorizer)
+        for column in DISTANCE_COLUMNS:
+            assert result[column].to_list() == pytest.approx(
+                expected[column].to_list(), abs=1e-12
+            )
+
+    def test_compression_in_processes(self):
+        df = _logs()
+
+        result = measure_distances(df, "e_words", "run_2", CountVectorizer, workers=2)
+
+        expected = _loglead_distances(df, "run_2", CountVectorizer)
+        assert result["compression"].to_list() == expected["compression"].to_list()
+
+    def test_no_comparison_runs(self):
+        with pytest.raises(ValueError):
+            measure_distances(
+                _logs(), "e_words", "run_0", CountVectorizer, comparison_runs=["x"]
+            )
+
+
+class TestMeasureDistanceMatrix:
+    @pytest.mark.parametrize("block_rows", [1, 2, 256])
+    def test_rows_same_as_target_distances(self, block_rows):
+        df = _logs()
+
+        matrix = measure_distance_matrix(
+            df, "e_words", TfidfVectorizer, block_rows=block_rows
+        )
+
+        assert matrix["run"].to_list() == [f"run_{i}" for i in range(5)]
+        assert matrix["lines"].to_list() == [12, 13, 14, 15, 16]
+        for i, target_run in enumerate(matrix["run"]):
+            expected = measure_distances(df, "e_words", target_run, TfidfVectorizer)
+            for column in ["cosine", "jaccard", "containment"]:
+                row = matrix[column][i].to_list()
+                assert row[i] == 0
+                assert row[:i] + row[i + 1 :] == pytest.approx(
+                    expected[column].to_list(), abs=1e-6
+                )
+
+    def test_compression_is_symmetric(self):
+        matrix = measure_distance_matrix(_logs(), "e_words", CountVectorizer)
+
+        compression = matrix["compression"].to_numpy()
+
+        assert (compression == compression.T).all()
+        assert compression[0, 1] == pytest.approx(
+            measure_distances(_logs(), "e_words", "run_0", CountVectorizer)[
+                "compression"
+            ][0]
+        )
+
+    def test_selected_runs(self):
+        matrix = measure_distance_matrix(
+            _logs(), "e_words", CountVectorizer, runs=["run_3", "run_1", "missing"]
+        )
+
+        assert matrix["run"].to_list() == ["run_1", "run_3"]
+        assert matrix["cosine"].dtype == pl.Array(pl.Float32, 2)
+
+    def test_needs_two_runs(self):
+        with pytest.raises(ValueError):
+            measure_distance_matrix(_logs(), "e_words", CountVectorizer, runs=["run_1"])
+
+
+class TestRunDistances:
+    def test_runs_without_terms(self):
+        # Single characters are not tokens of the default vectorizers
+        df = pl.DataFrame({"run": ["a", "b", "c"], "e_words": [["xy"], ["!"], ["?"]]})
+        distances = RunDistances(df, "e_words", CountVectorizer)
+
+        result = distances.distances([1], [0, 2])
+
+        assert result["cosine"][0, 0] == 1
+        assert result["containment"][0, 0] == 1
+        assert np.isnan(result["jaccard"][0, 1])
+        assert distances.compression([(1, 0), (1, 2)]) == [
+            pytest.approx(LogDistance(df[1], df[0], "e_words").compression()),
+            None,
+        ]
+
+    def test_unsupported_vectorizer(self):
+        with pytest.raises(ValueError):
+            RunDistances(_logs(), "e_words", object)
+
+
+class TestCompressionDistance:
+    def test_sizes_of_runs_are_compressed_once(self):
+        distances = RunDistances(_logs(), "e_words", CountVectorizer)
+        pairs = [(0, column) for column in range(1, 5)]
+
+        with patch.object(
+            log_distance, "_compressed_size", wraps=log_distance._compressed_size
+        ) as mock_compressed_size:
+            first = distances.compression(pairs)
+            calls_first = mock_compressed_size.call_count
+            second = distances.compression(pairs, workers=2)
+
+        # 5 runs and 4 pairs, then only the 4 pairs again
+        assert calls_first == 9
+        assert mock_compressed_size.call_count == 13
+        assert first == second
+
+    @pytest.mark.parametrize("codec,level", [("zstd", 3), ("zlib", None)])
+    def test_codecs(self, codec, level):
+        distances = RunDistances(_logs(), "e_words", CountVectorizer)
+
+        result = distances.compression([(0, 1), (0, 3)], codec=codec, level=level)
+
+        assert result != distances.compression([(0, 1), (0, 3)])
+        assert all(0 < distance < 1.5 for distance in result)
+
+    def test_unsupported_codec(self):
+        distances = RunDistances(_logs(), "e_words", CountVectorizer)
+
+        with pytest.raises(ValueError):
+            distances.compression([(0, 1)], codec="rar")
+
+    def test_sampling_keeps_similar_runs_close(self):
+        lines = 3000
+        df = pl.DataFrame(
+            {
+                "run": ["a"] * lines + ["b"] * lines + ["c"] * lines,
+                "e_words": [
+                    ["user", f"u{i % 40}", "logged", "in"] for i in range(2 * lines)
+                ]
+                + [["disk", f"sd{i % 7}", "full", f"{i}"] for i in range(lines)],
+            }
+        )
+        distances = RunDistances(df, "e_words", CountVectorizer)
+
+        similar, different = distances.compression(
+            [(0, 1), (0, 2)], sample_size=20_000
+        )
+
+        assert len(distances._sampled_texts(20_000)[0]) == 20_000
+        assert distances._sampled_texts(10**9) == distances._texts
+        assert similar < different
+
+    def test_sample_text(self):
+        text = "".join(str(i % 10) for i in range(1000))
+
+        sample = log_distance._sample_text(text, 100, part_size=25)
+
+        assert sample == text[:25] + text[325:350] + text[650:675] + text[975:]
+
@@ -0,0 +1,125 @@
+import random
+
+import polars as pl
+import pytest
+from loglead.enhancers import EventLogEnhancer
+from polars.testing import assert_series_equal
+
+from server.analysis.regex_masks.drain_loglead import DRAIN_LOGLEAD
+from server.analysis.regex_masks.drain_orig import DRAIN_ORIG
+from server.analysis.regex_masks.myllari import MYLLARI
+from server.analysis.regex_masks.myllari_extended import MYLLARI_EXTENDED
+from server.analysis.utils.masking import MaskingEngine, mask_messages
+
+MASKS = {
+    "myllari": MYLLARI,
+    "myllari_extended": MYLLARI_EXTENDED,
+    "drain_loglead": DRAIN_LOGLEAD,
+    "drain_orig": DRAIN_ORIG,
+}
+
+MESSAGES = [
+    "",
+    "plain message without any values",
+    "BLOCK* NameSystem.allocateBlock: /user/root/rand/_temporary/"
+    "_task_200811092030_0001_m_000590_0/part-00590. blk_-1727475099218615100",
+    "Folder_0012_2323_2324 created",
+    "2024-01-02 12:34:56.789 INFO started in 1500 ms",
+    "Mon, 12 Jan 11:22 job 12/01/2024 finished at 1.2.2024 10.11.12",
+    "Jan 02 2024 DATE_12 version 10.2.3.4 took -12s",
+    "connection from 192.168.0.1:8080 to https://example.com/a?b=1 failed",
+    "txid 1234-0123456789abcdef file C:\\temp\\dir\\file.txt",
+    '"x-apikey": "secret" key \'abcdefghijklmnopqrstu\'',
+    "hex 0xDEADbeef ffeeddccbbaa 1234-abcd-ef01-2345 00:1a:2b:3c:4d",
+    "seq 0123456789ab 0123456789ab 0123456789ab ABCD EF01 2345 6789",
+    'executed cmd "ls -la /tmp" returned +42 and -7',
+    "first line 123\nsecond line 456\nthird line",
+    "\nmessage starting with a newline 999",
+    "unicode ääkköset 12345 ★ 0x1f",
+    "12:34 12:34:56 12:34:56,789 123456789 12",
+]
+
+
+def _random_messages(count=2000, seed=0):
+    rng = random.Random(seed)
+    tokens = [
+        "user",
+        "connection",
+        "failed",
+        "0x1f",
+        "1234",
+        "-17",
+        "12:00:01",
+        "2024-01-01",
+        "10.0.0.1",
+        "a1b2c3d4e5f6",
+        "v1.2.3",
+        "C:\\x\\y",
+        "https://h/p",
+        "5s",
+        "30 ms",
+        "ABCD",
+        "DATE_01",
+        "_",
+        "-",
+        ":",
+        "\n",
+    ]
+    return [
+        "".join(
+            rng.choice(tokens) + rng.choice([" ", "", "_", "/", ","])
+            for _ in range(rng.randint(0, 12))
+        )
+        for _ in range(count)
+    ]
+
+
+def _normalize(messages, masks, **kwargs):
+    df = pl.DataFrame({"m_message": messages}, schema={"m_message": pl.String})
+    return EventLogEnhancer(df).normalize(masks, **kwargs)["e_message_normalized"]
+
+
+class TestMaskingEngine:
+    @pytest.mark.parametrize("mask_type", MASKS)
+    def test_matches_normalize(self, mask_type):
+        messages = pl.Series("m_message", MESSAGES + [None])
+
+        assert_series_equal(
+            mask_messages(messages, MASKS[mask_type]),
+            _normalize(messages, MASKS[mask_type]),
+        )
+
+    @pytest.mark.parametrize("mask_type", MASKS)
+    def test_matches_normalize_on_random_messages(self, mask_type):
+        messages = pl.Series("m_message", _random_messages())
+
+        assert_series_equal(
+            mask_messages(messages, MASKS[mask_type]),
+            _normalize(messages, MASKS[mask_type]),
+        )
+
+    def test_matches_normalize_once(self):
+        messages = pl.Series("m_message", MESSAGES)
+
+        assert_series_equal(
+            mask_messages(messages, MYLLARI, twice=False),
+            _normalize(messages, MYLLARI, twice=False),
+        )
+
+    def test_order_of_masks_is_kept(self):
+        masks = [("<A>", r"ab"), ("<B>", r"<A>c")]
+
+        result = mask_messages(pl.Series(["abc", "cab", "x"]), masks)
+
+        assert result.to_list() == ["<B>", "c<A>", "x"]
+
+    def test_no_masks_takes_first_line(self):
+        result = mask_messages(pl.Series(["a\nb", None]), [])
+
+        assert result.to_list() == ["a", None]
+        assert result.name == "e_message_normalized"
+
+    def test_no_matching_rows(self):
+        result = MaskingEngine(MYLLARI).mask(pl.Series(["nothing", "to mask"]))
+
+        assert result.to_list() == ["nothing", "to mask"]
@@ -0,0 +1,88 @@
+from unittest.mock import patch
+
+import polars as pl
+from loglead import AnomalyDetector
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+import server.analysis.log_analyzer as log_analyzer
+from server.analysis.log_analyzer import LogAnalyzer
+from server.analysis.utils.data_cache import DataCache
+from server.analysis.utils.matrix_cache import get_matrices, put_matrices
+from server.analysis.utils.tokens import TokenDictionary
+
+TRAIN = pl.DataFrame(
+    {
+        "run": ["a", "b", "c", "d"],
+        "e_words": [["x", "y"], ["y", "z", "z"], ["x"], ["w", "x"]],
+    }
+)
+TEST = pl.DataFrame(
+    {"run": ["e", "f", "g"], "e_words": [["x", "q"], [], ["z", "z", "w"]]}
+)
+
+
+def _results(cache, vectorizer=CountVectorizer, train=TRAIN, test=TEST, **kwargs):
+    analyzer = LogAnalyzer(item_list_col="e_words", cache=cache, **kwargs)
+    analyzer.manual_train_split(train, test, vectorizer)
+    return analyzer.run_models(["rm", "oovd"])
+
+
+class TestMatrixCache:
+    def test_roundtrip(self, tmp_path):
+        cache = DataCache(str(tmp_path))
+        vectorizer = TfidfVectorizer(analyzer=lambda tokens: tokens)
+        X_train = vectorizer.fit_transform(TRAIN["e_words"].to_list())
+        X_test = vectorizer.transform(TEST["e_words"].to_list())
+
+        put_matrices(cache, "key", X_train, X_test)
+        train, test = get_matrices(cache, "key", TRAIN.height, TEST.height)
+
+        assert train.shape == X_train.shape and test.shape == X_test.shape
+        assert (train != X_train).nnz == 0
+        assert (test != X_test).nnz == 0
+        assert train.dtype == X_train.dtype
+
+    def test_missing_matrices(self, tmp_path):
+        assert get_matrices(DataCache(str(tmp_path)), "key", 1, 1) is None
+
+
+class TestLogAnalyzerMatrixCache:
+    def test_second_split_is_not_vectorized(self, tmp_path):
+        cache = DataCache(str(tmp_path))
+        expected = _results(cache)
+
+        with patch.object(AnomalyDetector, "prepare_train_test_data") as mock_prepare:
+            results = _results(cache)
+
+        mock_prepare.assert_not_called()
+        assert results.equals(expected)
+
+    def test_token_ids_are_cached(self, tmp_path):
+        cache = DataCache(str(tmp_path))
+        dictionary = TokenDictionary()
+        train = TRAIN.with_columns(dictionary.encode(TRAIN["e_words"]))
+        test = TEST.with_columns(dictionary.encode(TEST["e_words"]))
+        expected = _results(cache, train=train, test=test, token_dictionary=dictionary)
+
+        with patch.object(log_analyzer, "vectorize_token_ids") as mock_vectorize:
+            results = _results(
+                cache, train=train, test=test, token_dictionary=dictionary
+            )
+
+        mock_vectorize.assert_not_called()
+        assert results.equals(expected)
+
+    def test_other_data_is_vectorized(self, tmp_path):
+        cache = DataCache(str(tmp_path))
+        _results(cache)
+
+        with patch.object(
+            AnomalyDetector,
+            "prepare_train_test_data",
+            autospec=True,
+            side_effect=AnomalyDetector.prepare_train_test_data,
+        ) as mock_prepare:
+            _results(cache, vectorizer=TfidfVectorizer)
+            _results(cache, test=TEST.head(2))
+
+        assert mock_prepare.call_count == 2
@@ -0,0 +1,126 @@
+from unittest.mock import patch
+
+import numpy as np
+import polars as pl
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer
+
+import server.analysis.utils.minhash as minhash
+from server.analysis.utils.data_cache import DataCache
+from server.analysis.utils.log_distance import measure_distances
+from server.analysis.utils.minhash import MinHashIndex, build_minhash_index
+
+SHARED = [f"term{i}" for i in range(200)]
+
+
+def _logs(run_count=40):
+    # Run i replaces 5 * i of the shared terms with terms of its own
+    runs = []
+    words = []
+    for run in range(run_count):
+        tokens = SHARED[: 200 - 5 * run] + [f"run{run}x{i}" for i in range(5 * run)]
+        for start in range(0, len(tokens), 10):
+            runs.append(f"run_{run:02d}")
+            words.append(tokens[start : start + 10])
+    return pl.DataFrame({"run": runs, "e_words": words})
+
+
+def _jaccard(first, second):
+    first, second = set(first), set(second)
+    return len(first & second) / len(first | second)
+
+
+def _tokens(df, run):
+    return df.filter(pl.col("run") == run)["e_words"].explode().to_list()
+
+
+class TestMinHashIndex:
+    def test_estimated_jaccard(self):
+        df = _logs()
+        index = build_minhash_index(df, "e_words", num_perm=256, bands=64)
+
+        estimated = index.estimated_jaccard("run_00")
+
+        target = _tokens(df, "run_00")
+        expected = [_jaccard(target, _tokens(df, run)) for run in index.runs]
+        assert estimated == pytest.approx(expected, abs=0.1)
+
+    def test_nearest_similar(self):
+        index = build_minhash_index(_logs(), "e_words")
+
+        nearest = index.nearest("run_00", 3)
+
+        assert nearest["run"].to_list() == ["run_01", "run_02", "run_03"]
+        assert nearest["estimated_jaccard"].is_sorted(descending=True)
+
+    def test_nearest_dissimilar_in_selected_runs(self):
+        index = build_minhash_index(_logs(), "e_words")
+
+        nearest = index.nearest(
+            "run_00", 2, dissimilar=True, runs=["run_05", "run_39", "run_20"]
+        )
+
+        assert nearest["run"].to_list() == ["run_39", "run_20"]
+
+    def test_similar_runs_are_lsh_candidates(self):
+        index = build_minhash_index(_logs(), "e_words")
+
+        candidates = [index.runs[row] for row in index.candidates("run_00")]
+
+        assert {"run_00", "run_01", "run_02"} <= set(candidates)
+        assert "run_39" not in candidates
+
+    def test_sketches_are_cached(self, tmp_path):
+        cache = DataCache(str(tmp_path))
+        df = _logs(10)
+
+        built = build_minhash_index(df, "e_words", cache=cache, key="source")
+        with patch.object(minhash, "_signatures") as mock_signatures:
+            cached = build_minhash_index(df, "e_words", cache=cache, key="source")
+
+        mock_signatures.assert_not_called()
+        assert cached.runs == built.runs
+        assert np.array_equal(
+            cached.estimated_jaccard("run_03"), built.estimated_jaccard("run_03")
+        )
+
+    def test_sketches_without_a_key_are_not_cached(self, tmp_path):
+        cache = DataCache(str(tmp_path))
+        df = _logs(10)
+
+        build_minhash_index(df, "e_words", cache=cache)
+        with patch.object(
+            minhash, "_signatures", side_effect=minhash._signatures
+        ) as mock_signatures:
+            build_minhash_index(df, "e_words", cache=cache)
+            build_minhash_index(df, "e_words", cache=cache, key="source")
+            build_minhash_index(df, "e_words", cache=cache, num_perm=64, key="source")
+
+        assert mock_signatures.call_count == 3
+
+    def test_unknown_target(self):
+        index = build_minhash_index(_logs(5), "e_words")
+
+        with pytest.raises(ValueError):
+            index.nearest("missing", 2)
+
+    def test_bands_must_divide_permutations(self):
+        with pytest.raises(ValueError):
+            MinHashIndex(["a"], np.zeros((1, 128), dtype=np.uint32), bands=30)
+
+
+class TestMeasureNearestDistances:
+    def test_exact_distances_of_top_k(self):
+        df = _logs()
+
+        result = measure_distances(df, "e_words", "run_00", CountVectorizer, top_k=3)
+
+        everything = measure_distances(df, "e_words", "run_00", CountVectorizer)
+        expected = everything.filter(
+            pl.col("comparison_run").is_in(["run_01", "run_02", "run_03"])
+        )
+        assert result["comparison_run"].equals(expected["comparison_run"])
+        assert result["jaccard"].to_list() == pytest.approx(expected["jaccard"])
+        assert result["estimated_jaccard"].to_list() == pytest.approx(
+            (1 - result["jaccard"]).to_list(), abs=0.15
+        )
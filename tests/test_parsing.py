@@ -0,0 +1,312 @@
+import threading
+from unittest.mock import patch
+
+import polars as pl
+import pytest
+from loglead.enhancers import EventLogEnhancer
+
+import server.analysis.utils.parsing as parsing
+from server.analysis.enhancer import Enhancer
+from server.analysis.log_analysis_pipeline import ManualTrainTestPipeline
+from server.analysis.utils.parsing import (
+    TemplateModel,
+    _cluster_templates,
+    parse_events,
+    parse_in_chunks,
+    parse_with_sample,
+)
+
+PARSERS = [
+    "e_event_drain_id",
+    "e_event_brain_id",
+    "e_event_iplom_id",
+    "e_event_pliplom_id",
+    "e_event_tip_id",
+]
+
+
+def _messages(count=400):
+    templates = [
+        "user {} logged in from host {}",
+        "connection to {} failed after {} retries",
+        "job {} finished with status {}",
+        "cache miss for key {} in region {}",
+    ]
+    return pl.Series(
+        "message",
+        [
+            templates[i % len(templates)].format(i * 7 % 13, i * 11 % 17)
+            for i in range(count)
+        ],
+    )
+
+
+def _map_inline(func, items, workers=1):
+    return [func(item) for item in items]
+
+
+def _assert_same_template_same_id(messages, event_ids):
+    df = pl.DataFrame(
+        {
+            "template": messages.str.split(" ").list.head(2).list.join(" "),
+            "event_id": event_ids,
+        }
+    )
+    ids_per_template = df.group_by("template").agg(pl.col("event_id").n_unique())
+
+    assert ids_per_template["event_id"].max() == 1
+    assert df["event_id"].n_unique() == 4
+
+
+class TestClusterTemplates:
+    def test_shared_tokens_are_kept(self):
+        templates = _cluster_templates(
+            pl.Series(["a 1 b", "a 2 b", "c d", None]),
+            pl.Series([1, 1, 2, 2]),
+            "chunk",
+        )
+
+        assert templates.to_list() == ["a <*> b", "a <*> b", "c d", None]
+
+    def test_clusters_without_shared_tokens_are_not_merged(self):
+        templates = _cluster_templates(
+            pl.Series(["a b", "c d", "e f", "g h"]),
+            pl.Series([1, 1, 2, 2]),
+            "chunk",
+        )
+
+        assert templates.n_unique() == 2
+        assert all(template.startswith("\0chunk:") for template in templates)
+
+
+@patch("server.analysis.utils.parsing.map_in_processes", _map_inline)
+class TestParallelParsing:
+    @pytest.mark.parametrize("item_list_col", PARSERS)
+    def test_chunks_are_merged_by_template(self, item_list_col):
+        messages = _messages()
+
+        event_ids = parse_in_chunks(messages, item_list_col, workers=2)
+
+        assert len(event_ids) == len(messages)
+        _assert_same_template_same_id(messages, event_ids)
+
+    def test_chunked_ids_are_deterministic(self):
+        messages = _messages()
+
+        first = parse_in_chunks(messages, "e_event_drain_id", workers=3)
+        second = parse_in_chunks(messages, "e_event_drain_id", workers=3)
+
+        assert first.to_list() == second.to_list()
+        assert first[0] == "e1"
+
+    @pytest.mark.parametrize("item_list_col", PARSERS)
+    def test_sample_templates_are_assigned(self, item_list_col):
+        messages = _messages()
+
+        event_ids = parse_with_sample(
+            messages, item_list_col, workers=2, sample_size=100
+        )
+
+        assert event_ids.null_count() == 0
+        _assert_same_template_same_id(messages, event_ids)
+
+    def test_messages_without_template_are_parsed(self):
+        messages = pl.concat(
+            [_messages(), pl.Series("message", ["something else entirely"] * 3)]
+        )
+
+        with patch.object(
+            parsing, "_parse_templates", wraps=parsing._parse_templates
+        ) as mock_parse:
+            event_ids = parse_with_sample(
+                messages, "e_event_drain_id", workers=2, sample_size=50
+            )
+
+        assert mock_parse.call_args.args[0][1] == ["something else entirely"]
+        assert event_ids.tail(3).n_unique() == 1
+        assert event_ids[-1] not in event_ids.head(400).to_list()
+
+    def test_nulls_are_kept(self):
+        messages = pl.concat([_messages(), pl.Series("message", [None], pl.String)])
+
+        event_ids = parse_in_chunks(messages, "e_event_drain_id", workers=2)
+
+        assert event_ids.null_count() == 1
+        assert event_ids[-1] is None
+
+
+@patch("server.analysis.utils.parsing._PARALLEL_MIN_MESSAGES", 0)
+@patch("os.cpu_count", return_value=2)
+class TestParseEvents:
+    def test_unsupported_mode(self, mock_cpu_count):
+        enhancer = EventLogEnhancer(_messages().to_frame())
+
+        with pytest.raises(ValueError):
+            parse_events(enhancer, "e_event_drain_id", "message", mode="bad")
+
+    def test_serial_without_workers(self, mock_cpu_count):
+        enhancer = EventLogEnhancer(_messages().to_frame())
+
+        with patch.object(parsing, "parse_in_chunks") as mock_chunks:
+            df = parse_events(
+                enhancer, "e_event_drain_id", "message", mode="chunked", workers=1
+            )
+
+        mock_chunks.assert_not_called()
+        assert "e_event_drain_id" in df.columns
+
+    def test_chunked_in_processes(self, mock_cpu_count):
+        enhancer = EventLogEnhancer(_messages().to_frame())
+
+        df = parse_events(
+            enhancer, "e_event_drain_id", "message", mode="chunked", workers=2
+        )
+
+        _assert_same_template_same_id(df["message"], df["e_event_drain_id"])
+
+    def test_enhancer_parse_mode(self, mock_cpu_count):
+        df = _messages().to_frame("m_message")
+
+        with patch.object(
+            parsing, "parse_with_sample", wraps=parsing.parse_with_sample
+        ) as mock_sample:
+            result = Enhancer(
+                df, parse_mode="sample", parse_workers=1, parse_sample_size=100
+            ).enhance_event("e_event_iplom_id")
+
+        mock_sample.assert_called_once()
+        _assert_same_template_same_id(result["m_message"], result["e_event_iplom_id"])
+
+
+class TestTemplateModel:
+    def test_known_messages_are_not_parsed(self):
+        model = TemplateModel("e_event_drain_id")
+        first = model.parse(_messages())
+
+        with patch.object(parsing, "_parse_templates") as mock_parse:
+            second = model.parse(_messages().reverse())
+
+        mock_parse.assert_not_called()
+        assert second.reverse().to_list() == first.to_list()
+
+    def test_new_templates_are_added(self):
+        model = TemplateModel("e_event_drain_id")
+        model.parse(_messages())
+        size = len(model)
+
+        event_ids = model.parse(pl.Series([f"disk {i} is full" for i in range(5)]))
+
+        assert len(model) == size + 1
+        assert event_ids.to_list() == [f"e{size + 1}"] * 5
+
+    @pytest.mark.parametrize("item_list_col", ["e_event_brain_id", "e_event_tip_id"])
+    def test_clusters_without_shared_tokens_are_stable(self, tmp_path, item_list_col):
+        messages = pl.Series(
+            [f"a{i} b{i} c{i}" for i in range(3)] + [f"x{i} y{i}" for i in range(3)]
+        )
+        model = TemplateModel(item_list_col)
+        first = model.parse(messages)
+        size = len(model)
+        model.save(str(tmp_path / "model.parquet"))
+
+        with patch.object(parsing, "_parse_templates") as mock_parse:
+            second = model.parse(messages)
+            loaded = TemplateModel.load(str(tmp_path / "model.parquet"), item_list_col)
+            third = loaded.parse(messages)
+
+        mock_parse.assert_not_called()
+        assert second.to_list() == first.to_list()
+        assert third.to_list() == first.to_list()
+        assert len(model) == len(loaded) == size
+
+    def test_save_and_load(self, tmp_path):
+        path = str(tmp_path / "models" / "e_event_drain_id_none.parquet")
+        model = TemplateModel("e_event_drain_id")
+        event_ids = model.parse(_messages())
+
+        model.save(path)
+        loaded = TemplateModel.load(path, "e_event_drain_id")
+
+        assert loaded.parse(_messages()).to_list() == event_ids.to_list()
+
+    def test_save_keeps_templates_stored_since_the_load(self, tmp_path):
+        path = str(tmp_path / "model.parquet")
+        first = TemplateModel.load(path, "e_event_drain_id")
+        second = TemplateModel.load(path, "e_event_drain_id")
+        first.parse(_messages())
+        second.parse(pl.Series([f"disk {i} is full" for i in range(5)]))
+
+        first.save(path)
+        second.save(path)
+
+        stored = TemplateModel.load(path, "e_event_drain_id")
+        assert len(stored) == len(first) + 1
+        assert stored.parse(_messages()).to_list() == first.parse(_messages()).to_list()
+
+    def test_locked_model_waits_for_other_analyses(self, tmp_path):
+        path = str(tmp_path / "model.parquet")
+        other = TemplateModel("e_event_drain_id")
+        other.parse(pl.Series([f"disk {i} is full" for i in range(5)]))
+        saver = threading.Thread(target=other.save, args=(path,))
+
+        with TemplateModel.locked(path, "e_event_drain_id") as model:
+            saver.start()
+            saver.join(0.5)
+            assert saver.is_alive()
+            event_ids = model.parse(_messages())
+        saver.join()
+
+        stored = TemplateModel.load(path, "e_event_drain_id")
+        assert stored.parse(_messages()).to_list() == event_ids.to_list()
+        assert len(stored) == len(model) + 1
+
+    def test_unchanged_model_is_not_saved(self, tmp_path):
+        path = str(tmp_path / "model.parquet")
+
+        TemplateModel("e_event_drain_id").save(path)
+
+        assert not (tmp_path / "model.parquet").exists()
+
+    def test_load_missing_model(self, tmp_path):
+        model = TemplateModel.load(str(tmp_path / "missing.parquet"), "e_event_tip_id")
+
+        assert len(model) == 0
+
+
+class TestPipelineTemplateModel:
+    def _pipeline(self, path):
+        pipeline = ManualTrainTestPipeline(
+            model_names=[],
+            item_list_col="e_event_drain_id",
+            vectorizer=None,
+            mask_type="myllari",
+            template_model_path=path,
+        )
+        pipeline._df_train = _messages().head(200).to_frame("m_message")
+        pipeline._df_test = _messages().tail(200).to_frame("m_message")
+        return pipeline
+
+    def test_train_and_test_share_event_ids(self, tmp_path):
+        path = str(tmp_path / "model.parquet")
+        pipeline = self._pipeline(path)
+
+        pipeline.enhance()
+
+        assert set(pipeline._df_test["e_event_drain_id"]) == set(
+            pipeline._df_train["e_event_drain_id"]
+        )
+        assert (tmp_path / "model.parquet").exists()
+
+    def test_later_runs_reuse_the_model(self, tmp_path):
+        path = str(tmp_path / "model.parquet")
+        first = self._pipeline(path)
+        first.enhance()
+
+        second = self._pipeline(path)
+        with patch.object(parsing, "_parse_templates") as mock_parse:
+            second.enhance()
+
+        mock_parse.assert_not_called()
+        assert second._df_test["e_event_drain_id"].to_list() == (
+            first._df_test["e_event_drain_id"].to_list()
+        )
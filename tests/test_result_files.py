@@ -0,0 +1,432 @@
+import io
+import os
+from unittest.mock import patch
+
+import polars as pl
+import pyarrow.parquet as pq
+import pytest
+from flask import Flask
+from polars.testing import assert_frame_equal
+
+from server.analysis.utils.result_files import (
+    LINE_LEVEL_LAYOUT,
+    _row_group_slices,
+    build_result_summary,
+    get_index_path,
+    get_summary_path,
+    read_result_columns,
+    read_result_slice,
+    read_result_summary,
+    read_seq_id_index,
+    remove_result_file,
+    stream_result_file,
+    write_result_file,
+)
+from server.api.crud_routes import _get_display_columns, crud_bp
+from server.extensions import db
+from server.models.analysis import Analysis
+from server.models.project import Project
+from server.models.settings import Settings
+
+LINE_LEVEL_COLUMNS = [
+    "seq_id",
+    "line_number",
+    "pred_ano_proba_IF",
+    "moving_avg_pred_ano_proba_IF",
+]
+
+
+def _write_result(tmp_path):
+    df = pl.DataFrame(
+        {
+            "seq_id": ["a", "a", "b"],
+            "line_number": [1, 2, 1],
+            "pred_ano_proba_IF": [0.1, 0.5, 0.9],
+            "moving_avg_pred_ano_proba_IF": [0.1, 0.3, 0.9],
+        }
+    )
+    path = tmp_path / "1.parquet"
+    df.write_parquet(path)
+    return str(path), df
+
+
+class TestStreamResultFile:
+    def test_full_file_is_streamed_unchanged(self, tmp_path):
+        path, _ = _write_result(tmp_path)
+
+        body = b"".join(stream_result_file(path, chunk_size=100))
+
+        with open(path, "rb") as f:
+            assert body == f.read()
+
+    def test_projected_columns(self, tmp_path):
+        path, df = _write_result(tmp_path)
+        columns = ["seq_id", "pred_ano_proba_IF"]
+
+        body = b"".join(stream_result_file(path, columns))
+
+        assert_frame_equal(pl.read_parquet(io.BytesIO(body)), df.select(columns))
+        assert os.listdir(tmp_path) == ["1.parquet"]
+
+    def test_projected_columns_keep_codec_and_row_groups(self, tmp_path):
+        path = str(tmp_path / "1.parquet")
+        df = pl.DataFrame({"seq_id": ["a"] * 10 + ["b"] * 5, "score": range(15)})
+        write_result_file(df, path, compression="zstd", row_group_size=6)
+
+        body = b"".join(stream_result_file(path, ["score"]))
+
+        metadata = pq.ParquetFile(io.BytesIO(body)).metadata
+        assert metadata.num_row_groups == pq.ParquetFile(path).num_row_groups
+        assert metadata.row_group(0).column(0).compression == "ZSTD"
+        assert pl.read_parquet(io.BytesIO(body))["score"].to_list() == list(range(15))
+
+    def test_closing_early_removes_temporary_file(self, tmp_path):
+        path, _ = _write_result(tmp_path)
+
+        chunks = stream_result_file(path, ["seq_id"], chunk_size=10)
+        next(chunks)
+        chunks.close()
+
+        assert os.listdir(tmp_path) == ["1.parquet"]
+
+    def test_missing_file_fails_before_streaming(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            stream_result_file(str(tmp_path / "missing.parquet"))
+
+    def test_read_result_columns(self, tmp_path):
+        path, df = _write_result(tmp_path)
+
+        assert read_result_columns(path) == df.columns
+
+
+def _write_line_result(tmp_path, files=20, lines=500):
+    df = pl.DataFrame(
+        {
+            "seq_id": [f"file_{i // lines:02}" for i in range(files * lines)],
+            "line_number": [i % lines + 1 for i in range(files * lines)],
+            "pred_ano_proba_IF": [i / 10 for i in range(files * lines)],
+        }
+    )
+    path = str(tmp_path / "1.parquet")
+    df.write_parquet(path, row_group_size=1000)
+    return path, df
+
+
+class TestResultSlice:
+    def test_index_is_built_once(self, tmp_path):
+        path, df = _write_line_result(tmp_path)
+
+        index = read_seq_id_index(path)
+
+        assert os.path.exists(get_index_path(path))
+        assert index["seq_id"].unique().sort().to_list() == sorted(
+            df["seq_id"].unique().to_list()
+        )
+        with patch("server.analysis.utils.result_files._build_seq_id_index") as mock:
+            assert_frame_equal(read_seq_id_index(path), index)
+        mock.assert_not_called()
+
+    def test_slice_matches_filter(self, tmp_path):
+        path, df = _write_line_result(tmp_path)
+
+        result = read_result_slice(path, "file_03")
+
+        assert_frame_equal(result, df.filter(pl.col("seq_id") == "file_03"))
+
+    def test_slice_reads_only_matching_row_groups(self, tmp_path):
+        path, df = _write_line_result(tmp_path)
+        row_groups = (
+            read_seq_id_index(path)
+            .filter(pl.col("seq_id") == "file_03")["row_group"]
+            .to_list()
+        )
+
+        with patch.object(
+            pq.ParquetFile,
+            "read_row_groups",
+            autospec=True,
+            side_effect=pq.ParquetFile.read_row_groups,
+        ) as mock_read:
+            result = read_result_slice(path, "file_03", 100, 120, ["line_number"])
+
+        assert mock_read.call_args.args[1] == row_groups[:1]
+        assert result.columns == ["line_number"]
+        assert result["line_number"].to_list() == list(range(100, 121))
+
+    def test_unknown_seq_id(self, tmp_path):
+        path, _ = _write_line_result(tmp_path)
+
+        assert read_result_slice(path, "missing").height == 0
+
+    def test_remove_result_file_removes_side_files(self, tmp_path):
+        path, _ = _write_line_result(tmp_path)
+        read_seq_id_index(path)
+        read_result_summary(path)
+
+        remove_result_file(path)
+
+        assert os.listdir(tmp_path) == []
+
+
+class TestResultSummary:
+    def test_build_summary(self):
+        df = pl.DataFrame(
+            {
+                "seq_id": ["b", "a", "a"],
+                "run": ["run_2", "run_1", "run_1"],
+                "line_number": [1, 1, 2],
+                "if_pred_ano_proba": [0.1, 0.2, float("inf")],
+                "m_message": ["x", "y", "z"],
+            }
+        )
+
+        summary = build_result_summary(df)
+
+        assert summary["row_count"] == 3
+        assert summary["columns"] == df.columns
+        assert summary["seq_ids"] == ["a", "b"]
+        assert summary["seq_id_row_counts"] == {"a": 2, "b": 1}
+        assert summary["runs"] == ["run_1", "run_2"]
+        assert summary["prediction_columns"] == ["if_pred_ano_proba"]
+        assert summary["column_stats"]["line_number"] == {
+            "min": 1,
+            "max": 2,
+            "median": 1.0,
+        }
+        assert summary["column_stats"]["if_pred_ano_proba"]["max"] is None
+        assert "m_message" not in summary["column_stats"]
+
+    def test_summary_is_created_for_older_results(self, tmp_path):
+        path, df = _write_line_result(tmp_path)
+
+        summary = read_result_summary(path)
+
+        assert os.path.exists(get_summary_path(path))
+        assert summary == build_result_summary(df)
+        with patch("server.analysis.utils.result_files.write_result_summary") as mock:
+            assert read_result_summary(path) == summary
+        mock.assert_not_called()
+
+
+class TestDisplayColumns:
+    def test_data_points_only(self):
+        assert _get_display_columns(LINE_LEVEL_COLUMNS, "data_points_only") == [
+            "seq_id",
+            "line_number",
+            "pred_ano_proba_IF",
+        ]
+
+    def test_moving_avg_only(self):
+        assert _get_display_columns(LINE_LEVEL_COLUMNS, "moving_avg_only") == [
+            "seq_id",
+            "line_number",
+            "moving_avg_pred_ano_proba_IF",
+        ]
+
+    def test_all_keeps_every_column(self):
+        assert _get_display_columns(LINE_LEVEL_COLUMNS, "all") == LINE_LEVEL_COLUMNS
+
+
+@pytest.fixture
+def client(tmp_path):
+    path, _ = _write_result(tmp_path)
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    app.register_blueprint(crud_bp, url_prefix="/api")
+
+    with app.app_context():
+        db.create_all()
+        project = Project(name="test", base_path="/")
+        db.session.add(project)
+        db.session.commit()
+        db.session.add(
+            Settings(project_id=project.id, line_level_display_mode="data_points_only")
+        )
+        db.session.add(
+            Analysis(
+                results_path=path,
+                analysis_type="anomaly-detection",
+                analysis_sub_type="line",
+                analysis_level="line",
+                project_id=project.id,
+            )
+        )
+        db.session.commit()
+
+    return app.test_client()
+
+
+class TestGetAnalysisRoute:
+    def test_display_mode_columns(self, client):
+        response = client.get("/api/analyses/1")
+
+        assert response.status_code == 200
+        assert pl.read_parquet(io.BytesIO(response.data)).columns == [
+            "seq_id",
+            "line_number",
+            "pred_ano_proba_IF",
+        ]
+
+    def test_raw_returns_file_unchanged(self, client, tmp_path):
+        response = client.get("/api/analyses/1?raw=true")
+
+        with open(tmp_path / "1.parquet", "rb") as f:
+            assert response.data == f.read()
+        assert response.headers["Content-Length"] == str(len(response.data))
+
+    def test_columns_arg_is_combined_with_display_mode(self, client):
+        response = client.get(
+            "/api/analyses/1?columns=seq_id,moving_avg_pred_ano_proba_IF,pred_ano_proba_IF"
+        )
+
+        assert pl.read_parquet(io.BytesIO(response.data)).columns == [
+            "seq_id",
+            "pred_ano_proba_IF",
+        ]
+
+    def test_raw_columns_arg(self, client):
+        response = client.get("/api/analyses/1?raw=true&columns=line_number,seq_id")
+
+        assert pl.read_parquet(io.BytesIO(response.data)).columns == [
+            "line_number",
+            "seq_id",
+        ]
+
+    def test_unknown_column(self, client):
+        response = client.get("/api/analyses/1?columns=seq_id,missing")
+
+        assert response.status_code == 400
+        assert "missing" in response.get_json()["error"]
+
+    def test_get_columns(self, client):
+        response = client.get("/api/analyses/1/columns")
+
+        assert response.get_json() == {"columns": LINE_LEVEL_COLUMNS}
+
+    def test_seq_ids(self, client):
+        response = client.get("/api/analyses/1/seq_ids")
+
+        assert response.get_json() == {"seq_ids": ["a", "b"]}
+
+    def test_slice(self, client):
+        response = client.get("/api/analyses/1/slice?seq_id=a")
+
+        df = pl.read_parquet(io.BytesIO(response.data))
+        assert df.columns == ["seq_id", "line_number", "pred_ano_proba_IF"]
+        assert df["line_number"].to_list() == [1, 2]
+
+    def test_evicted_slices_are_spilled(self, client, tmp_path):
+        client.application.config.update(
+            RESULT_STORE_MAX_MB=0,
+            RESULT_STORE_SPILL=True,
+            DATA_CACHE_PATH=str(tmp_path / "cache"),
+            DATA_CACHE_MAX_SIZE_MB=100,
+            DATA_CACHE_MAX_AGE_HOURS=1,
+        )
+        client.get("/api/analyses/1/slice?seq_id=a")
+        client.get("/api/analyses/1/slice?seq_id=b")
+
+        with patch("server.analysis.utils.result_store.read_result_slice") as mock:
+            response = client.get("/api/analyses/1/slice?seq_id=a")
+
+        mock.assert_not_called()
+        df = pl.read_parquet(io.BytesIO(response.data))
+        assert df["line_number"].to_list() == [1, 2]
+
+    def test_slice_line_range(self, client):
+        response = client.get("/api/analyses/1/slice?seq_id=a&line_start=2&line_end=5")
+
+        df = pl.read_parquet(io.BytesIO(response.data))
+        assert df["line_number"].to_list() == [2]
+
+    def test_slice_invalid_line_range(self, client):
+        response = client.get("/api/analyses/1/slice?seq_id=a&line_start=x")
+
+        assert response.status_code == 400
+
+    def test_slice_requires_seq_id(self, client):
+        assert client.get("/api/analyses/1/slice").status_code == 400
+
+    def test_summary(self, client):
+        response = client.get("/api/analyses/1/summary")
+
+        summary = response.get_json()
+        assert summary["seq_ids"] == ["a", "b"]
+        assert summary["prediction_columns"] == [
+            "pred_ano_proba_IF",
+            "moving_avg_pred_ano_proba_IF",
+        ]
+
+    def test_missing_analysis(self, client):
+        assert client.get("/api/analyses/2").status_code == 404
+
+
+class TestDeleteProjectRoute:
+    def test_delete_project_removes_template_models(self, client, tmp_path):
+        client.application.config["RESULTS_PATH"] = str(tmp_path)
+        model_dir = tmp_path / "template_models" / "1"
+        model_dir.mkdir(parents=True)
+        (model_dir / "e_event_drain_id_none.parquet").write_bytes(b"")
+
+        response = client.delete("/api/projects/1")
+
+        assert response.status_code == 204
+        assert not model_dir.exists()
+
+
+class TestWriteResultFile:
+    def test_line_level_layout(self, tmp_path):
+        df = pl.DataFrame(
+            {
+                "seq_id": ["b"] * 4 + ["a"] * 3 + ["c"] * 9,
+                "line_number": [4, 3, 2, 1, 1, 2, 3] + list(range(1, 10)),
+            }
+        )
+        path = str(tmp_path / "1.parquet")
+
+        write_result_file(
+            df,
+            path,
+            **LINE_LEVEL_LAYOUT,
+            compression="zstd",
+            compression_level=9,
+            row_group_size=5,
+        )
+
+        metadata = pq.ParquetFile(path).metadata
+        row_groups = [metadata.row_group(i) for i in range(metadata.num_row_groups)]
+        assert [row_group.num_rows for row_group in row_groups] == [3, 4, 5, 4]
+        assert [
+            (
+                row_group.column(0).statistics.min,
+                row_group.column(0).statistics.max,
+            )
+            for row_group in row_groups
+        ] == [("a", "a"), ("b", "b"), ("c", "c"), ("c", "c")]
+        assert row_groups[0].column(0).compression == "ZSTD"
+        assert_frame_equal(pl.read_parquet(path), df.sort("seq_id", "line_number"))
+
+    def test_without_layout_keeps_order(self, tmp_path):
+        df = pl.DataFrame({"run": ["b", "a"], "score": [0.5, 0.1]})
+        path = str(tmp_path / "1.parquet")
+
+        write_result_file(df, path, compression="lz4")
+
+        assert_frame_equal(pl.read_parquet(path), df)
+
+    def test_unsupported_compression(self, tmp_path):
+        with pytest.raises(ValueError):
+            write_result_file(
+                pl.DataFrame({"a": [1]}), str(tmp_path / "1.parquet"), compression="bad"
+            )
+
+    def test_row_group_slices(self):
+        assert _row_group_slices([3, 3, 5, 1, 12, 2], 6) == [
+            (0, 6),
+            (6, 6),
+            (12, 6),
+            (18, 6),
+            (24, 2),
+        ]
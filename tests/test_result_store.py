@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+import polars as pl
+from polars.testing import assert_frame_equal
+
+from server.analysis.utils.data_cache import DataCache
+from server.analysis.utils.result_files import read_result_slice
+from server.analysis.utils.result_store import ResultStore
+
+
+def _write_result(tmp_path, analysis_id, rows=1000):
+    df = pl.DataFrame(
+        {
+            "seq_id": [f"file_{i % 10}" for i in range(rows)],
+            "pred_ano_proba": [i / rows for i in range(rows)],
+        }
+    )
+    path = str(tmp_path / f"{analysis_id}.parquet")
+    df.write_parquet(path)
+    return path, df
+
+
+class TestResultStore:
+    def test_least_recently_used_is_evicted(self, tmp_path):
+        path, _ = _write_result(tmp_path, 0)
+        store = ResultStore(max_bytes=10**9)
+        frame_size = store.get_slice(0, path, "file_0").estimated_size()
+        store = ResultStore(max_bytes=2 * frame_size)
+
+        store.get_slice(0, path, "file_0")
+        store.get_slice(0, path, "file_1")
+        store.get_slice(0, path, "file_0")
+        store.get_slice(0, path, "file_2")
+
+        assert (0, "file_0") in store
+        assert (0, "file_1") not in store
+        assert (0, "file_2") in store
+        assert store.size == 2 * frame_size
+
+    def test_evicted_slices_are_spilled(self, tmp_path):
+        spill_cache = DataCache(str(tmp_path / "spill"))
+        path, df = _write_result(tmp_path, 0)
+        store = ResultStore(max_bytes=1, spill_cache=spill_cache)
+
+        store.get_slice(0, path, "file_0")
+        store.get_slice(0, path, "file_1")
+
+        with patch("server.analysis.utils.result_store.read_result_slice") as mock:
+            result = store.get_slice(0, path, "file_0")
+
+        mock.assert_not_called()
+        assert_frame_equal(result, df.filter(pl.col("seq_id") == "file_0"))
+
+    def test_discard(self, tmp_path):
+        spill_cache = DataCache(str(tmp_path / "spill"))
+        path, _ = _write_result(tmp_path, 1)
+        store = ResultStore(max_bytes=1, spill_cache=spill_cache)
+        store.get_slice(1, path, "file_0")
+        store.get_slice(1, path, "file_1")
+        spill_cache.put("analysis_12_other", pl.DataFrame({"a": [1]}))
+
+        store.discard(1)
+
+        assert (1, "file_1") not in store
+        assert store.size == 0
+        assert [entry.name for entry in (tmp_path / "spill").iterdir()] == [
+            "analysis_12_other.arrow"
+        ]
+
+    def test_slices_are_cached(self, tmp_path):
+        path, df = _write_result(tmp_path, 0)
+        store = ResultStore(max_bytes=10**9)
+
+        with patch(
+            "server.analysis.utils.result_store.read_result_slice",
+            wraps=read_result_slice,
+        ) as mock_read:
+            first = store.get_slice(0, path, "file_3")
+            second = store.get_slice(0, path, "file_3")
+
+        mock_read.assert_called_once()
+        assert second is first
+        assert_frame_equal(first, df.filter(pl.col("seq_id") == "file_3"))
@@ -93,6 +93,50 @@ class TestRunUmapAnalysis:
                 mask_type="myllari",
             )
 
+    @patch("server.analysis.utils.analysis_helpers._add_result")
+    def test_run_umap_analysis_svd_and_sample(self, mock_add_result):
+        mock_add_result.return_value = 8
+
+        with patch.object(
+            ar, "create_umap_embeddings", wraps=ar.create_umap_embeddings
+        ) as mock_embeddings:
+            result = ar.run_umap_analysis(
+                project_id=7,
+                analysis_name="test svd",
+                directory_path=HIDDEN_GROUP,
+                item_list_col="e_words",
+                file_level=True,
+                vectorizer="count",
+                mask_type="myllari",
+                svd_components=20,
+                sample_size=30,
+            )
+
+        assert mock_embeddings.call_args.args[2:] == (20, 30)
+        assert result["id"] == 8
+
+    @patch.object(
+        ar, "get_umap_options", return_value={"svd_components": 20, "sample_size": 0}
+    )
+    @patch.object(ar, "create_umap_embeddings")
+    @patch.object(ar, "create_umap_df")
+    @patch.object(ar, "store_and_format_result")
+    def test_run_umap_analysis_config_defaults(
+        self, mock_store, mock_umap_df, mock_embeddings, mock_options
+    ):
+        ar.run_umap_analysis(
+            project_id=7,
+            analysis_name="test defaults",
+            directory_path=HIDDEN_GROUP,
+            item_list_col="e_words",
+            file_level=False,
+            vectorizer="count",
+            mask_type=None,
+            sample_size=10,
+        )
+
+        assert mock_embeddings.call_args.args[2:] == (20, 10)
+
 
 class TestRunUniqueTermsAnalysis:
     @pytest.mark.parametrize(
@@ -137,12 +181,12 @@ class TestRunUniqueTermsAnalysis:
     @patch("server.analysis.analysis_runners.store_and_format_result")
     @patch("server.analysis.analysis_runners.unique_terms_count_by_file")
     @patch("server.analysis.analysis_runners.unique_terms_count_by_run")
-    @patch("server.analysis.analysis_runners.load_data")
+    @patch("server.analysis.analysis_runners.scan_data")
     def test_run_unique_terms_analysis_directory_level(
-        self, mock_load_data, mock_count_by_run, mock_count_by_file, mock_store_result
+        self, mock_scan_data, mock_count_by_run, mock_count_by_file, mock_store_result
     ):
 
-        mock_load_data.return_value = "dummy_df"
+        mock_scan_data.return_value = "dummy_df"
         mock_count_by_run.return_value = {"some": "result"}
         mock_store_result.return_value = {
             "id": 1,
@@ -166,12 +210,12 @@ class TestRunUniqueTermsAnalysis:
     @patch("server.analysis.analysis_runners.store_and_format_result")
     @patch("server.analysis.analysis_runners.unique_terms_count_by_file")
     @patch("server.analysis.analysis_runners.unique_terms_count_by_run")
-    @patch("server.analysis.analysis_runners.load_data")
+    @patch("server.analysis.analysis_runners.scan_data")
     def test_run_unique_terms_analysis_file_level(
-        self, mock_load_data, mock_count_by_run, mock_count_by_file, mock_store_result
+        self, mock_scan_data, mock_count_by_run, mock_count_by_file, mock_store_result
     ):
 
-        mock_load_data.return_value = "dummy_df"
+        mock_scan_data.return_value = "dummy_df"
         mock_count_by_file.return_value = {"some": "result"}
         mock_store_result.return_value = {"id": 2, "type": "file-level-visualisations"}
 
@@ -279,6 +323,41 @@ class TestRunLogDistanceAnalysis:
                 mask_type="myllari",
             )
 
+    @patch("server.analysis.analysis_runners.Settings")
+    @patch("server.analysis.utils.analysis_helpers._add_result")
+    def test_run_log_distance_analysis_matrix(
+        self, mock_add_result, mock_settings_class
+    ):
+
+        mock_settings = MagicMock()
+        mock_settings.match_filenames = True
+        mock_settings_class.query.filter_by.return_value.first_or_404.return_value = (
+            mock_settings
+        )
+
+        mock_add_result.return_value = 6
+
+        result = ar.run_log_distance_analysis(
+            project_id=7,
+            analysis_name="test",
+            directory_path=LABELED,
+            target_run=None,
+            comparison_runs=[],
+            item_list_col="e_words",
+            file_level=False,
+            vectorizer="count",
+            mask_type="myllari",
+            matrix=True,
+        )
+
+        df_matrix = mock_add_result.call_args.args[0]
+        runs = df_matrix["run"].to_list()
+
+        assert result["id"] == 6
+        assert result["type"] == "distance-matrix-directory-level"
+        assert mock_add_result.call_args.kwargs["target"] is None
+        assert df_matrix["cosine"].dtype == pl.Array(pl.Float32, len(runs))
+
 
 class TestRunAnomalyDetectionAnalysis:
     @pytest.mark.parametrize(
@@ -0,0 +1,123 @@
+import polars as pl
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+from server.analysis.log_analyzer import LogAnalyzer
+from server.analysis.utils.run_level_analysis import aggregate_run_level
+from server.analysis.utils.tokens import TokenDictionary, vectorize_token_ids
+
+
+def _identity(tokens):
+    return tokens
+
+
+def _frame(words):
+    return pl.DataFrame(
+        {"run": [f"run_{i % 3}" for i in range(len(words))], "e_words": words}
+    )
+
+
+TRAIN_WORDS = [
+    ["user", "logged", "in"],
+    ["user", "logged", "out"],
+    ["disk", "full", "disk"],
+    ["Zeta", "alpha", "Alpha"],
+    ["connection", "failed"],
+]
+TEST_WORDS = [
+    ["user", "logged", "in", "again"],
+    ["unknown", "token"],
+    ["disk", "disk", "disk"],
+]
+
+
+class TestTokenDictionary:
+    def test_ids_are_shared_between_frames(self):
+        dictionary = TokenDictionary()
+
+        first = dictionary.encode(pl.Series([["a", "b"], ["b", "c"]]))
+        second = dictionary.encode(pl.Series([["c", "d"], []]))
+
+        assert first.dtype == pl.List(pl.UInt32)
+        assert first.to_list() == [[0, 1], [1, 2]]
+        assert second.to_list() == [[2, 3], []]
+        assert len(dictionary) == 4
+
+    def test_decode(self):
+        dictionary = TokenDictionary()
+        tokens = pl.Series("e_words", [["a", "b"], [], None, ["b"]])
+
+        ids = dictionary.encode(tokens)
+
+        assert ids.name == "e_words"
+        assert ids.list.len().to_list() == [2, 0, None, 1]
+        assert dictionary.decode(ids.explode()).to_list() == (
+            tokens.explode().to_list()
+        )
+
+    def test_string_column(self):
+        dictionary = TokenDictionary()
+        events = pl.Series(["e1", "e2", None, "e1"])
+
+        ids = dictionary.encode(events)
+
+        assert ids.dtype == pl.UInt32
+        assert ids.to_list() == [0, 1, None, 0]
+        assert dictionary.decode(ids).to_list() == events.to_list()
+
+
+class TestVectorizeTokenIds:
+    @pytest.mark.parametrize("vectorizer", [CountVectorizer, TfidfVectorizer])
+    def test_same_as_sklearn(self, vectorizer):
+        train_words = TRAIN_WORDS + [[]]
+        test_words = TEST_WORDS + [[]]
+        dictionary = TokenDictionary()
+        train_ids = dictionary.encode(pl.Series(train_words))
+        test_ids = dictionary.encode(pl.Series(test_words))
+
+        X_train, X_test = vectorize_token_ids(
+            train_ids, test_ids, dictionary, vectorizer
+        )
+
+        expected = vectorizer(analyzer=_identity)
+        expected_train = expected.fit_transform(train_words)
+        expected_test = expected.transform(test_words)
+        assert X_train.dtype == expected_train.dtype
+        assert X_train.shape == expected_train.shape
+        assert (abs(X_train - expected_train) > 1e-12).nnz == 0
+        assert (abs(X_test - expected_test) > 1e-12).nnz == 0
+
+    def test_unsupported_vectorizer(self):
+        dictionary = TokenDictionary()
+        ids = dictionary.encode(pl.Series(TRAIN_WORDS))
+
+        with pytest.raises(ValueError):
+            vectorize_token_ids(ids, ids, dictionary, object)
+
+
+class TestLogAnalyzerTokenIds:
+    def _results(self, train, test, token_dictionary=None):
+        analyzer = LogAnalyzer(item_list_col="e_words", token_dictionary=token_dictionary)
+        analyzer.manual_train_split(train, test, CountVectorizer)
+        return analyzer.run_models(["rm", "oovd"])
+
+    def test_same_results_as_tokens(self):
+        train = aggregate_run_level(_frame(TRAIN_WORDS), "e_words")
+        test = aggregate_run_level(_frame(TEST_WORDS), "e_words")
+        dictionary = TokenDictionary()
+        train_ids = aggregate_run_level(
+            _frame(TRAIN_WORDS), "e_words", token_dictionary=dictionary
+        )
+        test_ids = aggregate_run_level(
+            _frame(TEST_WORDS), "e_words", token_dictionary=dictionary
+        )
+
+        expected = self._results(train, test)
+        results = self._results(train_ids, test_ids, dictionary)
+
+        assert train_ids["e_words"].dtype == pl.List(pl.UInt32)
+        assert results.columns == expected.columns
+        assert results.drop("e_words").equals(expected.drop("e_words"))
+        assert dictionary.decode(results["e_words"].explode()).equals(
+            expected["e_words"].explode()
+        )
@@ -0,0 +1,64 @@
+from unittest.mock import patch
+
+import numpy as np
+from scipy.sparse import issparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+import server.analysis.utils.umap_analysis as umap_analysis
+from server.analysis.utils.umap_analysis import create_umap_embeddings
+
+DOCUMENTS = [[f"w{(i * j) % 97}" for j in range(30)] for i in range(60)]
+
+
+def _fake_reducer(mock_umap):
+    reducer = mock_umap.return_value
+    reducer.fit_transform.side_effect = lambda X: np.ones((X.shape[0], 2))
+    reducer.transform.side_effect = lambda X: np.zeros((X.shape[0], 2))
+    return reducer
+
+
+class TestCreateUmapEmbeddings:
+    @patch.object(umap_analysis.umap, "UMAP")
+    def test_sparse_matrix_is_not_densified(self, mock_umap):
+        reducer = _fake_reducer(mock_umap)
+
+        embeddings = create_umap_embeddings(DOCUMENTS, CountVectorizer)
+
+        dtm = reducer.fit_transform.call_args.args[0]
+        assert issparse(dtm)
+        assert dtm.shape[0] == 60
+        assert embeddings.shape == (60, 2)
+
+    @patch.object(umap_analysis.umap, "UMAP")
+    def test_svd_reduces_dimensions(self, mock_umap):
+        reducer = _fake_reducer(mock_umap)
+
+        create_umap_embeddings(DOCUMENTS, CountVectorizer, svd_components=5)
+
+        assert reducer.fit_transform.call_args.args[0].shape == (60, 5)
+
+    @patch.object(umap_analysis.umap, "UMAP")
+    def test_fit_on_sample_transform_the_rest(self, mock_umap):
+        reducer = _fake_reducer(mock_umap)
+
+        embeddings = create_umap_embeddings(DOCUMENTS, CountVectorizer, sample_size=20)
+
+        assert reducer.fit_transform.call_args.args[0].shape[0] == 20
+        assert reducer.transform.call_args.args[0].shape[0] == 40
+        assert embeddings[:, 0].sum() == 20
+
+    @patch.object(umap_analysis.umap, "UMAP")
+    def test_sample_larger_than_documents(self, mock_umap):
+        reducer = _fake_reducer(mock_umap)
+
+        create_umap_embeddings(DOCUMENTS, CountVectorizer, sample_size=100)
+
+        reducer.transform.assert_not_called()
+
+    def test_embeddings_of_sample_and_rest(self):
+        embeddings = create_umap_embeddings(
+            DOCUMENTS, CountVectorizer, svd_components=10, sample_size=40
+        )
+
+        assert embeddings.shape == (60, 2)
+        assert np.isfinite(embeddings).all()
@@ -0,0 +1,135 @@
+from unittest.mock import patch
+
+import polars as pl
+import pytest
+
+import server.analysis.utils.unique_terms as unique_terms
+from server.analysis.enhancer import Enhancer
+from server.analysis.utils.file_level_analysis import unique_terms_count_by_file
+from server.analysis.utils.run_level_analysis import unique_terms_count_by_run
+from server.analysis.utils.unique_terms import count_unique_terms
+
+
+def _logs(lines=600):
+    templates = [
+        "user {} logged in from host {}",
+        "connection to {} failed after {} retries",
+        "job {} finished with status {}",
+    ]
+    return pl.DataFrame(
+        {
+            "run": [f"run_{i // 200}" for i in range(lines)],
+            "seq_id": [f"run_{i // 200}_file_{i // 50}" for i in range(lines)],
+            "m_message": [
+                templates[i % len(templates)].format(i * 7 % 97, i % 13)
+                for i in range(lines)
+            ],
+        }
+    )
+
+
+def _expected(df, group_col):
+    return (
+        df.with_columns(pl.col("m_message").str.split(" ").alias("e_words"))
+        .group_by(group_col)
+        .agg(
+            pl.len().alias("line_count"),
+            pl.col("e_words").list.explode().n_unique().alias("unique_term_count"),
+        )
+        .sort(group_col)
+    )
+
+
+class TestExactCounts:
+    @pytest.mark.parametrize("chunk_rows", [1, 70, 10_000])
+    def test_same_as_n_unique(self, chunk_rows):
+        df = _logs()
+
+        result = unique_terms_count_by_run(df, "e_words", chunk_rows=chunk_rows)
+
+        assert result.equals(_expected(df, "run"))
+
+    def test_lazy_frame_is_enhanced_one_chunk_at_a_time(self):
+        df = _logs()
+
+        with patch.object(unique_terms, "Enhancer", side_effect=Enhancer) as mock_enh:
+            result = unique_terms_count_by_run(df.lazy(), "e_words", chunk_rows=70)
+
+        assert result.equals(_expected(df, "run"))
+        heights = [call.args[0].height for call in mock_enh.call_args_list]
+        assert sum(heights) == df.height
+        assert max(heights) == 70
+
+    def test_file_level_columns(self):
+        df = _logs()
+
+        result = unique_terms_count_by_file(df, "e_words", chunk_rows=70)
+
+        assert result.columns == ["seq_id", "line_count", "unique_term_count", "run"]
+        assert result.drop("run").equals(_expected(df, "seq_id"))
+
+    def test_event_ids_are_shared_between_chunks(self):
+        df = _logs()
+
+        chunked = count_unique_terms(df, "e_event_drain_id", ["run"], chunk_rows=70)
+
+        assert chunked["unique_term_count"].to_list() == [3, 3, 3]
+
+    def test_one_chunk_is_enhanced_without_a_model(self):
+        df = _logs()
+
+        with patch.object(unique_terms, "TemplateModel") as mock_model:
+            result = count_unique_terms(df, "e_event_drain_id", ["run"])
+
+        mock_model.assert_not_called()
+        expected = Enhancer(df).enhance_event("e_event_drain_id")
+        assert result.equals(
+            expected.group_by("run")
+            .agg(
+                pl.len().alias("line_count"),
+                pl.col("e_event_drain_id")
+                .n_unique()
+                .cast(pl.UInt32)
+                .alias("unique_term_count"),
+            )
+            .sort("run")
+        )
+
+    def test_invalid_chunk_rows(self):
+        with pytest.raises(ValueError):
+            count_unique_terms(_logs(), "e_words", ["run"], chunk_rows=0)
+
+
+class TestApproximateCounts:
+    def _terms(self, count):
+        return pl.DataFrame(
+            {
+                "run": ["run_0"] * count,
+                "m_message": [f"term{i} term{i // 2}" for i in range(count)],
+            }
+        )
+
+    @pytest.mark.parametrize("count", [10, 1_000, 50_000])
+    def test_within_error_rate(self, count):
+        result = count_unique_terms(
+            self._terms(count), "e_words", ["run"], approximate=True, error_rate=0.01
+        )
+
+        assert result["unique_term_count"][0] == pytest.approx(count, rel=0.04)
+        assert result["line_count"][0] == count
+
+    def test_chunks_give_the_same_sketch(self):
+        df = self._terms(5_000)
+
+        whole = count_unique_terms(df, "e_words", ["run"], approximate=True)
+        chunked = count_unique_terms(
+            df, "e_words", ["run"], approximate=True, chunk_rows=333
+        )
+
+        assert chunked.equals(whole)
+
+    def test_invalid_error_rate(self):
+        with pytest.raises(ValueError):
+            count_unique_terms(
+                self._terms(10), "e_words", ["run"], approximate=True, error_rate=0
+            )